@@ -1,2 +1,29 @@
-from .compiler import parse
-from .compiler import process
+'''
+AstraKahn synchroniser compiler.
+
+The compiler (and with it the parser) is imported on first use of parse,
+process, passport or Compiler, so that the passports (see passports.py) can
+be loaded without it. The submodules are imported on first access too.
+'''
+
+import importlib
+
+
+compiler_names = ('parse', 'process', 'passport', 'Compiler')
+
+
+def __getattr__(name):
+    if name in compiler_names:
+        from . import compiler
+        return getattr(compiler, name)
+    try:
+        return importlib.import_module('.' + name, __name__)
+    except ModuleNotFoundError as err:
+        if err.name != '%s.%s' % (__name__, name):
+            raise
+        raise AttributeError("module '%s' has no attribute '%s'"
+                             % (__name__, name)) from None
+
+
+def __dir__():
+    return sorted(set(globals()) | set(compiler_names))
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+'''
+Semantic analysis of the synchroniser AST in two passes over the
+transitions, equivalent to intab.build followed by outtab.build.
+
+intab.build traverses the whole AST and, per transition, the subtree of the
+transition once more (CheckExp); outtab.build does the same (CheckDataExp).
+Here the nodes of interest are taken directly from the transitions:
+
+    1. the store types of the declarations are checked; per transition,
+       the output channels of the sends are checked, the expressions are
+       checked and typed, and the input term is merged into the type of
+       the input channel;
+    2. the store variables are filled from the channel variants;
+    3. per transition, the types of THIS and of the tail are set and the
+       output terms of the sends are merged into the output channel types;
+    4. the type variables bound by unification are resolved.
+
+Pass 3 needs the input channel types complete, so the transitions are
+visited twice. The checks run in the order of the separate passes, so the
+errors reported and the types derived are the same.
+'''
+
+from . import ast
+from . import types
+from . import intab as sync_intab
+from . import outtab as sync_outtab
+
+
+def transitions(sync_ast):
+    '''
+    Return the list of the transitions of %sync_ast% in order of appearance.
+    '''
+    return [trans for state in sync_ast.states.states
+                  for order in state.trans_orders
+                  for trans in order.trans_stmt]
+
+
+def data_nodes(exp):
+    '''
+    Generate the expression nodes of the right-hand side %exp% in post-order:
+    the integer items first, then %exp% itself.
+    '''
+    if isinstance(exp, ast.DataExp):
+        for item in exp.items:
+            if isinstance(item, ast.ItemPair) \
+                    and isinstance(item.value, ast.IntExp):
+                yield item.value
+    yield exp
+
+
+def exp_nodes(trans):
+    '''
+    Generate the Assign, IntExp and DataExp nodes of transition %trans% in
+    post-order, the order intab.CheckExp visits them.
+    '''
+    yield trans.guard
+    for action in trans.actions:
+        if isinstance(action, ast.Assign):
+            yield from data_nodes(action.rhs)
+            yield action
+        elif isinstance(action, ast.Send):
+            msg = action.msg
+            if isinstance(msg, ast.MsgData):
+                yield from data_nodes(msg.data_exp)
+            elif isinstance(msg, ast.MsgSegmark) \
+                    and isinstance(msg.depth, ast.IntExp):
+                yield msg.depth
+
+
+def build(sync_ast):
+    '''
+    Check %sync_ast% and derive the types of its variables and channels.
+    '''
+    intab = sync_ast.inputs.symtab
+    outtab = sync_ast.outputs.symtab
+    trans_list = transitions(sync_ast)
+    input_terms = {}
+    output_terms = {}
+
+    # Pass 1: input side.
+    for decl in sync_ast.decls.decls:
+        if isinstance(decl, ast.StoreVar):
+            sync_intab.check_store_type(decl.type, intab)
+
+    for trans in trans_list:
+        for action in trans.actions:
+            if isinstance(action, ast.Send):
+                sync_intab.check_send(action, outtab)
+
+        ce = sync_intab.CheckExp(trans.symtab)
+        visit = {
+            ast.IntExp: ce.visit_IntExp,
+            ast.DataExp: ce.visit_DataExp,
+            ast.Assign: ce.visit_Assign,
+        }
+        for node in exp_nodes(trans):
+            visit[type(node)](node, None)
+
+        sync_intab.input_term(trans, intab, input_terms)
+
+    sync_intab.merge_input_terms(input_terms)
+
+    # Store variables.
+    sync_outtab.fill_stores(sync_ast)
+
+    # Pass 2: output side.
+    for trans in trans_list:
+        sync_outtab.update_this(trans, intab)
+
+        cde = sync_outtab.CheckDataExp(trans.symtab, outtab, output_terms)
+        for action in trans.actions:
+            if isinstance(action, ast.Assign):
+                cde.visit_Assign(action, None)
+            elif isinstance(action, ast.Send):
+                cde.visit_Send(action, None)
+
+    sync_outtab.merge_output_terms(output_terms)
+    sync_outtab.resolve_types(sync_ast)
+
+
+def canonical_passport(sync_ast):
+    '''
+    Return the canonical text of the passport of processed %sync_ast%: the
+    types of its input and output channels in order of declaration, one per
+    line (see types.canonical). The variables shared by the channels get the
+    same names, so the texts of the same synchroniser compare equal byte for
+    byte and can be hashed.
+    '''
+    renamed = {}
+    lines = []
+    for direction, port_list in (('in', sync_ast.inputs), ('out', sync_ast.outputs)):
+        for port in port_list.ports:
+            name = port.name.value
+            entry = port_list.symtab.get(name)
+            lines.append('%s %s: %s' % (direction, name,
+                                        types.canonical(entry.type, renamed)))
+    return '\n'.join(lines) + '\n'
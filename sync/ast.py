@@ -19,12 +19,29 @@ import sys
 
 class Node(object):
     """ Abstract base class for AST nodes.
+
+        Node classes keep their fields in __slots__. child_names is the
+        static tuple of the names of the child fields (single children
+        first, then sequences), the order children() and iter_children()
+        follow. descendant_names is the set of names of the node classes
+        that can appear in the subtree of the node, None if unknown.
     """
+    __slots__ = ()
+
+    child_names = ()
+    descendant_names = None
+
     def children(self):
         """ A sequence of all children that are Nodes
         """
         pass
 
+    def iter_children(self):
+        """ Iterate over all children that are Nodes, sequences
+            flattened, without building intermediate lists.
+        """
+        return iter(())
+
     def show(self, buf=sys.stdout, offset=0, attrnames=False, nodenames=False, showcoord=False, _my_node_name=None):
         """ Pretty print the Node and all its attributes and
             children (recursively) to a buffer.
@@ -77,31 +94,142 @@ class Node(object):
 
 
 class NodeVisitor(object):
+    """ Post-order visitor of the AST.
+
+        visit_<Class>(node, children) is called for the nodes of class
+        <Class>, generic_visit(node, children) for the rest. children
+        maps the child names to the results of their visits (lists of
+        results for sequences).
+
+        Visitors not using the results set collect to False: then only
+        the visit_<Class> methods are called, children is None and the
+        subtrees with no nodes of the handled classes are not entered.
+
+        The methods are resolved once per visitor class. The traversal
+        keeps an explicit stack, so the depth of the tree is not bounded
+        by the recursion limit.
+    """
+    collect = True
+
+    _tables = {}
 
     def generic_visit(self, node, children):
         raise NotImplementedError('generic_visit is not implemented')
 
-    def traverse(self, node):
-        """ Called if no explicit visitor function exists for a
-            node. Implements preorder visiting of the node.
+    @classmethod
+    def dispatch_table(cls):
+        """ Return the dict of node class: (method, enter) for the
+            visitor class, filled on demand by dispatch_entry().
         """
+        table = NodeVisitor._tables.get(cls)
+        if table is None:
+            table = NodeVisitor._tables[cls] = {}
+        return table
+
+    @classmethod
+    def dispatch_entry(cls, node_cls):
+        """ Return (method, enter) for the nodes of class node_cls:
+            the function to call (None if the node is not visited) and
+            whether the subtree of the node is entered.
+        """
+        method = getattr(cls, 'visit_' + node_cls.__name__, None)
 
-        children = {}
-
-        for c_name, c in node.children():
-            if type(c) == list:
-                outcome = [self.traverse(i) for i in c]
-            else:
-                outcome = self.traverse(c)
+        if cls.collect:
+            if method is None:
+                method = cls.generic_visit
+            enter = True
+        else:
+            handled = set(n[6:] for n in dir(cls) if n.startswith('visit_'))
+            names = node_cls.descendant_names
+            enter = names is None or not names.isdisjoint(handled)
 
-            children[c_name] = outcome
+        entry = (method, enter)
+        cls.dispatch_table()[node_cls] = entry
+        return entry
 
-        method = 'visit_' + node.__class__.__name__
-        visitor = getattr(self, method, self.generic_visit)
-        return visitor(node, children) if visitor else None
+    def traverse(self, node):
+        """ Visit the nodes of the subtree of node in post-order.
+            Return the result of the visit of node.
+        """
+        if self.collect:
+            return self._traverse_collect(node)
+
+        table = self.dispatch_table()
+        entry = self.dispatch_entry
+        stack = [node]
+        pop = stack.pop
+        push = stack.append
+        outcome = None
+
+        while stack:
+            item = pop()
+
+            # A visit scheduled after the children.
+            if type(item) is tuple:
+                outcome = item[0](self, item[1], None)
+                continue
+
+            method, enter = table.get(type(item)) or entry(type(item))
+            if method is not None:
+                push((method, item))
+            if enter:
+                children = list(item.iter_children())
+                children.reverse()
+                stack.extend(children)
+
+        # The root is visited last.
+        method = (table.get(type(node)) or entry(type(node)))[0]
+        return outcome if method is not None else None
+
+    def _traverse_collect(self, root):
+        table = self.dispatch_table()
+        entry = self.dispatch_entry
+
+        # A frame is [node, children, items, position]. An item is
+        # (target, key, child): the result of the visit of child is stored
+        # as target[key], or appended to target for key None.
+        def frame(node):
+            children = {}
+            items = []
+            append = items.append
+            for c_name, c in node.children():
+                if type(c) == list:
+                    target = children[c_name] = []
+                    for i in c:
+                        append((target, None, i))
+                else:
+                    append((children, c_name, c))
+            return [node, children, items, 0]
+
+        stack = [frame(root)]
+        while True:
+            top = stack[-1]
+            items = top[2]
+            pos = top[3]
+            if pos < len(items):
+                top[3] = pos + 1
+                stack.append(frame(items[pos][2]))
+                continue
+
+            node = top[0]
+            method = (table.get(type(node)) or entry(type(node)))[0]
+            outcome = method(self, node, top[1])
+
+            stack.pop()
+            if not stack:
+                return outcome
+
+            parent = stack[-1]
+            target, key, _ = parent[2][parent[3] - 1]
+            if key is None:
+                target.append(outcome)
+            else:
+                target[key] = outcome
 
 
 class Sync(Node):
+    __slots__ = ('name','inputs','outputs','decls','states','configs','coord',)
+
     def __init__(self, name, inputs, outputs, decls, states, configs, coord=None):
         self.name = name
         self.inputs = inputs
@@ -120,9 +248,20 @@ class Sync(Node):
         if self.states is not None: nodelist.append(("states", self.states))
         return tuple(nodelist)
 
+    def iter_children(self):
+        if self.name is not None: yield self.name
+        if self.inputs is not None: yield self.inputs
+        if self.outputs is not None: yield self.outputs
+        if self.decls is not None: yield self.decls
+        if self.states is not None: yield self.states
+
     attr_names = ('configs',)
+    child_names = ('name','inputs','outputs','decls','states',)
+    descendant_names = frozenset(('Assign','BinaryOp','CondDataMsg','CondElse','CondEmpty','CondSegmark','DataExp','DeclList','DepthExp','DepthNone','EnumType','Goto','ID','IntExp','IntType','ItemExpand','ItemPair','ItemThis','ItemVar','MsgData','MsgNil','MsgSegmark','NUMBER','Port','PortList','Send','State','StateList','StateVar','StoreType','StoreVar','TERM','Trans','TransOrder','UnaryOp',))
 
 class PortList(Node):
+    __slots__ = ('ports','symtab','coord',)
+
     def __init__(self, ports, symtab, coord=None):
         self.ports = ports
         self.symtab = symtab
@@ -137,9 +276,16 @@ class PortList(Node):
             nodelist.append(("ports", list(self.ports) or []))
         return tuple(nodelist)
 
+    def iter_children(self):
+        if self.ports: yield from self.ports
+
     attr_names = ('symtab',)
+    child_names = ('ports',)
+    descendant_names = frozenset(('DepthExp','DepthNone','ID','NUMBER','Port',))
 
 class Port(Node):
+    __slots__ = ('name','depth_exp','coord',)
+
     def __init__(self, name, depth_exp, coord=None):
         self.name = name
         self.depth_exp = depth_exp
@@ -151,9 +297,17 @@ class Port(Node):
         if self.depth_exp is not None: nodelist.append(("depth_exp", self.depth_exp))
         return tuple(nodelist)
 
+    def iter_children(self):
+        if self.name is not None: yield self.name
+        if self.depth_exp is not None: yield self.depth_exp
+
     attr_names = ()
+    child_names = ('name','depth_exp',)
+    descendant_names = frozenset(('DepthExp','DepthNone','ID','NUMBER',))
 
 class DepthExp(Node):
+    __slots__ = ('depth','sign','shift','coord',)
+
     def __init__(self, depth, sign, shift, coord=None):
         self.depth = depth
         self.sign = sign
@@ -166,18 +320,33 @@ class DepthExp(Node):
         if self.shift is not None: nodelist.append(("shift", self.shift))
         return tuple(nodelist)
 
+    def iter_children(self):
+        if self.depth is not None: yield self.depth
+        if self.shift is not None: yield self.shift
+
     attr_names = ('sign',)
+    child_names = ('depth','shift',)
+    descendant_names = frozenset(('ID','NUMBER',))
 
 class DepthNone(Node):
+    __slots__ = ('coord',)
+
     def __init__(self, coord=None):
         self.coord = coord
 
     def children(self, expand=False):
         return ()
 
+    def iter_children(self):
+        return iter(())
+
     attr_names = ()
+    child_names = ()
+    descendant_names = frozenset(())
 
 class DeclList(Node):
+    __slots__ = ('decls','symtab','coord',)
+
     def __init__(self, decls, symtab, coord=None):
         self.decls = decls
         self.symtab = symtab
@@ -192,9 +361,16 @@ class DeclList(Node):
             nodelist.append(("decls", list(self.decls) or []))
         return tuple(nodelist)
 
+    def iter_children(self):
+        if self.decls: yield from self.decls
+
     attr_names = ('symtab',)
+    child_names = ('decls',)
+    descendant_names = frozenset(('EnumType','ID','IntType','NUMBER','StateVar','StoreType','StoreVar',))
 
 class StoreVar(Node):
+    __slots__ = ('name','type','coord',)
+
     def __init__(self, name, type, coord=None):
         self.name = name
         self.type = type
@@ -206,9 +382,17 @@ class StoreVar(Node):
         if self.type is not None: nodelist.append(("type", self.type))
         return tuple(nodelist)
 
+    def iter_children(self):
+        if self.name is not None: yield self.name
+        if self.type is not None: yield self.type
+
     attr_names = ()
+    child_names = ('name','type',)
+    descendant_names = frozenset(('ID','StoreType',))
 
 class StoreType(Node):
+    __slots__ = ('choice','port','coord',)
+
     def __init__(self, choice, port, coord=None):
         self.choice = choice
         self.port = port
@@ -220,9 +404,17 @@ class StoreType(Node):
         if self.port is not None: nodelist.append(("port", self.port))
         return tuple(nodelist)
 
+    def iter_children(self):
+        if self.choice is not None: yield self.choice
+        if self.port is not None: yield self.port
+
     attr_names = ()
+    child_names = ('choice','port',)
+    descendant_names = frozenset(('ID',))
 
 class StateVar(Node):
+    __slots__ = ('name','type','value','coord',)
+
     def __init__(self, name, type, value, coord=None):
         self.name = name
         self.type = type
@@ -236,9 +428,18 @@ class StateVar(Node):
         if self.value is not None: nodelist.append(("value", self.value))
         return tuple(nodelist)
 
+    def iter_children(self):
+        if self.name is not None: yield self.name
+        if self.type is not None: yield self.type
+        if self.value is not None: yield self.value
+
     attr_names = ()
+    child_names = ('name','type','value',)
+    descendant_names = frozenset(('EnumType','ID','IntType','NUMBER',))
 
 class IntType(Node):
+    __slots__ = ('size','coord',)
+
     def __init__(self, size, coord=None):
         self.size = size
         self.coord = coord
@@ -248,9 +449,16 @@ class IntType(Node):
         if self.size is not None: nodelist.append(("size", self.size))
         return tuple(nodelist)
 
+    def iter_children(self):
+        if self.size is not None: yield self.size
+
     attr_names = ()
+    child_names = ('size',)
+    descendant_names = frozenset(('NUMBER',))
 
 class EnumType(Node):
+    __slots__ = ('labels','coord',)
+
     def __init__(self, labels, coord=None):
         self.labels = labels
         self.coord = coord
@@ -264,9 +472,16 @@ class EnumType(Node):
             nodelist.append(("labels", list(self.labels) or []))
         return tuple(nodelist)
 
+    def iter_children(self):
+        if self.labels: yield from self.labels
+
     attr_names = ()
+    child_names = ('labels',)
+    descendant_names = frozenset(('ID',))
 
 class StateList(Node):
+    __slots__ = ('states','coord',)
+
     def __init__(self, states, coord=None):
         self.states = states
         self.coord = coord
@@ -280,9 +495,16 @@ class StateList(Node):
             nodelist.append(("states", list(self.states) or []))
         return tuple(nodelist)
 
+    def iter_children(self):
+        if self.states: yield from self.states
+
     attr_names = ()
+    child_names = ('states',)
+    descendant_names = frozenset(('Assign','BinaryOp','CondDataMsg','CondElse','CondEmpty','CondSegmark','DataExp','Goto','ID','IntExp','ItemExpand','ItemPair','ItemThis','ItemVar','MsgData','MsgNil','MsgSegmark','NUMBER','Send','State','TERM','Trans','TransOrder','UnaryOp',))
 
 class State(Node):
+    __slots__ = ('name','trans_orders','coord',)
+
     def __init__(self, name, trans_orders, coord=None):
         self.name = name
         self.trans_orders = trans_orders
@@ -298,9 +520,17 @@ class State(Node):
             nodelist.append(("trans_orders", list(self.trans_orders) or []))
         return tuple(nodelist)
 
+    def iter_children(self):
+        if self.name is not None: yield self.name
+        if self.trans_orders: yield from self.trans_orders
+
     attr_names = ()
+    child_names = ('name','trans_orders',)
+    descendant_names = frozenset(('Assign','BinaryOp','CondDataMsg','CondElse','CondEmpty','CondSegmark','DataExp','Goto','ID','IntExp','ItemExpand','ItemPair','ItemThis','ItemVar','MsgData','MsgNil','MsgSegmark','NUMBER','Send','TERM','Trans','TransOrder','UnaryOp',))
 
 class TransOrder(Node):
+    __slots__ = ('trans_stmt','coord',)
+
     def __init__(self, trans_stmt, coord=None):
         self.trans_stmt = trans_stmt
         self.coord = coord
@@ -314,9 +544,16 @@ class TransOrder(Node):
             nodelist.append(("trans_stmt", list(self.trans_stmt) or []))
         return tuple(nodelist)
 
+    def iter_children(self):
+        if self.trans_stmt: yield from self.trans_stmt
+
     attr_names = ()
+    child_names = ('trans_stmt',)
+    descendant_names = frozenset(('Assign','BinaryOp','CondDataMsg','CondElse','CondEmpty','CondSegmark','DataExp','Goto','ID','IntExp','ItemExpand','ItemPair','ItemThis','ItemVar','MsgData','MsgNil','MsgSegmark','NUMBER','Send','TERM','Trans','UnaryOp',))
 
 class Trans(Node):
+    __slots__ = ('port','condition','guard','actions','symtab','coord',)
+
     def __init__(self, port, condition, guard, actions, symtab, coord=None):
         self.port = port
         self.condition = condition
@@ -337,9 +574,19 @@ class Trans(Node):
             nodelist.append(("actions", list(self.actions) or []))
         return tuple(nodelist)
 
+    def iter_children(self):
+        if self.port is not None: yield self.port
+        if self.condition is not None: yield self.condition
+        if self.guard is not None: yield self.guard
+        if self.actions: yield from self.actions
+
     attr_names = ('symtab',)
+    child_names = ('port','condition','guard','actions',)
+    descendant_names = frozenset(('Assign','BinaryOp','CondDataMsg','CondElse','CondEmpty','CondSegmark','DataExp','Goto','ID','IntExp','ItemExpand','ItemPair','ItemThis','ItemVar','MsgData','MsgNil','MsgSegmark','NUMBER','Send','TERM','UnaryOp',))
 
 class CondSegmark(Node):
+    __slots__ = ('depth','coord',)
+
     def __init__(self, depth, coord=None):
         self.depth = depth
         self.coord = coord
@@ -349,9 +596,16 @@ class CondSegmark(Node):
         if self.depth is not None: nodelist.append(("depth", self.depth))
         return tuple(nodelist)
 
+    def iter_children(self):
+        if self.depth is not None: yield self.depth
+
     attr_names = ()
+    child_names = ('depth',)
+    descendant_names = frozenset(('ID',))
 
 class CondDataMsg(Node):
+    __slots__ = ('choice','labels','tail','coord',)
+
     def __init__(self, choice, labels, tail, coord=None):
         self.choice = choice
         self.labels = labels
@@ -369,27 +623,50 @@ class CondDataMsg(Node):
             nodelist.append(("labels", list(self.labels) or []))
         return tuple(nodelist)
 
+    def iter_children(self):
+        if self.choice is not None: yield self.choice
+        if self.tail is not None: yield self.tail
+        if self.labels: yield from self.labels
+
     attr_names = ()
+    child_names = ('choice','tail','labels',)
+    descendant_names = frozenset(('ID','TERM',))
 
 class CondEmpty(Node):
+    __slots__ = ('coord',)
+
     def __init__(self, coord=None):
         self.coord = coord
 
     def children(self, expand=False):
         return ()
 
+    def iter_children(self):
+        return iter(())
+
     attr_names = ()
+    child_names = ()
+    descendant_names = frozenset(())
 
 class CondElse(Node):
+    __slots__ = ('coord',)
+
     def __init__(self, coord=None):
         self.coord = coord
 
     def children(self, expand=False):
         return ()
 
+    def iter_children(self):
+        return iter(())
+
     attr_names = ()
+    child_names = ()
+    descendant_names = frozenset(())
 
 class Assign(Node):
+    __slots__ = ('lhs','rhs','coord',)
+
     def __init__(self, lhs, rhs, coord=None):
         self.lhs = lhs
         self.rhs = rhs
@@ -401,9 +678,17 @@ class Assign(Node):
         if self.rhs is not None: nodelist.append(("rhs", self.rhs))
         return tuple(nodelist)
 
+    def iter_children(self):
+        if self.lhs is not None: yield self.lhs
+        if self.rhs is not None: yield self.rhs
+
     attr_names = ()
+    child_names = ('lhs','rhs',)
+    descendant_names = frozenset(('BinaryOp','DataExp','ID','IntExp','ItemExpand','ItemPair','ItemThis','ItemVar','NUMBER','TERM','UnaryOp',))
 
 class DataExp(Node):
+    __slots__ = ('items','coord',)
+
     def __init__(self, items, coord=None):
         self.items = items
         self.coord = coord
@@ -417,18 +702,32 @@ class DataExp(Node):
             nodelist.append(("items", list(self.items) or []))
         return tuple(nodelist)
 
+    def iter_children(self):
+        if self.items: yield from self.items
+
     attr_names = ()
+    child_names = ('items',)
+    descendant_names = frozenset(('BinaryOp','ID','IntExp','ItemExpand','ItemPair','ItemThis','ItemVar','NUMBER','TERM','UnaryOp',))
 
 class ItemThis(Node):
+    __slots__ = ('coord',)
+
     def __init__(self, coord=None):
         self.coord = coord
 
     def children(self, expand=False):
         return ()
 
+    def iter_children(self):
+        return iter(())
+
     attr_names = ()
+    child_names = ()
+    descendant_names = frozenset(())
 
 class ItemVar(Node):
+    __slots__ = ('name','coord',)
+
     def __init__(self, name, coord=None):
         self.name = name
         self.coord = coord
@@ -438,9 +737,16 @@ class ItemVar(Node):
         if self.name is not None: nodelist.append(("name", self.name))
         return tuple(nodelist)
 
+    def iter_children(self):
+        if self.name is not None: yield self.name
+
     attr_names = ()
+    child_names = ('name',)
+    descendant_names = frozenset(('ID',))
 
 class ItemExpand(Node):
+    __slots__ = ('name','coord',)
+
     def __init__(self, name, coord=None):
         self.name = name
         self.coord = coord
@@ -450,9 +756,16 @@ class ItemExpand(Node):
         if self.name is not None: nodelist.append(("name", self.name))
         return tuple(nodelist)
 
+    def iter_children(self):
+        if self.name is not None: yield self.name
+
     attr_names = ()
+    child_names = ('name',)
+    descendant_names = frozenset(('ID',))
 
 class ItemPair(Node):
+    __slots__ = ('label','value','coord',)
+
     def __init__(self, label, value, coord=None):
         self.label = label
         self.value = value
@@ -464,9 +777,17 @@ class ItemPair(Node):
         if self.value is not None: nodelist.append(("value", self.value))
         return tuple(nodelist)
 
+    def iter_children(self):
+        if self.label is not None: yield self.label
+        if self.value is not None: yield self.value
+
     attr_names = ()
+    child_names = ('label','value',)
+    descendant_names = frozenset(('BinaryOp','ID','IntExp','NUMBER','TERM','UnaryOp',))
 
 class Send(Node):
+    __slots__ = ('msg','port','coord',)
+
     def __init__(self, msg, port, coord=None):
         self.msg = msg
         self.port = port
@@ -478,9 +799,17 @@ class Send(Node):
         if self.port is not None: nodelist.append(("port", self.port))
         return tuple(nodelist)
 
+    def iter_children(self):
+        if self.msg is not None: yield self.msg
+        if self.port is not None: yield self.port
+
     attr_names = ()
+    child_names = ('msg','port',)
+    descendant_names = frozenset(('BinaryOp','DataExp','ID','IntExp','ItemExpand','ItemPair','ItemThis','ItemVar','MsgData','MsgNil','MsgSegmark','NUMBER','TERM','UnaryOp',))
 
 class MsgSegmark(Node):
+    __slots__ = ('depth','coord',)
+
     def __init__(self, depth, coord=None):
         self.depth = depth
         self.coord = coord
@@ -490,9 +819,16 @@ class MsgSegmark(Node):
         if self.depth is not None: nodelist.append(("depth", self.depth))
         return tuple(nodelist)
 
+    def iter_children(self):
+        if self.depth is not None: yield self.depth
+
     attr_names = ()
+    child_names = ('depth',)
+    descendant_names = frozenset(('BinaryOp','ID','IntExp','NUMBER','TERM','UnaryOp',))
 
 class MsgData(Node):
+    __slots__ = ('choice','data_exp','coord',)
+
     def __init__(self, choice, data_exp, coord=None):
         self.choice = choice
         self.data_exp = data_exp
@@ -504,18 +840,33 @@ class MsgData(Node):
         if self.data_exp is not None: nodelist.append(("data_exp", self.data_exp))
         return tuple(nodelist)
 
+    def iter_children(self):
+        if self.choice is not None: yield self.choice
+        if self.data_exp is not None: yield self.data_exp
+
     attr_names = ()
+    child_names = ('choice','data_exp',)
+    descendant_names = frozenset(('BinaryOp','DataExp','ID','IntExp','ItemExpand','ItemPair','ItemThis','ItemVar','NUMBER','TERM','UnaryOp',))
 
 class MsgNil(Node):
+    __slots__ = ('coord',)
+
     def __init__(self, coord=None):
         self.coord = coord
 
     def children(self, expand=False):
         return ()
 
+    def iter_children(self):
+        return iter(())
+
     attr_names = ()
+    child_names = ()
+    descendant_names = frozenset(())
 
 class Goto(Node):
+    __slots__ = ('states','coord',)
+
     def __init__(self, states, coord=None):
         self.states = states
         self.coord = coord
@@ -529,9 +880,16 @@ class Goto(Node):
             nodelist.append(("states", list(self.states) or []))
         return tuple(nodelist)
 
+    def iter_children(self):
+        if self.states: yield from self.states
+
     attr_names = ()
+    child_names = ('states',)
+    descendant_names = frozenset(('ID',))
 
 class ID(Node):
+    __slots__ = ('value','coord',)
+
     def __init__(self, value, coord=None):
         self.value = value
         self.coord = coord
@@ -540,9 +898,16 @@ class ID(Node):
         nodelist = []
         return tuple(nodelist)
 
+    def iter_children(self):
+        return iter(())
+
     attr_names = ('value',)
+    child_names = ()
+    descendant_names = frozenset(())
 
 class NUMBER(Node):
+    __slots__ = ('value','coord',)
+
     def __init__(self, value, coord=None):
         self.value = value
         self.coord = coord
@@ -551,9 +916,16 @@ class NUMBER(Node):
         nodelist = []
         return tuple(nodelist)
 
+    def iter_children(self):
+        return iter(())
+
     attr_names = ('value',)
+    child_names = ()
+    descendant_names = frozenset(())
 
 class TERM(Node):
+    __slots__ = ('value','coord',)
+
     def __init__(self, value, coord=None):
         self.value = value
         self.coord = coord
@@ -562,18 +934,73 @@ class TERM(Node):
         nodelist = []
         return tuple(nodelist)
 
+    def iter_children(self):
+        return iter(())
+
     attr_names = ('value',)
+    child_names = ()
+    descendant_names = frozenset(())
 
 class IntExp(Node):
-    def __init__(self, exp, args, terms, coord=None):
+    __slots__ = ('exp','args','coord',)
+
+    def __init__(self, exp, args, coord=None):
         self.exp = exp
         self.args = args
-        self.terms = terms
         self.coord = coord
 
     def children(self, expand=False):
         nodelist = []
+        if self.exp is not None: nodelist.append(("exp", self.exp))
+        return tuple(nodelist)
+
+    def iter_children(self):
+        if self.exp is not None: yield self.exp
+
+    attr_names = ('args',)
+    child_names = ('exp',)
+    descendant_names = frozenset(('BinaryOp','ID','NUMBER','TERM','UnaryOp',))
+
+class BinaryOp(Node):
+    __slots__ = ('op','left','right','coord',)
+
+    def __init__(self, op, left, right, coord=None):
+        self.op = op
+        self.left = left
+        self.right = right
+        self.coord = coord
+
+    def children(self, expand=False):
+        nodelist = []
+        if self.left is not None: nodelist.append(("left", self.left))
+        if self.right is not None: nodelist.append(("right", self.right))
         return tuple(nodelist)
 
-    attr_names = ('exp','args','terms',)
+    def iter_children(self):
+        if self.left is not None: yield self.left
+        if self.right is not None: yield self.right
+
+    attr_names = ('op',)
+    child_names = ('left','right',)
+    descendant_names = frozenset(('BinaryOp','ID','NUMBER','TERM','UnaryOp',))
+
+class UnaryOp(Node):
+    __slots__ = ('op','operand','coord',)
+
+    def __init__(self, op, operand, coord=None):
+        self.op = op
+        self.operand = operand
+        self.coord = coord
+
+    def children(self, expand=False):
+        nodelist = []
+        if self.operand is not None: nodelist.append(("operand", self.operand))
+        return tuple(nodelist)
+
+    def iter_children(self):
+        if self.operand is not None: yield self.operand
+
+    attr_names = ('op',)
+    child_names = ('operand',)
+    descendant_names = frozenset(('BinaryOp','ID','NUMBER','TERM','UnaryOp',))
 
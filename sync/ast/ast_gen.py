@@ -12,6 +12,7 @@
 # Copyright (C) 2008-2013, Eli Bendersky
 # License: BSD
 #-----------------------------------------------------------------
+import re
 import pprint
 from string import Template
 
@@ -22,8 +23,52 @@ class ASTCodeGenerator(object):
             file.
         """
         self.cfg_filename = cfg_filename
-        self.node_cfg = [NodeCfg(name, contents)
-            for (name, contents) in self.parse_cfgfile(cfg_filename)]
+        self.node_cfg = [NodeCfg(name, contents, types)
+            for (name, contents, types) in self.parse_cfgfile(cfg_filename)]
+        self.check_types()
+        self.resolve_descendants()
+
+    def check_types(self):
+        """ Check the "# field -> types" comments: every child has one,
+            every comment is of a field of the entry, and the capitalised
+            words of those of the children name node classes (or None).
+            Traversal is pruned with the types, so a missing or stale
+            comment would skip subtrees.
+        """
+        nodes = set(n.name for n in self.node_cfg)
+        for n in self.node_cfg:
+            children = n.child + n.seq_child
+            for child in children:
+                if child not in n.types:
+                    raise RuntimeError("%s: no types given for child '%s'"
+                                       % (n.name, child))
+            for field, text in n.types.items():
+                if field not in n.all_entries:
+                    raise RuntimeError("%s: types given for '%s', not a field"
+                                       % (n.name, field))
+                if field not in children:
+                    continue
+                words = re.findall(r'\b[A-Z]\w*', text)
+                unknown = [w for w in words if w not in nodes and w != 'None']
+                if unknown or not any(w in nodes for w in words):
+                    raise RuntimeError("%s.%s: unknown node classes in '%s'"
+                                       % (n.name, field, text.strip()))
+
+    def resolve_descendants(self):
+        """ Find the node classes that can appear in the subtrees of
+            each node.
+        """
+        nodes = dict((n.name, n) for n in self.node_cfg)
+
+        for node_cfg in self.node_cfg:
+            seen = set()
+            stack = [node_cfg]
+            while stack:
+                n = stack.pop()
+                for name in n.child_types(nodes) - seen:
+                    seen.add(name)
+                    stack.append(nodes[name])
+            node_cfg.descendants = seen
 
     def generate(self, file=None):
         """ Generates the code into file, an open file buffer.
@@ -38,13 +83,20 @@ class ASTCodeGenerator(object):
         file.write(src)
 
     def parse_cfgfile(self, filename):
-        """ Parse the configuration file and yield pairs of
-            (name, contents) for each node.
+        """ Parse the configuration file and yield triples of
+            (name, contents, types) for each node, where types maps
+            the fields to the text of their "# field -> types" comments.
         """
+        types = {}
         with open(filename, "r") as f:
             for line in f:
                 line = line.strip()
-                if not line or line.startswith('#'):
+                if line.startswith('#'):
+                    match = re.match(r'#\s*(\w+)\s*->(.*)$', line)
+                    if match:
+                        types[match.group(1)] = match.group(2)
+                    continue
+                if not line:
                     continue
                 colon_i = line.find(':')
                 lbracket_i = line.find('[')
@@ -55,7 +107,8 @@ class ASTCodeGenerator(object):
                 name = line[:colon_i]
                 val = line[lbracket_i + 1:rbracket_i]
                 vallist = [v.strip() for v in val.split(',')] if val else []
-                yield name, vallist
+                yield name, vallist, types
+                types = {}
 
 
 class NodeCfg(object):
@@ -65,8 +118,10 @@ class NodeCfg(object):
         contents: a list of contents - attributes and child nodes
         See comment at the top of the configuration file for details.
     """
-    def __init__(self, name, contents):
+    def __init__(self, name, contents, types={}):
         self.name = name
+        self.types = types
+        self.descendants = None
         self.all_entries = []
         self.attr = []
         self.child = []
@@ -83,14 +138,29 @@ class NodeCfg(object):
             else:
                 self.attr.append(entry)
 
+    def child_types(self, nodes):
+        """ Return the set of names of the node classes the children
+            can be.
+        """
+        names = set()
+        for child in self.child + self.seq_child:
+            names.update(n for n in re.findall(r'\w+', self.types[child])
+                         if n in nodes)
+        return names
+
     def generate_source(self):
         src = self._gen_init()
         src += '\n' + self._gen_children()
+        src += '\n' + self._gen_iter_children()
         src += '\n' + self._gen_attr_names()
+        src += '\n' + self._gen_child_names()
+        src += '\n' + self._gen_descendant_names()
         return src
 
     def _gen_init(self):
         src = "class %s(Node):\n" % self.name
+        src += "    __slots__ = (%s)\n\n" % ''.join(
+            "%r," % nm for nm in self.all_entries + ['coord'])
 
         if self.all_entries:
             args = ', '.join(self.all_entries)
@@ -132,6 +202,35 @@ class NodeCfg(object):
 
         return src
 
+    def _gen_iter_children(self):
+        src = '    def iter_children(self):\n'
+
+        if self.child or self.seq_child:
+            for child in self.child:
+                src += (
+                    '        if self.%(child)s is not None: yield self.%(child)s\n') % (
+                        dict(child=child))
+
+            for seq_child in self.seq_child:
+                src += (
+                    '        if self.%(child)s: yield from self.%(child)s\n') % (
+                        dict(child=seq_child))
+        else:
+            src += '        return iter(())\n'
+
+        return src
+
+    def _gen_child_names(self):
+        src = "    child_names = (" + ''.join(
+            "%r," % nm for nm in self.child + self.seq_child) + ')'
+        return src
+
+    def _gen_descendant_names(self):
+        if self.descendants is None:
+            return "    descendant_names = None"
+        return "    descendant_names = frozenset((" + ''.join(
+            "%r," % nm for nm in sorted(self.descendants)) + '))'
+
     def _gen_attr_names(self):
         src = "    attr_names = (" + ''.join("%r," % nm for nm in self.attr) + ')'
         return src
@@ -161,12 +260,29 @@ import sys
 
 class Node(object):
     """ Abstract base class for AST nodes.
+
+        Node classes keep their fields in __slots__. child_names is the
+        static tuple of the names of the child fields (single children
+        first, then sequences), the order children() and iter_children()
+        follow. descendant_names is the set of names of the node classes
+        that can appear in the subtree of the node, None if unknown.
     """
+    __slots__ = ()
+
+    child_names = ()
+    descendant_names = None
+
     def children(self):
         """ A sequence of all children that are Nodes
         """
         pass
 
+    def iter_children(self):
+        """ Iterate over all children that are Nodes, sequences
+            flattened, without building intermediate lists.
+        """
+        return iter(())
+
     def show(self, buf=sys.stdout, offset=0, attrnames=False, nodenames=False, showcoord=False, _my_node_name=None):
         """ Pretty print the Node and all its attributes and
             children (recursively) to a buffer.
@@ -219,28 +335,137 @@ class Node(object):
 
 
 class NodeVisitor(object):
+    """ Post-order visitor of the AST.
+
+        visit_<Class>(node, children) is called for the nodes of class
+        <Class>, generic_visit(node, children) for the rest. children
+        maps the child names to the results of their visits (lists of
+        results for sequences).
+
+        Visitors not using the results set collect to False: then only
+        the visit_<Class> methods are called, children is None and the
+        subtrees with no nodes of the handled classes are not entered.
+
+        The methods are resolved once per visitor class. The traversal
+        keeps an explicit stack, so the depth of the tree is not bounded
+        by the recursion limit.
+    """
+    collect = True
+
+    _tables = {}
 
     def generic_visit(self, node, children):
         raise NotImplementedError('generic_visit is not implemented')
 
-    def traverse(self, node):
-        """ Called if no explicit visitor function exists for a
-            node. Implements preorder visiting of the node.
+    @classmethod
+    def dispatch_table(cls):
+        """ Return the dict of node class: (method, enter) for the
+            visitor class, filled on demand by dispatch_entry().
         """
+        table = NodeVisitor._tables.get(cls)
+        if table is None:
+            table = NodeVisitor._tables[cls] = {}
+        return table
+
+    @classmethod
+    def dispatch_entry(cls, node_cls):
+        """ Return (method, enter) for the nodes of class node_cls:
+            the function to call (None if the node is not visited) and
+            whether the subtree of the node is entered.
+        """
+        method = getattr(cls, 'visit_' + node_cls.__name__, None)
 
-        children = {}
-
-        for c_name, c in node.children():
-            if type(c) == list:
-                outcome = [self.traverse(i) for i in c]
-            else:
-                outcome = self.traverse(c)
+        if cls.collect:
+            if method is None:
+                method = cls.generic_visit
+            enter = True
+        else:
+            handled = set(n[6:] for n in dir(cls) if n.startswith('visit_'))
+            names = node_cls.descendant_names
+            enter = names is None or not names.isdisjoint(handled)
 
-            children[c_name] = outcome
+        entry = (method, enter)
+        cls.dispatch_table()[node_cls] = entry
+        return entry
 
-        method = 'visit_' + node.__class__.__name__
-        visitor = getattr(self, method, self.generic_visit)
-        return visitor(node, children) if visitor else None
+    def traverse(self, node):
+        """ Visit the nodes of the subtree of node in post-order.
+            Return the result of the visit of node.
+        """
+        if self.collect:
+            return self._traverse_collect(node)
+
+        table = self.dispatch_table()
+        entry = self.dispatch_entry
+        stack = [node]
+        pop = stack.pop
+        push = stack.append
+        outcome = None
+
+        while stack:
+            item = pop()
+
+            # A visit scheduled after the children.
+            if type(item) is tuple:
+                outcome = item[0](self, item[1], None)
+                continue
+
+            method, enter = table.get(type(item)) or entry(type(item))
+            if method is not None:
+                push((method, item))
+            if enter:
+                children = list(item.iter_children())
+                children.reverse()
+                stack.extend(children)
+
+        # The root is visited last.
+        method = (table.get(type(node)) or entry(type(node)))[0]
+        return outcome if method is not None else None
+
+    def _traverse_collect(self, root):
+        table = self.dispatch_table()
+        entry = self.dispatch_entry
+
+        # A frame is [node, children, items, position]. An item is
+        # (target, key, child): the result of the visit of child is stored
+        # as target[key], or appended to target for key None.
+        def frame(node):
+            children = {}
+            items = []
+            append = items.append
+            for c_name, c in node.children():
+                if type(c) == list:
+                    target = children[c_name] = []
+                    for i in c:
+                        append((target, None, i))
+                else:
+                    append((children, c_name, c))
+            return [node, children, items, 0]
+
+        stack = [frame(root)]
+        while True:
+            top = stack[-1]
+            items = top[2]
+            pos = top[3]
+            if pos < len(items):
+                top[3] = pos + 1
+                stack.append(frame(items[pos][2]))
+                continue
+
+            node = top[0]
+            method = (table.get(type(node)) or entry(type(node)))[0]
+            outcome = method(self, node, top[1])
+
+            stack.pop()
+            if not stack:
+                return outcome
+
+            parent = stack[-1]
+            target, key, _ = parent[2][parent[3] - 1]
+            if key is None:
+                target.append(outcome)
+            else:
+                target[key] = outcome
 
 
 '''
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+'''
+Compile many synchroniser sources over a pool of worker processes.
+'''
+
+import os
+import time
+import multiprocessing
+
+from . import compiler as sync_compiler
+from . import exception as sync_exn
+from . import cache as sync_cache
+
+
+class Result(object):
+    '''
+    Outcome of compiling one source file.
+
+    Attributes:
+        path (str): source file path.
+        ok (bool): True if the source was compiled successfully.
+        error (str): diagnostics, None on success.
+        time (float): seconds spent on compiling, excluding reading the file.
+    '''
+    def __init__(self, path, ok, error=None, time=0.):
+        self.path = path
+        self.ok = ok
+        self.error = error
+        self.time = time
+
+    def show(self):
+        if self.ok:
+            return "%s: ok (%.2f ms)" % (self.path, self.time * 1e3)
+        else:
+            return "%s: %s" % (self.path, self.error)
+
+
+def collect(paths, ext='.sync'):
+    '''
+    Expand %paths% into the list of source files. Directories are searched
+    recursively for files with extension %ext%.
+    '''
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            found = []
+            for root, _, names in os.walk(path):
+                found += [os.path.join(root, n) for n in names if n.endswith(ext)]
+            files += sorted(found)
+        else:
+            files.append(path)
+    return files
+
+
+# Compiler of the worker process, kept warm across the files.
+worker_compiler = None
+
+
+def init_worker(cache_dir=None):
+    global worker_compiler
+    cache = sync_cache.DiskCache(cache_dir) if cache_dir else None
+    worker_compiler = sync_compiler.Compiler(cache)
+
+
+def compile_file(path):
+    '''
+    Compile the source file %path% with the compiler of the worker.
+    '''
+    if worker_compiler is None:
+        init_worker()
+
+    try:
+        with open(path, 'r') as f:
+            code = f.read()
+    except OSError as err:
+        return Result(path, False, "cannot read source: %s" % err.strerror)
+
+    start = time.perf_counter()
+    try:
+        worker_compiler.process(code)
+    except (sync_exn.ParseError, sync_exn.DuplicatesError) as err:
+        return Result(path, False, err.message(code),
+                      time.perf_counter() - start)
+    except Exception as err:
+        return Result(path, False, "%s: %s" % (err.__class__.__name__, err),
+                      time.perf_counter() - start)
+
+    return Result(path, True, None, time.perf_counter() - start)
+
+
+def run(paths, jobs=None, cache_dir=None):
+    '''
+    Compile source files %paths% using %jobs% worker processes (the number
+    of CPUs if None), sharing the on-disk cache in %cache_dir% if given.
+    Return the list of results in the order of %paths%.
+    '''
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+
+    if jobs == 1 or len(paths) < 2:
+        init_worker(cache_dir)
+        return [compile_file(p) for p in paths]
+
+    chunksize = max(1, len(paths) // (jobs * 4))
+    with multiprocessing.Pool(jobs, initializer=init_worker,
+                              initargs=(cache_dir,)) as pool:
+        return pool.map(compile_file, paths, chunksize)
+
+
+def summary(results, wall_time):
+    '''
+    Return the report on %results%: a line per file and the totals.
+    '''
+    lines = [r.show() for r in results]
+    failed = sum(1 for r in results if not r.ok)
+    lines.append("%d files, %d succeeded, %d failed"
+                 % (len(results), len(results) - failed, failed))
+    lines.append("compile time %.3f s, wall time %.3f s"
+                 % (sum(r.time for r in results), wall_time))
+    return '\n'.join(lines) + '\n'
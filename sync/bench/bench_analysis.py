@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+'''
+Pass count and time of the semantic analysis: intab.build followed by
+outtab.build against the fused analysis.build, on the sources of the test
+corpus that process successfully and on generated sources.
+
+    python3 sync/bench/bench_analysis.py [states ...]
+'''
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__) + '/../..')
+
+import sync
+import sync.intab
+import sync.outtab
+import sync.analysis
+from sync.bench import gen
+
+
+def separate(sync_ast):
+    sync.intab.build(sync_ast)
+    sync.outtab.build(sync_ast)
+
+
+def timed(compiler, code, analyses, repeat=9):
+    '''
+    Return the best times of %analyses% on %code%. The analyses take turns
+    in every round, so that a drift of the machine affects them alike.
+    '''
+    best = [float('inf')] * len(analyses)
+    for _ in range(repeat):
+        for k, analyse in enumerate(analyses):
+            sync_ast = compiler.parse(code)
+            start = time.perf_counter()
+            analyse(sync_ast)
+            best[k] = min(best[k], time.perf_counter() - start)
+    return best
+
+
+def corpus():
+    directory = os.path.dirname(__file__) + '/../tests'
+    sources = []
+    for sub in ('', 'syntax'):
+        path = os.path.join(directory, sub)
+        for name in sorted(os.listdir(path)):
+            if name.endswith('.sync'):
+                with open(os.path.join(path, name)) as f:
+                    sources.append((os.path.join(sub, name), f.read()))
+    return sources
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [10, 50]
+
+    compiler = sync.Compiler()
+
+    sources = []
+    for name, code in corpus():
+        try:
+            compiler.process(code)
+        except Exception:
+            continue
+        sources.append((name, code))
+    sources += [('generated, %d states' % n, gen.source(n, 4)) for n in sizes]
+
+    print("%-28s %6s %16s %14s %13s %10s %7s" % ('source', 'trans',
+          'separate passes', 'fused passes', 'separate, ms', 'fused, ms',
+          'saved'))
+    total_separate = total_fused = 0
+    for name, code in sources:
+        sync_ast = compiler.parse(code)
+        n = len(sync.analysis.transitions(sync_ast))
+
+        # intab and outtab: a traversal of the AST plus one of every
+        # transition each; fused: two walks over the transitions.
+        t_separate, t_fused = timed(compiler, code,
+                                    (separate, sync.analysis.build))
+        total_separate += t_separate
+        total_fused += t_fused
+
+        print("%-28s %6d %16d %14d %13.2f %10.2f %6.0f%%" % (name, n,
+              2 + 2 * n, 2, t_separate * 1e3, t_fused * 1e3,
+              (1 - t_fused / t_separate) * 100))
+
+    print("time saved: %.2f ms of %.2f ms (%.0f%%)" % (
+          (total_separate - total_fused) * 1e3, total_separate * 1e3,
+          (1 - total_fused / total_separate) * 100))
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+'''
+Memory taken by the AST of generated synchronisers and the time of a full
+traversal with children() and with iter_children().
+
+    python3 sync/bench/bench_ast.py [states ...]
+'''
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(__file__) + '/../..')
+
+import sync
+from sync.bench import gen
+
+
+def walk_children(node):
+    n = 1
+    for _, c in node.children():
+        if type(c) == list:
+            for i in c:
+                n += walk_children(i)
+        else:
+            n += walk_children(c)
+    return n
+
+
+def walk_iter(node):
+    n = 0
+    stack = [node]
+    pop = stack.pop
+    extend = stack.extend
+    while stack:
+        node = pop()
+        n += 1
+        extend(node.iter_children())
+    return n
+
+
+def timed(f, node, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        n = f(node)
+        best = min(best, time.perf_counter() - start)
+    return n, best
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [1000, 10000]
+
+    compiler = sync.Compiler(tokenizer='scanner')
+    has_iter = hasattr(sync.ast.Node, 'iter_children')
+
+    print("%8s %10s %12s %12s %14s %14s" % ('states', 'nodes', 'AST, MB',
+          'bytes/node', 'children(), s', 'iter_children(), s'))
+    for states in sizes:
+        code = gen.source(states, 4)
+
+        tracemalloc.start()
+        sync_ast = compiler.parse(code)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        nodes, t_children = timed(walk_children, sync_ast)
+        if has_iter:
+            n_iter, t_iter = timed(walk_iter, sync_ast)
+            assert n_iter == nodes
+        else:
+            t_iter = float('nan')
+
+        print("%8d %10d %12.1f %12.0f %14.3f %14.3f" % (states, nodes,
+              memory / 2**20, memory / nodes, t_children, t_iter))
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+'''
+Throughput of the synchroniser engine: messages consumed per second by
+zip2 (sync/tests/zip2.sync) fed alternately on its two inputs, and by a
+flat synchroniser with many transitions on one input. Then the size of the
+packed state of a generated synchroniser against a dict of its values.
+
+    python3 sync/bench/bench_engine.py [messages]
+'''
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__) + '/../..')
+
+import sync
+import sync.engine as engine
+from sync.bench import gen
+
+
+def run(machine, inputs, messages):
+    '''
+    Feed %messages% messages cycling through %inputs%, the list of (port,
+    message). Return the seconds spent.
+    '''
+    n = len(inputs)
+    step = machine.step
+    start = time.perf_counter()
+    for i in range(messages):
+        port, msg = inputs[i % n]
+        step(port, msg)
+    return time.perf_counter() - start
+
+
+def report(name, machine, inputs, messages):
+    elapsed = run(machine, inputs, messages)
+    print("%-28s %10.0f msg/s %8.0f ns/msg"
+          % (name, messages / elapsed, elapsed / messages * 1e9))
+
+
+if __name__ == '__main__':
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+
+    path = os.path.join(os.path.dirname(__file__), '../tests/zip2.sync')
+    with open(path) as f:
+        zip2 = engine.build(sync.process(f.read()))
+    report('zip2', zip2, [('a', engine.Data(None, {'x': 1})),
+                          ('b', engine.Data(None, {'y': 2}))], messages)
+
+    for transitions in (4, 64):
+        flat = engine.build(sync.process(gen.flat_source(transitions)))
+        last = 'v%d' % (transitions - 1)
+        report('flat, %d transitions' % transitions, flat,
+               [('a', engine.Data(last, {'x': transitions, 'y': 1}))], messages)
+
+    big = engine.build(sync.process(gen.source(100, 4)))
+    lay = big.program.layout
+    values = dict(lay.unpack(big.word), state=big.state)
+    print("%-28s %d bits, %d bytes packed, %d bytes as a dict"
+          % ('state of gen.source(100)', lay.width, sys.getsizeof(big.word),
+             sys.getsizeof(values)))
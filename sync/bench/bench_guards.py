@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+'''
+Evaluation time of the compiled guards and assignments of a generated
+synchroniser, against walking the expression trees.
+
+    python3 sync/bench/bench_guards.py [calls]
+'''
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__) + '/../..')
+
+import sync
+import sync.ast
+import sync.codegen
+from sync.bench import gen
+
+
+ops = {
+    '+': lambda a, b: a + b, '-': lambda a, b: a - b,
+    '*': lambda a, b: a * b, '/': lambda a, b: a // b,
+    '%': lambda a, b: a % b, '<<': lambda a, b: a << b,
+    '>>': lambda a, b: a >> b, '|': lambda a, b: a | b,
+    '&': lambda a, b: a & b, '^': lambda a, b: a ^ b,
+    '<': lambda a, b: int(a < b), '>': lambda a, b: int(a > b),
+    '==': lambda a, b: int(a == b), '!=': lambda a, b: int(a != b),
+    '<=': lambda a, b: int(a <= b), '>=': lambda a, b: int(a >= b),
+    '&&': lambda a, b: int(bool(a and b)), '||': lambda a, b: int(bool(a or b)),
+}
+
+
+def interpret(node, symtab, env):
+    '''
+    Evaluate expression tree %node% in environment %env%.
+    '''
+    if isinstance(node, sync.ast.BinaryOp):
+        return ops[node.op](interpret(node.left, symtab, env),
+                            interpret(node.right, symtab, env))
+    if isinstance(node, sync.ast.UnaryOp):
+        v = interpret(node.operand, symtab, env)
+        return -v if node.op == '-' else int(not v)
+    if isinstance(node, sync.ast.ID):
+        entry = symtab.get(node.value)
+        if entry.readonly and isinstance(entry.ast, sync.ast.IntExp):
+            return entry.ast.exp.value
+        return env[node.value]
+    return node.value
+
+
+def timeit(f, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        f()
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+if __name__ == '__main__':
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    sync_ast = sync.process(gen.source(1, 2))
+    code = sync.codegen.build(sync_ast)
+    trans = sync_ast.states.states[0].trans_orders[0].trans_stmt[0]
+    c = code[trans]
+
+    state = {'cnt': 3, 'mode': 1}
+    msg = {'x': 2, 'y': 5}
+    env = dict(state, **msg)
+    guard = c.guard
+    exp = trans.guard.exp
+    symtab = trans.symtab
+
+    assert bool(guard(state, msg)) == bool(interpret(exp, symtab, env))
+
+    print("%12s %14s %14s" % ('', 'tree, ns', 'compiled, ns'))
+    print("%12s %14.0f %14.0f" % ('guard',
+        timeit(lambda: interpret(exp, symtab, env), calls),
+        timeit(lambda: guard(state, msg), calls)))
+
+    rhs = [a.rhs.exp for a in trans.actions
+           if isinstance(a, sync.ast.Assign) and isinstance(a.rhs, sync.ast.IntExp)]
+    assign = c.assign
+    print("%12s %14.0f %14.0f" % ('assign',
+        timeit(lambda: [interpret(e, symtab, env) for e in rhs], calls),
+        timeit(lambda: assign(state, msg), calls)))
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+'''
+Record operations on records with hundreds of labels: merge, update, the
+subsumption test (a merge giving the record itself) and the analysis of a
+synchroniser matching wide messages, where the tail types are computed.
+
+    python3 sync/bench/bench_labels.py [labels ...]
+'''
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__) + '/../..')
+
+import sync
+import sync.types as types
+import sync.analysis
+
+
+def wide_source(labels, trans=8):
+    '''
+    Return the code of a synchroniser with %trans% transitions on the
+    messages with %labels% labels, each matching a different half of them.
+    '''
+    names = ['l%d' % i for i in range(labels)]
+    lines = ['synch wide (a | b) {', '  store ?v.a m;', '  start {', '    on:']
+    for k in range(trans):
+        half = [names[(k * labels // trans + i) % labels] for i in range(labels // 2)]
+        lines += [
+            '      a.?v(%s || t) {' % ', '.join(half),
+            '        set m = this;',
+            '        send ?o(t || %s: [1]) => b;' % half[0],
+            '      }',
+        ]
+    lines += ['  }', '}']
+    return '\n'.join(lines) + '\n'
+
+
+def timed(f, repeat=5, number=200):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            f()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def records(n):
+    t = types.Variable()
+    full = types.Record(dict(('l%d' % i, types.Int()) for i in range(n)), [t])
+    half = types.Record(dict(('l%d' % i, types.Int()) for i in range(0, n, 2)))
+    other = types.Record(dict(('m%d' % i, types.Int()) for i in range(n)))
+    return full, half, other
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [100, 200, 400, 800]
+
+    compiler = sync.Compiler()
+
+    print("%7s %11s %12s %11s %12s %12s" % ('labels', 'merge, us',
+          'disjoint, us', 'update, us', 'subsumes, us', 'analysis, ms'))
+    for n in sizes:
+        full, half, other = records(n)
+        t_merge = timed(lambda: types.merge_records([full, half]))
+        t_disjoint = timed(lambda: types.merge_records([full, other]))
+        t_update = timed(lambda: full.update(half))
+        t_subsumes = timed(lambda: full.merge(half))
+
+        code = wide_source(n)
+        asts = [compiler.parse(code) for _ in range(3)]
+        t_analysis = min(timed(lambda: sync.analysis.build(a), 1, 1) for a in asts)
+
+        print("%7d %11.1f %12.1f %11.1f %12.1f %12.2f" % (n, t_merge * 1e6,
+              t_disjoint * 1e6, t_update * 1e6, t_subsumes * 1e6, t_analysis * 1e3))
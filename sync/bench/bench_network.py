@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+'''
+Compatibility check of a generated network: many synchronisers of a few
+kinds, wired at random. Reports the time with and without the worker pool
+and the number of the distinct pairs of channels actually checked, then the
+time of the full and the incremental check of the network written to disk
+after one source is edited.
+
+    python3 sync/bench/bench_network.py [connections [kinds [components]]]
+'''
+
+import os
+import sys
+import json
+import random
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(__file__) + '/../..')
+
+import sync
+import sync.network as network
+
+
+def kind_source(k, variants=4, labels=6):
+    '''
+    Return the code of synchroniser kind %k%: it receives and sends the
+    variants and labels picked by %k%.
+    '''
+    rnd = random.Random(k)
+    names = ['l%d' % i for i in range(labels)]
+    lines = ['synch kind%d (a, b | c, d) {' % k, '  start {', '    on:']
+    for j in range(variants):
+        got = rnd.sample(names, 2)
+        sent = rnd.choice(names)
+        lines += [
+            '      a.?v%d(%s || t) & [%s > 0] {' % (rnd.randrange(variants),
+                                                  ', '.join(got), got[0]),
+            '        send ?v%d(t || %s: [%s]) => c;' % (j, sent, got[0]),
+            '      }',
+        ]
+    lines += [
+        '      b.(z || h) { send ?v%d(this) => d; }' % rnd.randrange(variants),
+        '  }',
+        '}',
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def network_of(connections, kinds, components):
+    rnd = random.Random(0)
+    kind_passports = [sync.passport(kind_source(k)) for k in range(kinds)]
+    comps = dict(('n%d' % i, kind_passports[i % kinds]) for i in range(components))
+    names = sorted(comps)
+    conns = [(rnd.choice(names), rnd.choice('cd'), rnd.choice(names), rnd.choice('ab'))
+             for _ in range(connections)]
+    return comps, conns
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:]]
+    n_conns = args[0] if len(args) > 0 else 50000
+    n_kinds = args[1] if len(args) > 1 else 50
+    n_comps = args[2] if len(args) > 2 else 5000
+
+    comps, conns = network_of(n_conns, n_kinds, n_comps)
+    print("%d connections, %d components of %d kinds" % (n_conns, n_comps, n_kinds))
+
+    # Without the memo every connection is checked.
+    start = time.perf_counter()
+    for conn in conns:
+        p, o, c, i = conn
+        network.check_channels(comps[p].channel(o), comps[c].channel(i))
+    print("%-26s %8.3f s" % ('every connection, serial', time.perf_counter() - start))
+
+    for jobs in (1, os.cpu_count() or 1):
+        report = network.check(comps, conns, jobs)
+        print("%-26s %8.3f s  (%d pairs checked, %d memo hits, %d incompatible)"
+              % ('memo, %d job(s)' % jobs, report.time, report.checked,
+                 report.memo_hits, len(report.errors)))
+
+    memo = {}
+    network.check(comps, conns, 1, memo)
+    report = network.check(comps, conns, 1, memo)
+    print("%-26s %8.3f s" % ('memo kept, second run', report.time))
+
+    with tempfile.TemporaryDirectory() as d:
+        names = sorted(comps, key=lambda n: int(n[1:]))
+        for i, name in enumerate(names):
+            with open(os.path.join(d, name + '.sync'), 'w') as f:
+                f.write(kind_source(i % n_kinds))
+        with open(os.path.join(d, 'net.json'), 'w') as f:
+            json.dump({'components': dict((n, n + '.sync') for n in names),
+                       'connections': [['%s.%s' % (p, o), '%s.%s' % (c, i)]
+                                       for p, o, c, i in conns]}, f)
+        wiring = network.load_wiring(os.path.join(d, 'net.json'))
+
+        state = network.State()
+        report = network.check_incremental(wiring, state, 1)
+        print("%-26s %8.3f s" % ('full, from sources', report.time))
+
+        with open(os.path.join(d, names[0] + '.sync'), 'w') as f:
+            f.write(kind_source(n_kinds))
+        report = network.check_incremental(wiring, state, 1)
+        print("%-26s %8.3f s  (%d components, %d connections skipped)"
+              % ('incremental, one edited', report.time,
+                 report.skipped_components, report.skipped_connections))
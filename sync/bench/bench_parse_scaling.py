@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+'''
+Parse time of synchronisers with a growing number of transitions, with the
+cyclic garbage collector enabled and disabled (in this process only). With
+amortised linear list construction in the grammar the time per transition
+of the parser stays flat: it does with the collector disabled. With the
+collector enabled it grows with the size of the source, since every full
+collection traverses the AST built so far (about 40 tracked objects per
+transition).
+
+    python3 sync/bench/bench_parse_scaling.py [transitions ...]
+'''
+
+import gc
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__) + '/../..')
+
+import sync
+from sync.bench import gen
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [1000, 10000, 100000]
+
+    compiler = sync.Compiler(tokenizer='scanner')
+
+    def parse(code):
+        gc.collect()
+        start = time.perf_counter()
+        compiler.parse(code)
+        return time.perf_counter() - start
+
+    print("%12s %12s %12s %16s %16s" % ('transitions', 'shape', 'parse, s',
+                                        'us/transition', 'no gc, us/tr'))
+    for n in sizes:
+        for shape, code in (('flat', gen.flat_source(n)),
+                            ('10/state', gen.source(max(1, n // 10), 10))):
+            elapsed = parse(code)
+            gc.disable()
+            try:
+                no_gc = parse(code)
+            finally:
+                gc.enable()
+            print("%12d %12s %12.3f %16.2f %16.2f" % (n, shape, elapsed,
+                  elapsed / n * 1e6, no_gc / n * 1e6))
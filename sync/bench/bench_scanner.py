@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+'''
+Tokens per second of the PLY lexer and the hand-written scanner on large
+generated sources.
+
+    python3 sync/bench/bench_scanner.py [states ...]
+'''
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__) + '/../..')
+
+import sync.lexer
+import sync.scanner
+from sync.bench import gen
+
+
+def run(lexer, code):
+    start = time.perf_counter()
+    lexer.input(code)
+    n = 0
+    token = lexer.token
+    while token() is not None:
+        n += 1
+    return n, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [100, 1000, 10000]
+
+    ply_lexer = sync.lexer.build()
+    scanner = sync.scanner.build()
+
+    print("%10s %10s %14s %14s %8s" % ('states', 'tokens', 'ply tok/s',
+                                       'scanner tok/s', 'speedup'))
+    for states in sizes:
+        code = gen.source(states, 4)
+
+        ply_lexer.lineno = 1
+        n_ply, t_ply = run(ply_lexer, code)
+        n_scan, t_scan = run(scanner.clone(), code)
+        assert n_ply == n_scan
+
+        print("%10d %10d %14.0f %14.0f %7.1fx" % (states, n_ply, n_ply / t_ply,
+              n_scan / t_scan, t_ply / t_scan))
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+'''
+Stepping many instances of the same synchroniser: n instances, one message
+each per tick, stepped one by one by engine machines against all at once by
+a vector batch.
+
+    python3 sync/bench/bench_vector.py [instances] [ticks]
+'''
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__) + '/../..')
+
+import numpy as np
+
+import sync
+import sync.engine as engine
+import sync.vector as vector
+
+
+# A counter per stream partition: sums the values, reports every overflow.
+source = '''synch count (a | b) {
+state int(8) total;
+state int(4) seen;
+start {
+    on:
+        a.(x) & [total + x > 255] {
+            set total = [total + x], seen = [seen + 1];
+            send ?over(seen: seen || total: total) => b;
+        }
+        a.(x) & [x > 0] { set total = [total + x]; }
+        a.else { send nil => b; goto idle; }
+}
+idle { on: a.(x) & [x > 0] { set total = [x]; goto start; } }
+}'''
+
+
+def ticks(instances, count, seed=1):
+    rnd = random.Random(seed)
+    return [[rnd.randrange(64) for i in range(instances)] for t in range(count)]
+
+
+def run_machines(program, values):
+    machines = [engine.Machine(program) for i in values[0]]
+    start = time.perf_counter()
+    for tick in values:
+        for m, x in zip(machines, tick):
+            m.step('a', engine.Data(None, {'x': x}))
+    return time.perf_counter() - start, machines
+
+
+def run_batch(program, values):
+    batch = vector.Batch(program, len(values[0]))
+    arrays = [{'x': np.array(tick, dtype=np.int64)} for tick in values]
+    start = time.perf_counter()
+    for labels in arrays:
+        batch.step('a', labels)
+    return time.perf_counter() - start, batch
+
+
+if __name__ == '__main__':
+    instances = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    sync_ast = sync.process(source)
+    values = ticks(instances, count)
+    messages = instances * count
+
+    one, machines = run_machines(engine.Program(sync_ast), values)
+    batch_time, batch = run_batch(vector.Program(sync_ast), values)
+    assert all(batch.instance(i) == (m.state, m.variables)
+               for i, m in enumerate(machines))
+
+    for name, elapsed in (('machines, one by one', one),
+                          ('batch', batch_time)):
+        print("%-28s %10.0f msg/s %8.0f ns/msg"
+              % (name, messages / elapsed, elapsed / messages * 1e9))
+    print("%-28s %10.1fx, %d instances, %d ticks"
+          % ('speedup', one / batch_time, instances, count))
+    print("%-28s %d bytes per instance in the batch"
+          % ('state', batch.state.itemsize
+             + sum(a.itemsize for a in batch.variables.values())))
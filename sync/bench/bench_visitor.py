@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+'''
+Traversal time of a visitor handling a couple of node types on generated
+synchronisers: the former recursive traversal, NodeVisitor collecting the
+results of the children and NodeVisitor with collect = False.
+
+    python3 sync/bench/bench_visitor.py [states ...]
+'''
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__) + '/../..')
+
+import sync
+import sync.ast
+from sync.bench import gen
+
+
+def recursive_traverse(self, node):
+    children = {}
+    for c_name, c in node.children():
+        if type(c) == list:
+            outcome = [recursive_traverse(self, i) for i in c]
+        else:
+            outcome = recursive_traverse(self, c)
+        children[c_name] = outcome
+    method = 'visit_' + node.__class__.__name__
+    visitor = getattr(self, method, self.generic_visit)
+    return visitor(node, children) if visitor else None
+
+
+class Collecting(sync.ast.NodeVisitor):
+    def visit_Send(self, node, _):
+        pass
+
+    def visit_Assign(self, node, _):
+        pass
+
+    def generic_visit(self, node, _):
+        return None
+
+
+class Pruning(Collecting):
+    collect = False
+
+
+def timed(f, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [1000, 3000]
+
+    compiler = sync.Compiler(tokenizer='scanner')
+
+    print("%8s %14s %14s %16s" % ('states', 'recursive, s', 'collect, s',
+                                  'no collect, s'))
+    for states in sizes:
+        sync_ast = compiler.parse(gen.source(states, 4))
+        print("%8d %14.3f %14.3f %16.3f" % (states,
+            timed(lambda: recursive_traverse(Collecting(), sync_ast)),
+            timed(lambda: Collecting().traverse(sync_ast)),
+            timed(lambda: Pruning().traverse(sync_ast))))
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+'''
+Generate large synchroniser sources for the benchmarks.
+'''
+
+
+def source(states, trans_per_state=2):
+    '''
+    Return the code of a synchroniser with %states% states, each having
+    %trans_per_state% transitions. The code compiles successfully.
+    '''
+    lines = [
+        '/* Generated synchroniser:',
+        ' * %d states, %d transitions per state. */' % (states, trans_per_state),
+        'synch big (a, b | c, d)',
+        '{',
+        '  store ?v.a m;',
+        '  store ?w.b n;',
+        '  state int(8) cnt;',
+        '  state enum(IDLE, BUSY, DONE) mode;',
+        '',
+    ]
+
+    for i in range(states):
+        lines.append('  s%d {  # state %d' % (i, i))
+        lines.append('    on:')
+        for j in range(trans_per_state):
+            target = 's%d' % ((i + j + 1) % states)
+            k = i * trans_per_state + j
+            if j % 2 == 0:
+                lines += [
+                    '      a.?v%d(x, y || t) & [cnt + x * 2 < %d && mode != DONE] {' % (k, j + 3),
+                    '        set m = this, cnt = [(cnt + y - 1) %% %d];' % (j + 5),
+                    '        send ?o%d m => c;' % k,
+                    '        goto %s;' % target,
+                    '      }',
+                ]
+            else:
+                lines += [
+                    '      b.?w%d(z) & [(z << 1) >= %d || cnt == 0] {' % (k, j),
+                    '        set n = this, mode = [BUSY];',
+                    '        send ?w%d (z:[z + 1] || n) => d;' % k,
+                    '        goto %s;' % target,
+                    '      }',
+                ]
+            if j == trans_per_state // 2 - 1:
+                lines.append('    elseon:')
+        lines.append('  }')
+        lines.append('')
+
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+def flat_source(transitions):
+    '''
+    Return the code of a synchroniser with a single state having
+    %transitions% transitions: the worst case for list accumulation.
+    '''
+    lines = [
+        'synch flat (a | b)',
+        '{',
+        '  state int(16) cnt;',
+        '  s {',
+        '    on:',
+    ]
+    for k in range(transitions):
+        lines.append('      a.?v%d(x, y) & [x > %d] { set cnt = [cnt + y]; goto s; }'
+                     % (k, k))
+    lines += ['  }', '}']
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+'''
+Content-addressed on-disk cache of processed synchronisers.
+'''
+
+import os
+import time
+import glob
+import pickle
+import hashlib
+import tempfile
+import contextlib
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+_fingerprint = None
+
+
+def fingerprint():
+    '''
+    Return the compiler version: the digest of the compiler sources. Any change
+    to the compiler invalidates the cache entries made by the previous version.
+    '''
+    global _fingerprint
+    if _fingerprint is None:
+        h = hashlib.sha256()
+        for path in sorted(glob.glob(os.path.join(os.path.dirname(__file__), '*.py'))):
+            with open(path, 'rb') as f:
+                h.update(f.read())
+        _fingerprint = h.hexdigest()
+    return _fingerprint
+
+
+def key(code, macros={}):
+    '''
+    Return the cache key of source %code% compiled with %macros%.
+    '''
+    h = hashlib.sha256()
+    h.update(fingerprint().encode())
+    h.update(repr(sorted((str(k), repr(v)) for k, v in macros.items())).encode())
+    h.update(code.encode())
+    return h.hexdigest()
+
+
+class DiskCache(object):
+    '''
+    Store processed synchroniser ASTs together with their input and output
+    channel passports in a directory, one file per entry.
+
+    Entries are written to a temporary file and atomically renamed, so the
+    cache can be read by several processes without locking. When the total
+    size of the entries exceeds %max_size% bytes, the least recently used
+    entries are evicted.
+
+    The total is shared by the processes in the file %size_file% of the
+    directory, which the writers lock while renaming an entry into place and
+    updating the total. The directory is only scanned when the total exceeds
+    %max_size% (or the file is missing, or file locks are not available).
+    The scan also removes the temporary files older than %stale% seconds,
+    left by crashed writers.
+
+    Attributes:
+        path (str): cache directory.
+        max_size (int): size bound of the cache in bytes.
+        size (int): size of the entries as of the latest write of this
+            object, None before it.
+        hits (int), misses (int), evictions (int): counters of this object.
+    '''
+    suffix = '.pickle'
+    size_file = '.size'
+    stale = 3600
+
+    def __init__(self, path, max_size=256 * 2**20):
+        self.path = path
+        self.max_size = max_size
+        self.size = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, k):
+        return os.path.join(self.path, k + self.suffix)
+
+    def get(self, k):
+        '''
+        Return the (sync_ast, inputs, outputs) triple stored for key %k%, or
+        None. %inputs% and %outputs% map channel names to their types.
+        '''
+        path = self._file(k)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception:
+            # Corrupted entry, e g written by an incompatible Python version.
+            self._remove(path)
+            self.misses += 1
+            return None
+
+        # Mark the entry as recently used.
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        self.hits += 1
+        return entry
+
+    def put(self, k, sync_ast):
+        '''
+        Store processed %sync_ast% and its channel passports under key %k%.
+        '''
+        inputs = {n: e.type for n, e in sync_ast.inputs.symtab.table.items()}
+        outputs = {n: e.type for n, e in sync_ast.outputs.symtab.table.items()}
+
+        path = self._file(k)
+        fd, tmp = tempfile.mkstemp(dir=self.path, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((sync_ast, inputs, outputs), f,
+                            pickle.HIGHEST_PROTOCOL)
+                written = f.tell()
+            with self._locked() as size:
+                try:
+                    replaced = os.path.getsize(path)
+                except OSError:
+                    replaced = 0
+                os.replace(tmp, path)
+
+                total = size.read()
+                if total is not None:
+                    total += written - replaced
+                if total is None or total > self.max_size:
+                    total = self._evict()
+                size.write(total)
+                self.size = total
+        except BaseException:
+            self._remove(tmp)
+            raise
+
+    def evict(self):
+        '''
+        Remove the least recently used entries until the cache fits max_size,
+        and the stale temporary files.
+        '''
+        with self._locked() as size:
+            self.size = self._evict()
+            size.write(self.size)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        '''
+        Lock the size file of the cache for the writes of this process and
+        yield the <SizeFile>. Without file locks the size is unknown.
+        '''
+        if fcntl is None:
+            yield SizeFile(None)
+            return
+        fd = os.open(os.path.join(self.path, self.size_file),
+                     os.O_RDWR | os.O_CREAT)
+        with os.fdopen(fd, 'r+b') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield SizeFile(f)
+
+    def _evict(self):
+        '''
+        Scan the directory, evict as evict() does and return the total size
+        of the entries left.
+        '''
+        entries = []
+        total = 0
+        stale = time.time() - self.stale
+        with os.scandir(self.path) as it:
+            for e in it:
+                tmp = e.name.startswith('.tmp-')
+                if not (tmp or e.name.endswith(self.suffix)):
+                    continue
+                try:
+                    st = e.stat()
+                except OSError:
+                    continue
+                if tmp:
+                    if st.st_mtime < stale:
+                        self._remove(e.path)
+                    continue
+                entries.append((st.st_mtime, st.st_size, e.path))
+                total += st.st_size
+
+        if total <= self.max_size:
+            return total
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            if self._remove(path):
+                self.evictions += 1
+            total -= size
+        return total
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+
+class SizeFile(object):
+    '''
+    Total size of the entries of a cache, kept in the locked file %f% (None
+    if the size is not shared).
+    '''
+    def __init__(self, f):
+        self.f = f
+
+    def read(self):
+        '''
+        Return the size, None if unknown.
+        '''
+        if self.f is None:
+            return None
+        self.f.seek(0)
+        text = self.f.read()
+        return int(text) if text.isdigit() else None
+
+    def write(self, size):
+        if self.f is None:
+            return
+        self.f.seek(0)
+        self.f.truncate()
+        self.f.write(b'%d' % size)
+        self.f.flush()
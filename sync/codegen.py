@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+'''
+Compile integer expressions to Python functions.
+
+Every ast.IntExp of a transition (the guard, the integer assignments of the
+set statement and the integer items of the messages sent) is translated to
+the source of a Python function, which is compiled once. The variables of an
+expression are bound to the fast locals of the function on entry:
+
+    a.(x) & [cnt + x > 2 && mode != DONE]
+        # compiled to
+        def f(state, msg):
+            v_cnt = state['cnt']
+            v_x = msg['x']
+            return (((v_cnt + v_x) > 2) and (v_mode != 2))
+
+Enum members and integer macros are substituted with their values. The
+integer semantics are that of Python: '/' and '%' round towards minus
+infinity, and the operators &&, || and ! yield 0 or 1 when their value is
+used as an integer.
+'''
+
+import functools
+
+from . import ast
+from . import exception as exn
+from . import intexp
+
+
+# Operators with spelling different in Python.
+py_ops = {'/': '//', '&&': 'and', '||': 'or', '!': 'not'}
+
+logic_ops = ('&&', '||', '!')
+cmp_ops = ('<', '>', '==', '!=', '<=', '>=')
+
+
+class TransCode(object):
+    '''
+    Compiled integer expressions of a transition. All functions take the
+    values of the state variables %state% and of the labels of the received
+    message %msg% (mappings from the names to integers).
+
+    Attributes:
+        guard (function or None): guard(state, msg) returns the truth value
+            of the guard, None stands for an empty guard.
+        assign (function or None): assign(state, msg) returns the tuple of
+            values of the variables %assign_names%, None if the transition
+            does not assign integers. The assignments are performed in
+            order, so a variable assigned earlier is read with its new value.
+        assign_names (tuple of str): the variables assigned by %assign%.
+        exps (dict of <ast.IntExp>:function): other expressions of the
+            transition: the integer items and the depths of the messages
+            sent. %state% passed to them should also contain the variables
+            assigned by the transition.
+    '''
+    def __init__(self, guard, assign, assign_names, exps):
+        self.guard = guard
+        self.assign = assign
+        self.assign_names = assign_names
+        self.exps = exps
+
+
+@functools.lru_cache(maxsize=4096)
+def compile_source(source):
+    '''
+    Compile %source% defining the function 'f' and return the function.
+    The same expressions in different transitions share the function.
+    '''
+    namespace = {}
+    exec(compile(source, '<sync>', 'exec'), namespace)
+    return namespace['f']
+
+
+class Translator(object):
+    '''
+    Translate the expressions of a transition with the symbol table %symtab%
+    to Python code.
+    '''
+    def __init__(self, symtab):
+        self.symtab = symtab
+
+    def names(self, exp, out):
+        '''
+        Append the variables referenced in %exp% to %out%, in order of
+        appearance. Constants are skipped.
+        '''
+        stack = [exp]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, ast.BinaryOp):
+                stack.append(node.right)
+                stack.append(node.left)
+            elif isinstance(node, ast.UnaryOp):
+                stack.append(node.operand)
+            elif isinstance(node, ast.ID) and self.const(node) is None \
+                    and node.value not in out:
+                out.append(node.value)
+        return out
+
+    def const(self, node):
+        '''
+        Return the value of enum member %node%, None if %node% is a variable.
+        '''
+        entry = self.symtab.get(node.value)
+        if entry.readonly and isinstance(entry.ast, ast.IntExp):
+            return entry.ast.exp.value
+        return None
+
+    def bind(self, name):
+        '''
+        Return the code loading variable %name% to its local. Pattern-matched
+        labels come from the message, the rest from the state.
+        '''
+        entry = self.symtab.get(name)
+        source = 'msg' if entry.readonly else 'state'
+        return "v_%s = %s[%r]" % (name, source, name)
+
+    def exp(self, node, truth=False):
+        '''
+        Return the Python expression for %node%. %truth% is set when only the
+        truth value of the expression is used.
+        '''
+        if isinstance(node, ast.NUMBER):
+            return repr(node.value)
+
+        if isinstance(node, ast.TERM):
+            if type(node.value) is not int:
+                raise exn.ParseError("macro value '%s' is not an integer"
+                        % node.value, node.coord)
+            return repr(node.value)
+
+        if isinstance(node, ast.ID):
+            value = self.const(node)
+            return "v_%s" % node.value if value is None else repr(value)
+
+        op = node.op
+        if isinstance(node, ast.UnaryOp):
+            if op == '!':
+                code = "(not %s)" % self.exp(node.operand, True)
+            else:
+                code = "(-%s)" % self.exp(node.operand)
+        else:
+            logic = op in logic_ops
+            code = "(%s %s %s)" % (self.exp(node.left, logic),
+                                   py_ops.get(op, op),
+                                   self.exp(node.right, logic))
+
+        if not truth and (op in logic_ops or op in cmp_ops):
+            code = "(1 if %s else 0)" % code
+        return code
+
+    def function(self, names, body, result):
+        '''
+        Return the source of the function binding variables %names%,
+        executing the lines %body% and returning %result%.
+        '''
+        lines = ['def f(state, msg):']
+        lines += ['    ' + self.bind(n) for n in names]
+        lines += ['    ' + l for l in body]
+        lines.append('    return %s' % result)
+        return '\n'.join(lines) + '\n'
+
+    def guard(self, node):
+        if node.exp is None:
+            return None
+        return self.function(self.names(node.exp, []), [],
+                             self.exp(node.exp, True))
+
+    def assign(self, assigns):
+        if not assigns:
+            return None
+
+        # Variables are read from the state unless assigned earlier.
+        names = []
+        assigned = []
+        body = []
+        for a in assigns:
+            for n in self.names(a.rhs.exp, []):
+                if n not in assigned and n not in names:
+                    names.append(n)
+            body.append("v_%s = %s" % (a.lhs.value, self.exp(a.rhs.exp)))
+            if a.lhs.value not in assigned:
+                assigned.append(a.lhs.value)
+
+        result = '(%s,)' % ', '.join('v_%s' % n for n in assigned)
+        return self.function(names, body, result), tuple(assigned)
+
+    def value(self, node):
+        return self.function(self.names(node.exp, []), [], self.exp(node.exp))
+
+
+def compile_trans(trans):
+    '''
+    Compile the integer expressions of transition %trans%. Return
+    <TransCode>.
+    '''
+    tr = Translator(trans.symtab)
+
+    source = tr.guard(trans.guard)
+    guard = compile_source(source) if source is not None else None
+
+    assigns = [a for a in trans.actions
+               if isinstance(a, ast.Assign) and isinstance(a.rhs, ast.IntExp)]
+    assign, assign_names = None, ()
+    if assigns:
+        source, assign_names = tr.assign(assigns)
+        assign = compile_source(source)
+
+    exps = {}
+    for a in trans.actions:
+        if isinstance(a, ast.Send):
+            for e in intexp.find(a):
+                exps[e] = compile_source(tr.value(e))
+
+    return TransCode(guard, assign, assign_names, exps)
+
+
+def build(sync_ast):
+    '''
+    Compile the integer expressions of all transitions of %sync_ast%, which
+    should be processed (see compiler.process). Return the dict of
+    <ast.Trans>:<TransCode>.
+    '''
+    code = {}
+    for state in sync_ast.states.states:
+        for order in state.trans_orders:
+            for trans in order.trans_stmt:
+                code[trans] = compile_trans(trans)
+    return code
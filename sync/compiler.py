@@ -4,12 +4,19 @@ import os
 import sys
 import imp
 import re
+import time
+import pickle
+import threading
+import collections
 
 from . import lexer as sync_lexer
 from . import parser as sync_parser
 from . import exception as sync_exn
-from . import intab as sync_intab
-from . import outtab as sync_outtab
+from . import analysis as sync_analysis
+from . import cache as sync_cache
+from . import scanner as sync_scanner
+from . import types as sync_types
+from . import passports as sync_passports
 
 def macro_subst(code, macros):
     code_final = ''
@@ -31,12 +38,12 @@ def macro_subst(code, macros):
     return code_final
 
 
-def parse(code, macros={}):
-    global sync_lexer
-
-    #if macros:
-    #    code = macro_subst(code, macros)
-
+def read_configs(code, macros={}):
+    '''
+    Read the @-parameters from the header of %code%. Return the code with the
+    header blanked out and the dict of parameters, the values of which are
+    overridden by %macros%.
+    '''
     code_lines = code.split('\n')
 
     configs = {}
@@ -57,30 +64,215 @@ def parse(code, macros={}):
                 configs[name] = macros.get(name, value)
 
         elif line.startswith('synch'):
-            code = "\n".join(code_lines[i:])
+            # Blank out the header so that the positions in the code stay
+            # the same for the diagnostics.
+            code = "\n".join([' ' * len(l) for l in code_lines[:i]]
+                             + code_lines[i:])
 
-    sync_parser.configs = configs
+    return code, configs
 
-    for name in configs:
-        sync_parser.config_nodes[name] = []
 
-    lexer = sync_lexer.build()
-    parser = sync_parser.build()
+class Memo(object):
+    '''
+    In-memory LRU memo of processed synchronisers keyed by (code, macros).
 
-    sync_ast = parser.parse(code, lexer=lexer)
-    sync_ast.configs = sync_parser.config_nodes
+    An entry is kept serialised, and every hit returns an independent copy of
+    the AST with its passports, so the callers are free to modify it.
 
-    return sync_ast
+    Attributes:
+        maxsize (int): maximum number of entries.
+        hits (int), misses (int), evictions (int): counters.
+    '''
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(code, macros):
+        return (code, tuple(sorted(macros.items())))
+
+    def get(self, k):
+        '''
+        Return a copy of the AST stored for key %k%, or None.
+        '''
+        with self.lock:
+            data = self.entries.get(k)
+            if data is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(k)
+            self.hits += 1
+        return pickle.loads(data)
+
+    def put(self, k, sync_ast):
+        data = pickle.dumps(sync_ast, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[k] = data
+            self.entries.move_to_end(k)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class Compiler(object):
+    '''
+    Synchroniser compiler holding the lexer and the LALR parser built once.
+
+    The object can be kept alive and reused for any number of parse() and
+    process() calls, none of which rebuilds the lexer or the parser tables.
+    The calls can be made from several threads at once.
+
+    The tokens are produced by the PLY lexer (%tokenizer% = 'ply') or by the
+    hand-written scanner (%tokenizer% = 'scanner').
+
+    Attributes:
+        lexer: PLY lexer or <scanner.Lexer>.
+        parser: PLY LALR parser.
+        build_time (float): seconds spent on building the lexer and the
+        parser tables.
+        last_time (float): seconds spent on the latest parse/process call.
+        total_time (float): seconds spent on all parse/process calls.
+        calls (int): number of parse/process calls.
+        cache (<cache.DiskCache>): persistent cache of processed
+        synchronisers, None if disabled.
+        memo (<Memo>): in-memory memo of processed synchronisers, None if
+        disabled.
+        lock (<threading.Lock>): guards the timing statistics.
+    '''
+    tokenizers = {
+        'ply': sync_lexer,
+        'scanner': sync_scanner,
+    }
+
+    def __init__(self, cache=None, memo=None, tokenizer='ply'):
+        if tokenizer not in self.tokenizers:
+            raise ValueError("Unknown tokenizer '%s'" % tokenizer)
+
+        start = time.perf_counter()
+        self.lexer = self.tokenizers[tokenizer].build()
+        self.parser = sync_parser.build()
+        self.build_time = time.perf_counter() - start
+
+        self.last_time = 0.
+        self.total_time = 0.
+        self.calls = 0
+        self.cache = cache
+        self.memo = memo
+        self.lock = threading.Lock()
+
+    def _parse(self, code, macros):
+        code, configs = read_configs(code, macros)
+
+        # Each compilation gets its own lexer state and parser context, the
+        # parser tables are shared.
+        lexer = self.lexer.clone()
+        lexer.lineno = 1
+        lexer.ctx = sync_parser.Context(configs)
+        return self.parser.parse(code, lexer=lexer)
+
+    def _account(self, start):
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.last_time = elapsed
+            self.total_time += elapsed
+            self.calls += 1
+
+    def parse(self, code, macros={}):
+        '''
+        Parse %code% into the synchroniser AST.
+        '''
+        start = time.perf_counter()
+        try:
+            with sync_types.variable_names(), sync_types.label_table():
+                return self._parse(code, macros)
+        finally:
+            self._account(start)
+
+    def process(self, code, macros={}):
+        '''
+        Parse %code% and build the input/output passports of the synchroniser.
+        On a memo or cache hit lexing, parsing and type inference are skipped.
+        '''
+        start = time.perf_counter()
+        try:
+            # The records of a compilation, loaded ones included, share a
+            # label table of their own (see types.label_table).
+            with sync_types.label_table():
+                return self._process(code, macros)
+        finally:
+            self._account(start)
+
+    def _process(self, code, macros):
+        if self.memo is not None:
+            mk = Memo.key(code, macros)
+            sync_ast = self.memo.get(mk)
+            if sync_ast is not None:
+                return sync_ast
+
+        sync_ast = None
+        if self.cache is not None:
+            k = sync_cache.key(code, macros)
+            entry = self.cache.get(k)
+            if entry is not None:
+                sync_ast = entry[0]
+
+        if sync_ast is None:
+            with sync_types.variable_names():
+                sync_ast = self._parse(code, macros)
+                sync_analysis.build(sync_ast)
+
+            if self.cache is not None:
+                self.cache.put(k, sync_ast)
+
+        if self.memo is not None:
+            self.memo.put(mk, sync_ast)
+        return sync_ast
+
+    def passport(self, code, macros={}):
+        '''
+        Process %code% and return its <passports.Passport>.
+        '''
+        return sync_passports.from_ast(self.process(code, macros))
+
+
+default_compiler = None
+default_lock = threading.Lock()
+
+
+def get_compiler():
+    '''
+    Return the shared compiler used by the module-level parse() and process(),
+    building it on the first call.
+    '''
+    global default_compiler
+    with default_lock:
+        if default_compiler is None:
+            default_compiler = Compiler()
+    return default_compiler
+
+
+def parse(code, macros={}):
+    return get_compiler().parse(code, macros)
+
+
+def passport(code, macros={}):
+    return get_compiler().passport(code, macros)
 
 
 def process(code, macros={}):
     #try:
-    sync_ast = parse(code, macros)
+    sync_ast = get_compiler().process(code, macros)
     #except sync_exn.ParseError as err:
     #    print(err.message(code))
     #except sync_exn.DuplicatesError as err:
     #    print(err.message(code))
 
-    sync_intab.build(sync_ast)
-    sync_outtab.build(sync_ast)
     return sync_ast
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+'''
+Dispatch index of the transitions of a synchroniser.
+
+Finding the transitions a message may fire in the AST means scanning all
+the scopes of the current state and comparing the ports and the variants
+of the conditions. The index keeps, for every state (by number), input
+channel and message tag, the tuple of the candidate transitions in order of
+priority: on: before elseon:, the order of the source in a scope, the else
+transitions after the others. Handling a message takes three lookups:
+
+    index.table[state][port][tag]
+
+A data message is tagged with its variant name (None if the message is not
+named), a segmark with SEGMARK. The candidates of a tag are the transitions
+the condition of which may match the message of the tag: p.?v(...) for
+variant v, p.(...) for any data message, p.@d for segmarks, p and p.else for
+any message. The labels and the guard are left to check.
+
+The index also keeps the wait set of every state: the bitmask of the input
+channels with at least one transition (bit i for the i-th channel declared),
+and the tags each of them accepts. A scheduler reads only from the channels
+of the mask; the messages on the others stay queued until the state
+changes.
+'''
+
+from . import ast
+
+
+# Tag of segmarks, not a variant name.
+SEGMARK = '@'
+
+
+class Candidates(dict):
+    '''
+    Candidate transitions on a channel in a state by message tag. The tags
+    not in the dict, the variants no transition names, get %default%.
+    '''
+    __slots__ = ('default',)
+
+    def __missing__(self, tag):
+        return self.default
+
+
+class Index(object):
+    '''
+    Dispatch index.
+
+    Attributes:
+        states (tuple of str): state names, numbered in order of the source.
+        number (dict of str:int): state names to their numbers.
+        ports (tuple of str): input channel names, in order of declaration.
+        bits (dict of str:int): input channel names to their bits.
+        table (list of dict of str:<Candidates>): the candidates of every
+            state number and input channel.
+        wait (list of int): the wait set of every state number, the bitmask
+            of the input channels with transitions.
+        tags (list of dict of str:frozenset): the tags accepted on the
+            input channels of %wait% of every state number. None in a set
+            stands for the variants no transition names.
+    '''
+    def __init__(self, states, ports, table):
+        self.states = states
+        self.number = dict((s, i) for i, s in enumerate(states))
+        self.ports = ports
+        self.bits = dict((p, 1 << i) for i, p in enumerate(ports))
+        self.table = table
+
+        self.wait = []
+        self.tags = []
+        for row in table:
+            mask = 0
+            tags = {}
+            for port, cands in row.items():
+                accepted = frozenset(tag for tag, c in cands.items() if c)
+                if accepted:
+                    mask |= self.bits[port]
+                    tags[port] = accepted
+            self.wait.append(mask)
+            self.tags.append(tags)
+
+    def lookup(self, state, port, tag):
+        '''
+        Return the candidates for a message tagged %tag% received from
+        %port% in state number %state%.
+        '''
+        return self.table[state][port][tag]
+
+    def accepts(self, state, port, tag):
+        '''
+        Return True if a message tagged %tag% received from %port% may fire
+        a transition in state number %state%.
+        '''
+        return bool(self.table[state][port][tag])
+
+    def waits(self, state):
+        '''
+        Return the names of the input channels of the wait set of state
+        number %state%.
+        '''
+        mask = self.wait[state]
+        return tuple(p for p in self.ports if mask & self.bits[p])
+
+
+def accepts(cond, tag):
+    '''
+    Return True if condition %cond% may match the messages tagged %tag%,
+    '' standing for the variants not named in the patterns.
+    '''
+    if isinstance(cond, ast.CondDataMsg):
+        return tag != SEGMARK and (not cond.choice.value or cond.choice.value == tag)
+    if isinstance(cond, ast.CondSegmark):
+        return tag == SEGMARK
+    return True
+
+
+def ordered(state):
+    '''
+    Generate the transitions of %state% in order of priority.
+    '''
+    for order in state.trans_orders:
+        others = []
+        for trans in order.trans_stmt:
+            if isinstance(trans.condition, ast.CondElse):
+                others.append(trans)
+            else:
+                yield trans
+        yield from others
+
+
+def build(sync_ast, item=None):
+    '''
+    Build the dispatch index of processed %sync_ast%. The candidates are
+    item(trans) for every <ast.Trans>, the transitions themselves if %item%
+    is None. Return <Index>.
+    '''
+    states = sync_ast.states.states
+    ports = tuple(p.name.value for p in sync_ast.inputs.ports)
+    table = []
+    for state in states:
+        by_port = dict((p, []) for p in ports)
+        for trans in ordered(state):
+            by_port[trans.port.value].append(trans)
+
+        row = {}
+        for port, trans_list in by_port.items():
+            items = [(t, item(t) if item else t) for t in trans_list]
+            tags = set(t.condition.choice.value for t in trans_list
+                       if isinstance(t.condition, ast.CondDataMsg)
+                       and t.condition.choice.value)
+            tags.add(SEGMARK)
+
+            cands = Candidates()
+            for tag in tags:
+                cands[tag] = tuple(i for t, i in items if accepts(t.condition, tag))
+            cands.default = tuple(i for t, i in items if accepts(t.condition, ''))
+            # Unnamed messages are frequent, keep them off __missing__.
+            cands[None] = cands.default
+            row[port] = cands
+        table.append(row)
+
+    return Index(tuple(s.name.value for s in states), ports, table)
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+'''
+Execute synchronisers: compile a processed AST (see compiler.process) into a
+state machine consuming messages one by one.
+
+Every transition is compiled once into a flat <Transition>: the pattern to
+match and two Python functions (translated as in codegen.py), the guard and
+the actions. Stepping the machine looks up the candidate transitions of the
+current state, the port and the variant of the message in the dispatch
+index (see dispatch.py), nothing of the AST is visited per message.
+
+The control state and the state variables are kept packed in one integer
+(see layout.py), the store variables in a dict. The compiled functions read
+and write the bit fields of the word with the shifts and the masks of the
+layout inlined:
+
+    a.(x) & [cnt + x > 2] { set cnt = [cnt + x]; goto s1; }
+        # compiled, with two states and int(8) cnt, to
+        def f(word, store, msg):
+            v_cnt = (word >> 1) & 255
+            v_x = msg['x']
+            return ((v_cnt + v_x) > 2)
+
+        def f(word, store, msg):
+            v_cnt = (word >> 1) & 255
+            v_x = msg['x']
+            v_cnt = (v_cnt + v_x) & 255
+            word = (word & -512) | (v_cnt << 1) | 1
+            return word, []
+
+Messages are <Data> (a variant name, None if not named, and a dict of the
+labels) and <Segmark> (the depth). A transition is chosen as follows:
+
+  - the scopes of the state are tried in order, on: first, then elseon:;
+  - in a scope, the transitions on the port are tried in order of the
+    source, the else transitions after the others;
+  - p.?v(x, y || t) matches the data messages of variant v carrying labels
+    x and y, p.(x, y || t) the data messages of any variant, p.@d the
+    segmarks, p and p.else any message;
+  - the first transition which matches and the guard of which holds fires.
+
+The transition assigns the variables of the set statement in order, sends
+the messages (built with the new values of the variables) and moves to the
+first state of the goto statement, or stays in the current one. THIS is the
+record of the data message received, the empty record for a segmark. A
+message no transition accepts is left to the caller: step() returns None.
+'''
+
+from . import ast
+from . import codegen
+from . import dispatch
+from . import types
+from . import layout as sync_layout
+
+
+class Data(object):
+    '''
+    Data message.
+
+    Attributes:
+        variant (str): variant name, None if the message is not named.
+        labels (dict of str:object): values of the labels, integers or
+            records (dicts).
+    '''
+    __slots__ = ('variant', 'labels')
+
+    def __init__(self, variant, labels):
+        self.variant = variant
+        self.labels = labels
+
+    def __eq__(self, other):
+        return type(other) is Data and self.variant == other.variant \
+            and self.labels == other.labels
+
+    def __repr__(self):
+        return 'Data(%r, %r)' % (self.variant, self.labels)
+
+
+class Segmark(object):
+    '''
+    Segmentation mark of depth %depth%.
+    '''
+    __slots__ = ('depth',)
+
+    def __init__(self, depth):
+        self.depth = depth
+
+    def __eq__(self, other):
+        return type(other) is Segmark and self.depth == other.depth
+
+    def __repr__(self):
+        return 'Segmark(%r)' % self.depth
+
+
+class Transition(object):
+    '''
+    Compiled transition. The functions take the packed state %word%, the
+    store variables %store% (a dict) and the values of the labels of the
+    message matched %msg% (the depth of the segmark for p.@d). The variant
+    is matched by the dispatch index.
+
+    Attributes:
+        labels (frozenset of str): labels matched by p.(...).
+        depth (str): variable bound to the depth of the segmark by p.@d,
+            None for the other conditions.
+        guard (function or None): guard(word, store, msg) returns the truth
+            value of the guard, None stands for an empty guard.
+        fire (function): fire(word, store, msg) performs the actions: it
+            updates %store% and returns the new word and the list of the
+            messages sent.
+        target (int): state to go to, None to stay.
+    '''
+    __slots__ = ('labels', 'depth', 'guard', 'fire', 'target')
+
+
+class Translator(codegen.Translator):
+    '''
+    Translate the expressions of a transition with the symbol table
+    %symtab% to Python code reading the state packed by <layout.Layout>
+    %layout%. %this% is the code of the record received, None for a
+    segmark, and %tail% the name of the tail matched, None if none.
+    '''
+    def __init__(self, symtab, layout, this, matched, tail):
+        super().__init__(symtab)
+        self.layout = layout
+        self.this = this
+        self.matched = matched
+        self.tail = tail
+        self.used = []
+
+    def bind(self, name):
+        entry = self.symtab.get(name)
+        if entry.readonly:
+            return "v_%s = msg[%r]" % (name, name)
+        f = self.layout.fields[name]
+        if f.shift:
+            return "v_%s = (word >> %d) & %d" % (name, f.shift, f.mask)
+        return "v_%s = word & %d" % (name, f.mask)
+
+    def function(self, names, body, result):
+        lines = ['def f(word, store, msg):']
+        lines += ['    ' + self.bind(n) for n in names]
+        lines += ['    ' + l for l in body]
+        lines.append('    return %s' % result)
+        return '\n'.join(lines) + '\n'
+
+    def int_exp(self, node):
+        '''
+        Return the code of integer expression %node%, the variables of
+        which are bound on entry.
+        '''
+        self.names(node.exp, self.used)
+        return self.exp(node.exp)
+
+    def load(self, name):
+        '''
+        Return the code of the value of variable %name% in a data
+        expression: the tail, a label, an enum member or a variable.
+        '''
+        if name == self.tail:
+            return "{k: v for k, v in msg.items() if k not in %r}" \
+                % (tuple(sorted(self.matched)),)
+        entry = self.symtab.get(name)
+        if entry.readonly:
+            if isinstance(entry.ast, ast.IntExp):
+                return repr(entry.ast.exp.value)
+            return "msg[%r]" % name
+        if name in self.layout.fields:
+            if name not in self.used:
+                self.used.append(name)
+            return "v_%s" % name
+        if isinstance(entry.type, types.Number):
+            return "v_%s" % name
+        return "store[%r]" % name
+
+    def record(self, data_exp, body):
+        '''
+        Append the code building the record of %data_exp% to %body%,
+        return the name of the record.
+        '''
+        r = 'r%d' % len(body)
+        body.append('%s = {}' % r)
+        for item in data_exp.items:
+            if isinstance(item, ast.ItemThis):
+                if self.this is not None:
+                    body.append('%s.update(%s)' % (r, self.this))
+            elif isinstance(item, ast.ItemVar):
+                body.append('%s.update(%s)' % (r, self.load(item.name.value)))
+            elif isinstance(item, ast.ItemExpand):
+                body.append('%s[%r] = %s' % (r, item.name.value,
+                                             self.load(item.name.value)))
+            elif isinstance(item.value, ast.IntExp):
+                body.append('%s[%r] = %s' % (r, item.label.value,
+                                             self.int_exp(item.value)))
+            else:
+                body.append('%s[%r] = %s' % (r, item.label.value,
+                                             self.load(item.value.value)))
+        return r
+
+    def actions(self, actions, target):
+        '''
+        Return the source of the function performing %actions% and moving
+        to state number %target% (None to stay).
+        '''
+        fields = self.layout.fields
+        body = []
+        written = []
+        sent = []
+        for action in actions:
+            if isinstance(action, ast.Assign):
+                name = action.lhs.value
+                if isinstance(action.rhs, ast.IntExp):
+                    code = self.int_exp(action.rhs)
+                    if name in fields:
+                        code = '%s & %d' % (code, fields[name].mask)
+                        if name not in written:
+                            written.append(name)
+                    body.append('v_%s = %s' % (name, code))
+                else:
+                    r = self.record(action.rhs, body)
+                    body.append('store[%r] = %s' % (name, r))
+            elif isinstance(action, ast.Send):
+                msg = action.msg
+                if isinstance(msg, ast.MsgData):
+                    r = self.record(msg.data_exp, body)
+                    variant = msg.choice.value if msg.choice else None
+                    sent.append('(%r, Data(%r, %s))'
+                                % (action.port.value, variant, r))
+                elif isinstance(msg, ast.MsgSegmark):
+                    depth = msg.depth
+                    code = self.int_exp(depth) if isinstance(depth, ast.IntExp) \
+                        else self.load(depth.value)
+                    sent.append('(%r, Segmark(%s))' % (action.port.value, code))
+                else:
+                    sent.append('(%r, Data(None, {}))' % action.port.value)
+
+        # Write the fields back at once.
+        keep = 0
+        parts = []
+        for name in written:
+            f = fields[name]
+            keep |= f.mask << f.shift
+            parts.append('(v_%s << %d)' % (name, f.shift) if f.shift
+                         else 'v_%s' % name)
+        if target is not None:
+            keep |= self.layout.control.mask
+            parts.append(repr(target))
+        if parts:
+            body.append('word = (word & %d) | %s' % (~keep, ' | '.join(parts)))
+
+        # Bind the variables read before they are assigned.
+        names = [n for n in self.used if self.symtab.get(n).readonly
+                 or n in fields]
+        return self.function(names, body, 'word, [%s]' % ', '.join(sent))
+
+
+def compile_actions(source):
+    '''
+    Compile %source% defining the function 'f' of the actions of a
+    transition and return the function.
+    '''
+    namespace = {'Data': Data, 'Segmark': Segmark}
+    exec(compile(source, '<sync>', 'exec'), namespace)
+    return namespace['f']
+
+
+def compile_trans(trans, layout, states):
+    '''
+    Compile transition %trans% for the state packed by <layout.Layout>
+    %layout%. %states% maps the state names to their numbers. Return
+    <Transition>.
+    '''
+    t = Transition()
+    cond = trans.condition
+    t.labels = frozenset()
+    t.depth = None
+    tail = None
+    this = 'msg'
+    if isinstance(cond, ast.CondDataMsg):
+        t.labels = frozenset(l.value for l in cond.labels)
+        tail = cond.tail.value
+    elif isinstance(cond, ast.CondSegmark):
+        t.depth = cond.depth.value
+        this = None
+
+    tr = Translator(trans.symtab, layout, this, t.labels, tail)
+    source = tr.guard(trans.guard)
+    t.guard = codegen.compile_source(source) if source is not None else None
+
+    t.target = None
+    for action in trans.actions:
+        if isinstance(action, ast.Goto) and action.states:
+            t.target = states[action.states[0].value]
+    t.fire = compile_actions(tr.actions(trans.actions, t.target))
+    return t
+
+
+class Program(object):
+    '''
+    Compiled synchroniser, shared by the machines running it.
+
+    Attributes:
+        name (str): synchroniser name.
+        inputs (tuple of str), outputs (tuple of str): channel names.
+        states (tuple of str): state names, by number.
+        layout (<layout.Layout>): the packed state, its initial value holds
+            the initial state.
+        stores (tuple of str): store variable names.
+        index (<dispatch.Index>): the <Transition>s by state, input channel
+            and message tag.
+    '''
+    def __init__(self, sync_ast):
+        self.name = sync_ast.name.value
+        self.inputs = tuple(p.name.value for p in sync_ast.inputs.ports)
+        self.outputs = tuple(p.name.value for p in sync_ast.outputs.ports)
+        self.layout = sync_layout.build(sync_ast)
+        self.states = self.layout.states
+        self.stores = tuple(d.name.value for d in sync_ast.decls.decls
+                            if isinstance(d, ast.StoreVar))
+
+        number = dict((s, i) for i, s in enumerate(self.states))
+        self.index = dispatch.build(sync_ast, lambda trans: compile_trans(
+            trans, self.layout, number))
+
+
+class Machine(object):
+    '''
+    Running synchroniser.
+
+    Attributes:
+        program (<Program>): the synchroniser.
+        word (int): the control state and the state variables, packed by
+            program.layout.
+        stores (dict of str:dict): the values of the store variables.
+    '''
+    def __init__(self, program):
+        self.program = program
+        self._states = program.index.table
+        self.reset()
+
+    def reset(self):
+        self.restore((self.program.layout.initial,
+                      dict((n, {}) for n in self.program.stores)))
+
+    def snapshot(self):
+        '''
+        Return the state of the machine, which restore() sets back. The
+        records are never modified in place, so the copy is shallow.
+        '''
+        return self.word, dict(self.stores)
+
+    def restore(self, snapshot):
+        word, stores = snapshot
+        self.word = word
+        self.stores = dict(stores)
+        self._table = self._states[self.program.layout.state(word)]
+
+    @property
+    def current(self):
+        '''
+        Number of the current state.
+        '''
+        return self.program.layout.state(self.word)
+
+    @property
+    def state(self):
+        '''
+        Name of the current state.
+        '''
+        return self.program.states[self.current]
+
+    @property
+    def variables(self):
+        '''
+        Dict of the values of the state and store variables.
+        '''
+        values = self.program.layout.unpack(self.word)
+        values.update(self.stores)
+        return values
+
+    @property
+    def wait(self):
+        '''
+        Wait set of the current state: the bitmask of the input channels
+        step() may accept messages from (see <dispatch.Index>).
+        '''
+        return self.program.index.wait[self.current]
+
+    def step(self, port, msg):
+        '''
+        Consume message %msg% (<Data> or <Segmark>) from input channel
+        %port%. Return the list of the messages sent, the pairs (port,
+        message), or None if no transition accepts %msg%. An undeclared
+        %port% raises ValueError.
+        '''
+        try:
+            row = self._table[port]
+        except KeyError:
+            raise ValueError("unknown input channel '%s', the inputs are %s"
+                             % (port, ', '.join(self.program.inputs))) from None
+        word = self.word
+        store = self.stores
+        if type(msg) is Data:
+            env = msg.labels
+            for t in row[msg.variant]:
+                if t.labels and not t.labels <= env.keys():
+                    continue
+                if t.guard is not None and not t.guard(word, store, env):
+                    continue
+                return self.fire(t, env)
+        else:
+            for t in row[dispatch.SEGMARK]:
+                env = {t.depth: msg.depth} if t.depth is not None else {}
+                if t.guard is not None and not t.guard(word, store, env):
+                    continue
+                return self.fire(t, env)
+        return None
+
+    def fire(self, t, env):
+        self.word, out = t.fire(self.word, self.stores, env)
+        if t.target is not None:
+            self._table = self._states[t.target]
+        return out
+
+
+def build(sync_ast):
+    '''
+    Compile processed %sync_ast% and return a <Machine> in its initial
+    state. More machines of the same synchroniser are made with
+    Machine(machine.program).
+    '''
+    return Machine(Program(sync_ast))
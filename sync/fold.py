@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+'''
+Constant folding and algebraic simplification of integer expressions.
+
+The pass substitutes enum members and integer macros with their values,
+evaluates constant subexpressions and removes the operations having no
+effect:
+
+    [N - 1 == 3 && x * 1 + 0 > 2 + 1]   # N = 4
+        # folded to
+    [x > 3]
+
+A guard folded to a non-zero constant is always true and is removed (the
+transition gets an empty guard). A guard folded to 0 is always false: the
+transition can never fire and is reported dead.
+
+Folding follows the integer semantics of codegen.py. Division by zero and
+shifts by a negative or too large amount are left to run time, and so are
+the operands which may raise: [(x / y) * 0] is not folded to [0].
+'''
+
+import operator
+
+from . import ast
+from . import intexp
+
+
+binary = {
+    '+': operator.add, '-': operator.sub, '*': operator.mul,
+    '/': operator.floordiv, '%': operator.mod,
+    '<<': operator.lshift, '>>': operator.rshift,
+    '|': operator.or_, '&': operator.and_, '^': operator.xor,
+    '<': lambda a, b: int(a < b), '>': lambda a, b: int(a > b),
+    '==': lambda a, b: int(a == b), '!=': lambda a, b: int(a != b),
+    '<=': lambda a, b: int(a <= b), '>=': lambda a, b: int(a >= b),
+    '&&': lambda a, b: int(bool(a) and bool(b)),
+    '||': lambda a, b: int(bool(a) or bool(b)),
+}
+
+unary = {
+    '-': operator.neg,
+    '!': lambda a: int(not a),
+}
+
+# Operators yielding 0 or 1.
+bool_ops = ('<', '>', '==', '!=', '<=', '>=', '&&', '||', '!')
+
+# x op c = x
+right_units = {'+': 0, '-': 0, '*': 1, '/': 1, '<<': 0, '>>': 0, '|': 0, '^': 0}
+# c op x = x
+left_units = {'+': 0, '*': 1, '|': 0, '^': 0}
+# x op c = c op x = c
+zeros = {'*': 0, '&': 0}
+
+max_shift = 64
+
+
+def is_const(node):
+    return isinstance(node, ast.NUMBER)
+
+
+def is_bool(node):
+    return isinstance(node, (ast.BinaryOp, ast.UnaryOp)) and node.op in bool_ops
+
+
+def may_fault(exp):
+    '''
+    Return True if evaluating expression tree %exp% may raise at run time:
+    it divides by a variable or by 0, or shifts by a variable or a negative
+    amount.
+    '''
+    stack = [exp]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast.BinaryOp):
+            right = node.right
+            if node.op in ('/', '%') \
+                    and not (is_const(right) and right.value != 0):
+                return True
+            if node.op in ('<<', '>>') \
+                    and not (is_const(right) and right.value >= 0):
+                return True
+            stack.append(node.left)
+            stack.append(right)
+        elif isinstance(node, ast.UnaryOp):
+            stack.append(node.operand)
+    return False
+
+
+def size(exp):
+    '''
+    Return the number of operations in expression tree %exp%.
+    '''
+    n = 0
+    stack = [exp] if exp is not None else []
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast.BinaryOp):
+            n += 1
+            stack.append(node.left)
+            stack.append(node.right)
+        elif isinstance(node, ast.UnaryOp):
+            n += 1
+            stack.append(node.operand)
+    return n
+
+
+class Folder(object):
+    '''
+    Fold the expressions of a transition with the symbol table %symtab%.
+    '''
+    def __init__(self, symtab):
+        self.symtab = symtab
+
+    def fold(self, node):
+        '''
+        Return the folded expression tree %node%. The tree is updated in
+        place.
+        '''
+        if isinstance(node, ast.ID):
+            entry = self.symtab.get(node.value)
+            if entry.readonly and isinstance(entry.ast, ast.IntExp):
+                return ast.NUMBER(entry.ast.exp.value, coord=node.coord)
+            return node
+
+        if isinstance(node, ast.TERM):
+            if type(node.value) is int:
+                return ast.NUMBER(node.value, coord=node.coord)
+            return node
+
+        if isinstance(node, ast.UnaryOp):
+            return self.fold_unary(node)
+
+        if isinstance(node, ast.BinaryOp):
+            return self.fold_binary(node)
+
+        return node
+
+    def fold_unary(self, node):
+        node.operand = operand = self.fold(node.operand)
+
+        if is_const(operand):
+            return ast.NUMBER(unary[node.op](operand.value))
+
+        # --x = x
+        if node.op == '-' and isinstance(operand, ast.UnaryOp) \
+                and operand.op == '-':
+            return operand.operand
+
+        return node
+
+    def fold_binary(self, node):
+        op = node.op
+        node.left = left = self.fold(node.left)
+        node.right = right = self.fold(node.right)
+
+        if is_const(left) and is_const(right):
+            a, b = left.value, right.value
+            if not ((op == '/' or op == '%') and b == 0
+                    or (op == '<<' or op == '>>') and not 0 <= b < max_shift):
+                return ast.NUMBER(binary[op](a, b))
+            return node
+
+        if is_const(right):
+            c = right.value
+            if right_units.get(op) == c:
+                return left
+            # %left% is evaluated first at run time, it is dropped only if it
+            # cannot raise.
+            if (zeros.get(op) == c or op == '%' and c == 1) \
+                    and not may_fault(left):
+                return ast.NUMBER(0)
+            if op in ('&&', '||'):
+                return self.fold_logic(op, c, left, node, not may_fault(left))
+            if op in ('+', '-'):
+                return self.reassociate(node)
+
+        elif is_const(left):
+            c = left.value
+            if left_units.get(op) == c:
+                return right
+            if zeros.get(op) == c and not may_fault(right):
+                return left
+            if op == '-' and c == 0:
+                return self.fold(ast.UnaryOp('-', right))
+            if op in ('&&', '||'):
+                return self.fold_logic(op, c, right, node)
+
+        return node
+
+    def fold_logic(self, op, c, other, node, drop=True):
+        '''
+        Fold %node% = c op other (or other op c) with constant %c%. If %c%
+        decides the value, %other% is dropped only if %drop% is set.
+        '''
+        if bool(c) != (op == '&&'):
+            return ast.NUMBER(int(bool(c))) if drop else node
+        # The constant does not decide, the value is that of %other% if it is
+        # 0 or 1 already.
+        return other if is_bool(other) else node
+
+    def reassociate(self, node):
+        '''
+        (x + c1) + c2 = x + (c1 + c2), the same for subtraction.
+        '''
+        left = node.left
+        if not (isinstance(left, ast.BinaryOp) and left.op in ('+', '-')
+                and is_const(left.right)):
+            return node
+
+        c1 = left.right.value if left.op == '+' else -left.right.value
+        c2 = node.right.value if node.op == '+' else -node.right.value
+        c = c1 + c2
+        if c == 0:
+            return left.left
+        if c > 0:
+            return ast.BinaryOp('+', left.left, ast.NUMBER(c))
+        return ast.BinaryOp('-', left.left, ast.NUMBER(-c))
+
+    def fold_intexp(self, node):
+        '''
+        Fold the expression of IntExp %node% in place.
+        '''
+        if node.exp is not None:
+            node.exp = self.fold(node.exp)
+            node.args = [i.value for i in intexp.ids(node.exp)]
+
+
+class Report(object):
+    '''
+    Outcome of the folding pass.
+
+    Attributes:
+        expressions (int): number of expressions folded.
+        operations (int): number of operations eliminated.
+        removed (list of <ast.Trans>): transitions whose guards were always
+            true and were removed.
+        dead (list of <ast.Trans>): transitions whose guards are always false.
+    '''
+    def __init__(self):
+        self.expressions = 0
+        self.operations = 0
+        self.removed = []
+        self.dead = []
+
+    def show(self):
+        return ("%d expressions, %d operations eliminated, %d guards removed, "
+                "%d dead transitions" % (self.expressions, self.operations,
+                                         len(self.removed), len(self.dead)))
+
+
+def fold_trans(trans, report):
+    '''
+    Fold the expressions of transition %trans%, updating %report%.
+    '''
+    folder = Folder(trans.symtab)
+
+    for node in intexp.find(trans):
+        before = size(node.exp)
+        folder.fold_intexp(node)
+        report.expressions += 1
+        report.operations += before - size(node.exp)
+
+    guard = trans.guard
+    if is_const(guard.exp):
+        if guard.exp.value:
+            guard.exp = None
+            report.removed.append(trans)
+        else:
+            report.dead.append(trans)
+
+
+def build(sync_ast):
+    '''
+    Fold the integer expressions of all transitions of %sync_ast%, which
+    should be processed (see compiler.process). The AST is updated in place.
+    Return <Report>.
+    '''
+    report = Report()
+    for state in sync_ast.states.states:
+        for order in state.trans_orders:
+            for trans in order.trans_stmt:
+                fold_trans(trans, report)
+    return report
@@ -7,91 +7,130 @@ from . import ast
 from . import symtab
 from . import exception as exn
 from . import types
+from . import intexp
+
+
+def check_store_type(node, intab):
+    '''
+    Check the input channel of store type %node% is declared.
+    '''
+    port = node.port
+    if not intab.get(port.value):
+        raise exn.NotDeclaredError("input channel '%s' not declared"
+                % port.value, port.coord)
+
+
+def check_send(node, outtab):
+    '''
+    Check the output channel of send %node% is declared.
+    '''
+    port = node.port
+    if not outtab.get(port.value):
+        raise exn.NotDeclaredError("output channel '%s' not declared"
+                % port.value, port.coord)
+
+
+def input_term(node, intab, terms):
+    '''
+    Check the input channel of transition %node% is declared and add the
+    input term of the transition to %terms%, a dict of the channel entries
+    to the dicts of variant: [<Record>, ...]. The terms are merged into the
+    channel types by merge_input_terms.
+    '''
+    symtab = node.symtab
+    port = node.port
+    cond = node.condition
+
+    port_ent = intab.get(port.value)
+    if not port_ent:
+        raise exn.NotDeclaredError("input channel '%s' not declared"
+                % port.value, port.coord)
+
+    # Build input term for port
+    if isinstance(cond, ast.CondDataMsg):
+        if not cond.labels and not cond.tail.value:
+            parts = [types.Record(labels={}, tails=[types.Variable()])]
+        else:
+            parts = []
+
+        parts.append(types.Record(labels=dict((l.value, symtab.get(l.value).type)
+                                              for l in cond.labels), tails=[]))
+
+        tail = cond.tail
+        if tail.value:
+            tail_ent = symtab.get(tail.value)
+            tail_type = types.find(tail_ent.type)
+            if isinstance(tail_type, types.Number):
+                parts.append(types.Record(labels={tail.value:tail_ent.type}, tails=[]))
+            if isinstance(tail_type, types.Record):
+                parts.append(tail_type)
+            if isinstance(tail_type, types.Variable):
+                parts.append(types.Record(labels={}, tails=[tail_ent.type]))
+
+        rec = types.merge_records(parts)
+
+        choice = cond.choice
+        if choice.value:
+            l = choice.value
+        else:
+            l = 'uniq'
+
+        terms.setdefault(port_ent, {}).setdefault(l, []).append(rec)
+
+
+def merge_input_terms(terms):
+    '''
+    Merge the input terms %terms% collected by input_term into the types of
+    the channels, every channel type is built once.
+
+    The transitions on the same variant of a channel match the same
+    messages, so the terms of a label are unified, and so are the tails:
+    port type always has the only tail.
+        p.(x, y || t)
+        p.(z || h)
+    #=> p.type.variants['uniq'] = { x, y, z | j }, t = h = j
+        t.type = { z | j }
+        h.type = { x, y | j }
+    Tail types (t, h) are calculated in outtab.py.
+    After that THIS.type is updated. THIS.type is the same for all
+    transitions on port %p.
+    '''
+    for port_ent, variants in terms.items():
+        port_type = port_ent.type.merge_variants(variants,
+                                                 merge=types.unify_records)
+        fixed = {}
+        for l in variants:
+            var_rec = port_type.variants[l]
+            if len(var_rec.tails) > 1:
+                fixed[l] = var_rec.with_tails(types.unify_tails(var_rec.tails))
+
+        port_ent.type = port_type.with_variants(fixed) if fixed else port_type
 
 
 class CheckAST(ast.NodeVisitor):
+    collect = False
+
     def __init__(self, i, o):
         self.intab = i
         self.outtab = o
+        self.terms = {}
 
     def visit_StoreType(self, node, _):
-        intab = self.intab
-        port = node.port
-        if not intab.get(port.value):
-            raise exn.NotDeclaredError("input channel '%s' not declared"
-                    % port.value, port.coord)
+        check_store_type(node, self.intab)
 
     def visit_Trans(self, node, _):
-        symtab = node.symtab
-        intab = self.intab
-        port = node.port
-        cond = node.condition
-
-        ce = CheckExp(symtab)
+        ce = CheckExp(node.symtab)
         ce.traverse(node)
 
-        port_ent = intab.get(port.value)
-        if not port_ent:
-            raise exn.NotDeclaredError("input channel '%s' not declared"
-                    % port.value, port.coord)
-
-        # Build input term for port
-        if isinstance(cond, ast.CondDataMsg):
-            if not cond.labels and not cond.tail.value:
-                rec = types.Record(labels={}, tails=[types.Variable()])
-            else:
-                rec = types.Record(labels={}, tails=[])
-
-            for l in cond.labels:
-                l_ent = symtab.get(l.value)
-                rec.merge(types.Record(labels={l.value:l_ent.type}, tails=[]))
-
-            tail = cond.tail
-            if tail.value:
-                tail_ent = symtab.get(tail.value)
-                if isinstance(tail_ent.type, types.Number):
-                    rec.merge(types.Record(labels={tail.value:tail_ent.type}, tails=[]))
-                if isinstance(tail_ent.type, types.Record):
-                    rec.merge(tail_ent.type)
-                if isinstance(tail_ent.type, types.Variable):
-                    rec.merge(types.Record(labels={}, tails=[tail_ent.type]))
-
-
-            choice = cond.choice
-            if choice.value:
-                l = choice.value
-            else:
-                l = 'uniq'
-
-            ch = types.Choice(variants={l:rec}, tails=[])
-            port_ent.type.merge(ch)
-            # Fix port type tail when there are several transitions
-            # on port %p. Port type always has the only tail.
-            #   p.(x, y || t)
-            #   p.(z || h)
-            # #=> p.type.variants['uniq'] = { x, y, z | j }
-            #     t.type = { z | j }
-            #     h.type = { x, y | j }
-            # Tail types (t, h) are calculated in outtab.py.
-            # After that THIS.type is updated. THIS.type is the same for all
-            # transitions on port %p.
-            port_tails = port_ent.type.variants[l].tails
-            if len(port_tails) > 1:
-                port_ent.type.variants[l].tails = [types.Variable()]
+        input_term(node, self.intab, self.terms)
 
     def visit_Send(self, node, _):
-        outtab = self.outtab
-        port = node.port
-        if not self.outtab.get(port.value):
-            raise exn.NotDeclaredError("output channel '%s' not declared"
-                    % port.value, port.coord)
-
-    #--------------------------------------------------
-    def generic_visit(self, node, children):
-        return None
+        check_send(node, self.outtab)
 
 
 class CheckExp(ast.NodeVisitor):
+    collect = False
+
     def __init__(self, s):
         self.symtab = s
 
@@ -107,7 +146,7 @@ class CheckExp(ast.NodeVisitor):
             raise exn.NotAssignableError("cannot assign to variable '%s' declared"
                     % dest.value, dest.coord, dest_ent.ast.coord)
 
-        if isinstance(dest_ent.type, types.Number):
+        if isinstance(types.find(dest_ent.type), types.Number):
             if not isinstance(exp, ast.IntExp):
                 raise exn.TypeError("Type mismatch as data expression "
                         "assigned to variable '%s' declared integer"
@@ -120,18 +159,20 @@ class CheckExp(ast.NodeVisitor):
 
     def visit_IntExp(self, node, _):
         symtab = self.symtab
-        terms = node.terms
-        for arg_ast in [terms[t] for t in terms if isinstance(terms[t], ast.ID)]:
+        for arg_ast in intexp.ids(node.exp):
             arg = arg_ast.value
             arg_ent = symtab.get(arg)
             if arg_ent is None:
                 raise exn.NotDeclaredError("variable '%s' not declared"
                         % arg, arg_ast.coord)
 
-            if arg_ent.readonly and isinstance(arg_ent.type, types.Variable):
-                arg_ent.type = types.Int()
+            # The entry keeps its variable, bound by unify: the types are
+            # checked through find().
+            arg_type = types.find(arg_ent.type)
+            if arg_ent.readonly and isinstance(arg_type, types.Variable):
+                arg_type = types.unify(arg_ent.type, types.Int())
 
-            if not isinstance(arg_ent.type, types.Number):
+            if not isinstance(arg_type, types.Number):
                     raise exn.TypeError("Type mismatch as variable '%s' found "
                             "in integer expression declared data"
                             % arg, arg_ast.coord, arg_ent.ast.coord)
@@ -145,10 +186,12 @@ class CheckExp(ast.NodeVisitor):
                     raise exn.NotDeclaredError("variable '%s' not declared"
                             % item.name.value, item.name.coord)
 
-                if isinstance(item_ent.type, types.Variable):
-                    item_ent.type = types.Record(labels={}, tails=[types.Variable()])
+                item_type = types.find(item_ent.type)
+                if isinstance(item_type, types.Variable):
+                    item_type = types.unify(item_ent.type,
+                            types.Record(labels={}, tails=[types.Variable()]))
 
-                if isinstance(item_ent.type, types.Number):
+                if isinstance(item_type, types.Number):
                     raise exn.TypeError("Type mismatch as variable '%s' "
                             "found in data expression declared integer"
                             % item.name.value, item.name.coord, item_ent.ast.coord)
@@ -158,10 +201,6 @@ class CheckExp(ast.NodeVisitor):
                     raise exn.NotDeclaredError("variable '%s' not declared"
                             % item.name.value, item.name.coord)
 
-    #--------------------------------------------------
-    def generic_visit(self, node, children):
-        return None
-
 
 def build(sync_ast):
     intab = sync_ast.inputs.symtab
@@ -169,3 +208,4 @@ def build(sync_ast):
 
     ca = CheckAST(intab, outtab)
     ca.traverse(sync_ast)
+    merge_input_terms(ca.terms)
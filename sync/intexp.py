@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+'''
+Integer expressions: walking and printing the expression trees of
+ast.IntExp nodes.
+'''
+
+from . import ast
+
+
+binary_ops = ('+', '-', '*', '/', '%', '<<', '>>', '|', '&', '^',
+              '<', '>', '==', '!=', '<=', '>=', '&&', '||')
+
+unary_ops = ('-', '!')
+
+
+def leaves(exp):
+    '''
+    Generate the leaves (ID, NUMBER and TERM nodes) of expression tree %exp%
+    from left to right.
+    '''
+    stack = [exp] if exp is not None else []
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast.BinaryOp):
+            stack.append(node.right)
+            stack.append(node.left)
+        elif isinstance(node, ast.UnaryOp):
+            stack.append(node.operand)
+        else:
+            yield node
+
+
+def ids(exp):
+    '''
+    Generate the variable references (ID nodes) of expression tree %exp%.
+    '''
+    for leaf in leaves(exp):
+        if isinstance(leaf, ast.ID):
+            yield leaf
+
+
+def find(node):
+    '''
+    Generate the IntExp nodes in the subtree of %node% in order of
+    appearance. Expression trees are not entered.
+    '''
+    stack = [node]
+    while stack:
+        n = stack.pop()
+        if isinstance(n, ast.IntExp):
+            yield n
+        else:
+            stack.extend(c for _, c in reversed(n.children(expand=True)))
+
+
+def show(exp):
+    '''
+    Return the source form of expression tree %exp%, fully parenthesised.
+
+        BinaryOp('+', ID('x'), BinaryOp('*', NUMBER(2), ID('y')))
+            # printed as (x + (2 * y))
+    '''
+    if exp is None:
+        return ''
+    if isinstance(exp, ast.BinaryOp):
+        return "(%s %s %s)" % (show(exp.left), exp.op, show(exp.right))
+    if isinstance(exp, ast.UnaryOp):
+        return "(%s%s)" % (exp.op, show(exp.operand))
+    return str(exp.value)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+'''
+Layout of the state of a synchroniser in a single integer.
+
+The control state and the state variables are packed into bit fields of one
+word: the control state in the lowest bits, then the variables in order of
+declaration. The widths follow the types:
+
+    state of s states       ceil(log2 s) bits
+    int(n)                  n bits, values [0, 2^n - 1]
+    enum of k members       ceil(log2 k) bits, values [0, k - 1]
+
+Writing a value to a field keeps its low bits, so int(n) arithmetic wraps
+modulo 2^n. The store variables hold records and are not packed.
+
+The whole state is an int: comparing, hashing and copying it is cheap, and
+a word of up to 64 bits fits an array of fixed-width integers (see words()).
+'''
+
+from . import ast
+from . import types
+
+
+class Field(object):
+    '''
+    Bit field of the packed state.
+
+    Attributes:
+        name (str): state variable name, None for the control state.
+        shift (int): position of the lowest bit.
+        width (int): number of bits.
+        mask (int): (1 << width) - 1, the mask of the value before shifting.
+    '''
+    __slots__ = ('name', 'shift', 'width', 'mask')
+
+    def __init__(self, name, shift, width):
+        self.name = name
+        self.shift = shift
+        self.width = width
+        self.mask = (1 << width) - 1
+
+    def get(self, word):
+        return (word >> self.shift) & self.mask
+
+    def set(self, word, value):
+        return (word & ~(self.mask << self.shift)) \
+            | ((value & self.mask) << self.shift)
+
+
+def width(n):
+    '''
+    Return the number of bits of the values [0, n - 1].
+    '''
+    return max(n - 1, 0).bit_length()
+
+
+class Layout(object):
+    '''
+    Layout of the packed state.
+
+    Attributes:
+        states (tuple of str): state names, the values of %control%.
+        control (<Field>): the control state.
+        fields (dict of str:<Field>): the state variables, in order of
+            declaration.
+        width (int): number of bits of the word.
+        initial (int): the initial word: the initial state ('start', or the
+            first one if none is named so) and the initial values.
+    '''
+    def __init__(self, states, sizes, start=0, values={}):
+        self.states = tuple(states)
+        self.control = Field(None, 0, width(len(self.states)))
+        self.fields = {}
+        shift = self.control.width
+        for name, size in sizes:
+            self.fields[name] = Field(name, shift, size)
+            shift += size
+        self.width = shift
+        self.initial = self.pack(values, start)
+
+    def pack(self, values, state=0):
+        '''
+        Return the word of control state number %state% and the values of
+        the variables %values% (a dict), absent ones being 0.
+        '''
+        word = state & self.control.mask
+        for name, value in values.items():
+            f = self.fields[name]
+            word |= (value & f.mask) << f.shift
+        return word
+
+    def unpack(self, word):
+        '''
+        Return the dict of the values of the state variables in %word%.
+        '''
+        return dict((name, (word >> f.shift) & f.mask)
+                    for name, f in self.fields.items())
+
+    def state(self, word):
+        '''
+        Return the number of the control state in %word%.
+        '''
+        return word & self.control.mask
+
+    def words(self, word, bits=64):
+        '''
+        Split %word% into the tuple of %bits%-bit words, the lowest first.
+        '''
+        n = max(1, -(-self.width // bits))
+        mask = (1 << bits) - 1
+        return tuple((word >> (i * bits)) & mask for i in range(n))
+
+    def join(self, words, bits=64):
+        '''
+        Return the word split by words().
+        '''
+        word = 0
+        for i, w in enumerate(words):
+            word |= w << (i * bits)
+        return word
+
+
+def build(sync_ast):
+    '''
+    Return the <Layout> of processed %sync_ast%. The sizes of the fields
+    come from the types of the state variables (<types.Int> and
+    <types.Enum>).
+    '''
+    states = [s.name.value for s in sync_ast.states.states]
+    symtab = sync_ast.decls.symtab
+    sizes = []
+    values = {}
+    for decl in sync_ast.decls.decls:
+        if isinstance(decl, ast.StateVar):
+            name = decl.name.value
+            typ = symtab.get(name).type
+            size = typ.size if isinstance(typ, types.Int) else width(typ.size)
+            sizes.append((name, size))
+            values[name] = decl.value.value
+    start = states.index('start') if 'start' in states else 0
+    return Layout(states, sizes, start, values)
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+'''
+Static correctness of a network of synchronisers: the guarantees of every
+output channel (the passport of the producer) must satisfy the requirements
+of the input channel it is connected to (the passport of the consumer).
+
+The network is given by a wiring description, a JSON file listing the
+components with their sources (.sync files, compiled on loading) or
+passports (.json or binary, see passports.py) and the connections from the
+output channels to the input channels:
+
+    {
+      "components": {"split": "split.sync", "join": "join.passport"},
+      "connections": [["split.l", "join.a"], ["split.r", "join.b"]]
+    }
+
+A connection is compatible if every variant the producer sends is accepted
+by the consumer, i.e. the consumer has the variant (or the variant 'uniq',
+which matches any), and every label the consumer matches is sent with a
+term satisfying the term it requires. A label missing from an open record
+of the producer may come with its tail (the labels passed through from the
+inputs of the producer), so it is not reported.
+
+The pairs of channel types are checked once: the results are memoised, and
+the distinct pairs are spread over a pool of worker processes.
+
+In the incremental mode (check_incremental) the passports and the results
+of the connections are kept in <State> between the runs: only the
+components whose files changed are loaded again, and only the connections
+of the components whose passports changed are checked again.
+'''
+
+import os
+import json
+import time
+import pickle
+import hashlib
+import tempfile
+import multiprocessing
+
+from . import passports
+from . import cache as sync_cache
+
+
+class Wiring(object):
+    '''
+    Wiring description of a network.
+
+    Attributes:
+        components (dict of str:str): component names to the paths of their
+            sources or passports.
+        connections (list of (str, str, str, str)): (producer, output,
+            consumer, input) names of every connection.
+    '''
+    def __init__(self, components, connections):
+        self.components = components
+        self.connections = connections
+
+
+def endpoint(text):
+    '''
+    Split 'component.channel' %text% into the pair of names.
+    '''
+    component, dot, channel = text.rpartition('.')
+    if not dot or not component or not channel:
+        raise ValueError("bad connection endpoint '%s'" % text)
+    return component, channel
+
+
+def load_wiring(path):
+    '''
+    Read the wiring description from file %path%. The paths of the
+    components are relative to the directory of the file.
+    '''
+    with open(path) as f:
+        d = json.load(f)
+
+    directory = os.path.dirname(path)
+    components = dict((name, os.path.join(directory, p))
+                      for name, p in d['components'].items())
+    connections = [endpoint(src) + endpoint(dst) for src, dst in d['connections']]
+    return Wiring(components, connections)
+
+
+def load_passport(path, compiler=None):
+    '''
+    Return the passport of the component in file %path%: a source compiled
+    by %compiler% (the shared one if None), or a passport in JSON or binary
+    form. The parser is imported for sources only.
+    '''
+    with open(path, 'rb') as f:
+        return read_passport(path, f.read(), compiler)
+
+
+def read_passport(path, data, compiler=None):
+    '''
+    Return the passport of the component the contents of file %path% of
+    which are %data% (bytes), see load_passport().
+    '''
+    if path.endswith('.sync'):
+        from . import compiler as sync_compiler
+        compiler = compiler or sync_compiler.get_compiler()
+        return compiler.passport(data.decode())
+    if path.endswith('.json'):
+        return passports.Passport.from_json(data.decode())
+    return passports.Passport.from_bytes(data)
+
+
+def term_class(term):
+    return 'number' if term[0] in ('int', 'enum') else term[0]
+
+
+def satisfies(given, required, where, problems):
+    '''
+    Check that the term %given% by the producer satisfies the term
+    %required% by the consumer, adding the problems found to %problems%.
+    %where% names the place of the terms in the messages.
+    '''
+    if required[0] == 'var' or given[0] == 'var':
+        return
+    if given[0] == 'union':
+        for t in given[1]:
+            satisfies(t, required, where, problems)
+        return
+    if required[0] == 'union':
+        for t in required[1]:
+            found = []
+            satisfies(given, t, where, found)
+            if not found:
+                return
+        problems.append("%s: %s does not match any of %s" % (where,
+                        passports.show_term(given), passports.show_term(required)))
+        return
+    if term_class(given) != term_class(required):
+        problems.append("%s: %s sent, %s expected" % (where,
+                        passports.show_term(given), passports.show_term(required)))
+        return
+    if given[0] == 'rec':
+        record(given[1], given[2], required[1], where, problems)
+
+
+def record(labels, tails, required, where, problems):
+    '''
+    Check the record with %labels% and %tails% sent against the labels
+    %required%.
+    '''
+    given = dict(labels)
+    for l, term in required:
+        t = given.get(l)
+        if t is None:
+            if not tails:
+                problems.append("%s: label '%s' is not sent" % (where, l))
+        else:
+            satisfies(t, term, "%s, label '%s'" % (where, l), problems)
+
+
+def check_channels(output, input):
+    '''
+    Return the tuple of the problems of connecting <passports.Channel>
+    %output% to %input%, empty if the connection is compatible.
+    '''
+    problems = []
+    accepted = dict((v.name, v) for v in input.variants)
+    for v in output.variants:
+        req = accepted.get(v.name) or accepted.get('uniq')
+        where = "variant '%s'" % v.name
+        if req is None:
+            problems.append("%s: no transition accepts it" % where)
+        else:
+            record(v.labels, v.tails, req.labels, where, problems)
+    return tuple(problems)
+
+
+def check_pairs(pairs):
+    '''
+    Check the list of the pairs of channels %pairs%, return the list of
+    the problems of every pair.
+    '''
+    return [check_channels(o, i) for o, i in pairs]
+
+
+class Report(object):
+    '''
+    Outcome of checking a network.
+
+    Attributes:
+        connections (int): number of the connections.
+        checked (int): number of the distinct pairs of channels checked.
+        memo_hits (int): number of the connections the results of which were
+            found in the memo.
+        errors (list of ((str, str, str, str), tuple of str)): incompatible
+            connections with their problems.
+        time (float): seconds spent on checking.
+
+        In the incremental mode also:
+        components (int): number of the components.
+        loaded (int): number of the components loaded (or compiled) again.
+        skipped_components (int): number of the components the passports of
+            which were taken from the previous run.
+        skipped_connections (int): number of the connections the results of
+            which were taken from the previous run.
+    '''
+    def __init__(self):
+        self.connections = 0
+        self.checked = 0
+        self.memo_hits = 0
+        self.errors = []
+        self.time = 0.
+        self.components = 0
+        self.loaded = 0
+        self.skipped_components = 0
+        self.skipped_connections = 0
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def show(self):
+        lines = []
+        for (p, o, c, i), problems in self.errors:
+            for problem in problems:
+                lines.append("%s.%s -> %s.%s: %s" % (p, o, c, i, problem))
+        lines.append("%d connections, %d incompatible, %d pairs checked, "
+                     "%d memo hits, %.3f s" % (self.connections, len(self.errors),
+                     self.checked, self.memo_hits, self.time))
+        if self.components:
+            lines.append("%d components, %d loaded, %d skipped; "
+                         "%d connections skipped" % (self.components,
+                         self.loaded, self.skipped_components,
+                         self.skipped_connections))
+        return '\n'.join(lines) + '\n'
+
+
+# Below that many distinct pairs the pool costs more than it saves.
+parallel_threshold = 2000
+
+
+def check(components, connections, jobs=None, memo=None):
+    '''
+    Check %connections% (as in Wiring) of %components% (a dict of the
+    component names to their <passports.Passport>) using %jobs% worker
+    processes (the number of CPUs if None). %memo% (a dict) keeps the
+    results of the pairs of channels across calls: it is keyed by the pairs
+    of the variants of the channels, the names do not matter. Return
+    <Report>.
+    '''
+    start = time.perf_counter()
+    report = Report()
+    report.connections = len(connections)
+    memo = {} if memo is None else memo
+
+    # Equal channel types are made the same object, so that the memo keys
+    # compare by identity.
+    shared = {}
+    outputs = {}
+    inputs = {}
+    for name, p in components.items():
+        for table, channels in ((outputs, p.outputs), (inputs, p.inputs)):
+            for ch in channels:
+                table[name, ch.name] = shared.setdefault(ch.variants, ch)
+
+    keys = []
+    pending = {}
+    for conn in connections:
+        producer, output, consumer, input = conn
+        out_ch = outputs.get((producer, output))
+        in_ch = inputs.get((consumer, input))
+        if out_ch is None or in_ch is None:
+            missing = ("no output channel '%s.%s'" % (producer, output)
+                       if out_ch is None else
+                       "no input channel '%s.%s'" % (consumer, input))
+            keys.append(missing)
+            continue
+        k = (out_ch.variants, in_ch.variants)
+        keys.append(k)
+        if k in memo:
+            report.memo_hits += 1
+        elif k not in pending:
+            pending[k] = (out_ch, in_ch)
+        else:
+            report.memo_hits += 1
+
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    pairs = list(pending.values())
+    if jobs == 1 or len(pairs) < parallel_threshold:
+        results = check_pairs(pairs)
+    else:
+        size = max(1, len(pairs) // (jobs * 4))
+        chunks = [pairs[i:i + size] for i in range(0, len(pairs), size)]
+        with multiprocessing.Pool(jobs) as pool:
+            results = [r for rs in pool.map(check_pairs, chunks) for r in rs]
+    memo.update(zip(pending, results))
+    report.checked = len(pairs)
+
+    for conn, k in zip(connections, keys):
+        problems = (k,) if isinstance(k, str) else memo[k]
+        if problems:
+            report.errors.append((conn, problems))
+
+    report.time = time.perf_counter() - start
+    return report
+
+
+def check_wiring(wiring, jobs=None, compiler=None):
+    '''
+    Load the passports of the components of <Wiring> %wiring% and check its
+    connections. Return <Report>.
+    '''
+    components = dict((name, load_passport(path, compiler))
+                      for name, path in wiring.components.items())
+    return check(components, wiring.connections, jobs)
+
+
+class State(object):
+    '''
+    Outcome of the previous run of check_incremental().
+
+    Attributes:
+        components (dict of str:(str, <passports.Passport>)): component names
+            to the digests of their files and their passports.
+        results (dict of (str, str, str, str):tuple of str): connections to
+            their problems.
+    '''
+    def __init__(self):
+        self.components = {}
+        self.results = {}
+
+    def save(self, path):
+        '''
+        Write the state to file %path%, atomically replacing the old one.
+        '''
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                   prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((sync_cache.fingerprint(), self.components,
+                             self.results), f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+
+def load_state(path):
+    '''
+    Read <State> from file %path%. The state is empty if the file is missing
+    or unreadable, or was written by another version of the compiler.
+    '''
+    state = State()
+    try:
+        with open(path, 'rb') as f:
+            version, components, results = pickle.load(f)
+    except Exception:
+        return state
+    if version == sync_cache.fingerprint():
+        state.components = components
+        state.results = results
+    return state
+
+
+def check_incremental(wiring, state, jobs=None, compiler=None):
+    '''
+    Check the connections of <Wiring> %wiring% reusing <State> %state% of the
+    previous run, which is updated in place. Return <Report>.
+    '''
+    start = time.perf_counter()
+    components = {}
+    changed = set()
+    loaded = 0
+    for name, path in wiring.components.items():
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        old = state.components.get(name)
+        if old is not None and old[0] == digest:
+            components[name] = old[1]
+            continue
+        p = read_passport(path, data, compiler)
+        loaded += 1
+        # A change of the source that keeps the passport, e g of a guard,
+        # does not affect the connections.
+        if old is None or old[1] != p:
+            changed.add(name)
+        state.components[name] = (digest, p)
+        components[name] = p
+    for name in set(state.components) - set(components):
+        del state.components[name]
+
+    results = {}
+    pending = []
+    for conn in wiring.connections:
+        producer, _, consumer, _ = conn
+        problems = state.results.get(conn)
+        if (problems is not None
+                and producer in components and producer not in changed
+                and consumer in components and consumer not in changed):
+            results[conn] = problems
+        else:
+            pending.append(conn)
+
+    report = check(components, pending, jobs)
+    errors = dict(report.errors)
+    for conn in pending:
+        results[conn] = errors.get(conn, ())
+    state.results = results
+
+    report.errors = [(conn, results[conn]) for conn in wiring.connections
+                     if results[conn]]
+    report.connections = len(wiring.connections)
+    report.components = len(components)
+    report.loaded = loaded
+    report.skipped_components = len(components) - loaded
+    report.skipped_connections = len(wiring.connections) - len(pending)
+    report.time = time.perf_counter() - start
+    return report
@@ -9,83 +9,90 @@ from . import exception as exn
 from . import types
 
 
+def update_this(node, intab):
+    '''
+    Set the types of THIS and of the tail of transition %node% from the type
+    of its input channel.
+    '''
+    symtab = node.symtab
+    port = node.port
+    cond = node.condition
+
+    # Update THIS.tail.type and THIS.type from intab
+    #   p.(x, y || t)
+    #   p.(x, y, z || h)
+    # #=> t.type = { z | j }
+    #     h.type = { | j }
+    #     intab[p].variants['uniq'] = { x, y, z || j }
+    this_ent = symtab.get('this')
+    port_ent = intab.get(port.value)
+
+    if isinstance(cond, ast.CondDataMsg):
+        choice = cond.choice
+        if choice.value:
+            c = choice.value
+        else:
+            c = 'uniq'
+        var_rec = port_ent.type.variants[c]
+
+        # Calculate tail type
+        tail_rec = var_rec.without(types.label_mask(l.value for l in cond.labels))
+
+        # Update tail type
+        tail = cond.tail
+        if tail.value:
+            tail_ent = symtab.get(tail.value)
+            tail_ent.type = tail_rec
+
+        # Update THIS.type
+        this_ent.type = var_rec
+    else:
+        # Segmarks and any messages: THIS is the record of the channel if it
+        # has one, the channel may have named variants only.
+        this_ent.type = port_ent.type.variants.get('uniq') \
+                or types.Record(labels={}, tails=[types.Variable()])
+
+
 class CheckAST(ast.NodeVisitor):
+    collect = False
+
     def __init__(self, i, o):
         self.intab = i
         self.outtab = o
+        self.terms = {}
 
     def visit_Trans(self, node, _):
-        symtab = node.symtab
-        intab = self.intab
-        outtab = self.outtab
-        port = node.port
-        cond = node.condition
-
-        # Update THIS.tail.type and THIS.type from intab
-        #   p.(x, y || t)
-        #   p.(x, y, z || h)
-        # #=> t.type = { z | j }
-        #     h.type = { | j }
-        #     intab[p].variants['uniq'] = { x, y, z || j }
-        this_ent = symtab.get('this')
-        port_ent = intab.get(port.value)
+        update_this(node, self.intab)
 
-        if isinstance(cond, ast.CondDataMsg):
-            choice = cond.choice
-            if choice.value:
-                c = choice.value
-            else:
-                c = ['uniq']
-            var_rec = port_ent.type.variants[c]
-
-            # Calculate tail type
-            tail_rec = types.Record(labels={}, tails=[])
-            cond_labels = [l.value for l in cond.labels]
-            for l in var_rec.labels:
-                if l not in cond_labels:
-                    tail_rec.merge(types.Record(labels={l:var_rec.labels[l]}, tails=[]))
-            tail_rec.tails = var_rec.tails
-
-            # Update tail type
-            tail = cond.tail
-            if tail.value:
-                tail_ent = symtab.get(tail.value)
-                tail_ent.type = tail_rec
-
-            # Update THIS.type
-            this_ent.type = var_rec
-        else:
-            this_ent.type = port_ent.type.variants['uniq']
-
-        cde = CheckDataExp(symtab, outtab)
+        cde = CheckDataExp(node.symtab, self.outtab, self.terms)
         cde.traverse(node)
 
-    #--------------------------------------------------
-    def generic_visit(self, node, children):
-        return None
-
 
 def get_dataexp_type(exp, symtab):
-    rec = types.Record(labels={}, tails=[])
+    parts = []
     for item in exp.items:
         if isinstance(item, ast.ItemVar):
             item_ent = symtab.get(item.name.value)
-            rec.merge(item_ent.type)
+            # A label used as data is bound to a record (see intab.CheckExp).
+            parts.append(types.find(item_ent.type))
         if isinstance(item, ast.ItemExpand):
             item_ent = symtab.get(item.name.value)
-            rec.merge(types.Record(labels={item.name.value:item_ent.type}, tails=[]))
+            parts.append(types.Record(labels={item.name.value:item_ent.type}, tails=[]))
         if isinstance(item, ast.ItemPair):
-            rec.merge(types.Record(labels={item.label.value:types.Int()}, tails=[]))
+            parts.append(types.Record(labels={item.label.value:types.Int()}, tails=[]))
         if isinstance(item, ast.ItemThis):
             this_ent = symtab.get('this')
-            rec.merge(this_ent.type)
-    return rec
+            parts.append(this_ent.type)
+    return types.merge_records(parts)
 
 
 class CheckDataExp(ast.NodeVisitor):
-    def __init__(self, s, o):
+    collect = False
+
+    def __init__(self, s, o, terms):
         self.symtab = s
         self.outtab = o
+        self.terms = terms
 
     def visit_Assign(self, node, _):
         symtab = self.symtab
@@ -94,9 +101,12 @@ class CheckDataExp(ast.NodeVisitor):
         if isinstance(exp, ast.DataExp):
             dest_ent = symtab.get(dest.value)
             rec = get_dataexp_type(exp, symtab)
-            dest_ent.type.update(rec)
+            dest_ent.type = dest_ent.type.update(rec)
 
     def visit_Send(self, node, _):
+        if not isinstance(node.msg, ast.MsgData):
+            return
+
         symtab = self.symtab
         outtab = self.outtab
         choice = node.msg.choice
@@ -109,16 +119,25 @@ class CheckDataExp(ast.NodeVisitor):
             l = choice.value
         else:
             l = 'uniq'
-        port_ent.type.merge(types.Choice(variants={l:rec}, tails=[]))
+        self.terms.setdefault(port_ent, {}).setdefault(l, []).append(rec)
 
-    #--------------------------------------------------
-    def generic_visit(self, node, children):
-        return None
 
+def merge_output_terms(terms):
+    '''
+    Merge the output terms %terms% collected by CheckDataExp (a dict of the
+    channel entries to the dicts of variant: [<Record>, ...]) into the types
+    of the channels, every channel type is built once.
+    '''
+    for port_ent, variants in terms.items():
+        port_ent.type = port_ent.type.merge_variants(variants)
 
-def build(sync_ast):
+
+def fill_stores(sync_ast):
+    '''
+    Fill the types of the store variables of %sync_ast% from the channel
+    variants they are declared with, or add the variants to the channels.
+    '''
     intab = sync_ast.inputs.symtab
-    outtab = sync_ast.outputs.symtab
 
     # Fill types from channel variants to store vars
     var_decls = sync_ast.decls
@@ -131,14 +150,42 @@ def build(sync_ast):
             # Fill store var type from channel variant
             ch_typ = port_ent.type.variants[choice.value]
             decl_ent = symtab.get(decl.name.value)
-            decl_ent.type.merge(ch_typ)
+            decl_ent.type = decl_ent.type.merge(ch_typ)
         else:
             # Fill variant from store var
             rec = types.Record(labels={}, tails=[types.Variable()])
-            port_ent.type.merge(types.Choice(variants={choice.value:rec}, tails=[]))
+            port_ent.type = port_ent.type.merge(
+                    types.Choice(variants={choice.value:rec}, tails=[]))
+
+
+def resolve_types(sync_ast):
+    '''
+    Replace the type variables bound by unification (see types.unify) in the
+    types of the channels and variables of %sync_ast% with their values.
+    '''
+    tables = [sync_ast.inputs.symtab, sync_ast.outputs.symtab,
+              sync_ast.decls.symtab]
+    for state in sync_ast.states.states:
+        for order in state.trans_orders:
+            for trans in order.trans_stmt:
+                tables.append(trans.symtab)
+
+    memo = {}
+    for table in tables:
+        for entry in table.table.values():
+            entry.type = types.resolve(entry.type, memo)
+
+
+def build(sync_ast):
+    intab = sync_ast.inputs.symtab
+    outtab = sync_ast.outputs.symtab
+
+    fill_stores(sync_ast)
 
     ca = CheckAST(intab, outtab)
     ca.traverse(sync_ast)
+    merge_output_terms(ca.terms)
+    resolve_types(sync_ast)
 
     #print("---INTAB---")
     #intab.show()
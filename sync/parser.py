@@ -7,39 +7,72 @@ from . import exception as exn
 from . import symtab
 from . import types
 
+# Loosest first. The bitwise operators bind tighter than the comparisons, as
+# in Python: [x & 1 == 1] is [(x & 1) == 1].
 precedence = (
-    ('left', 'LOR', 'LAND', 'BOR', 'BAND', 'BXOR'),
-    ('left', 'LE', 'GE', 'GEQ', 'LEQ', 'EQ', 'NEQ'),
-    ('nonassoc', 'NOT'),
-    ('left', 'MULT', 'DIVIDE', 'MOD', 'SHL', 'SHR'),
-    ('right', 'UMINUS'),
+    ('left', 'LOR'),
+    ('left', 'LAND'),
+    ('left', 'EQ', 'NEQ'),
+    ('left', 'LE', 'GE', 'LEQ', 'GEQ'),
+    ('left', 'BOR'),
+    ('left', 'BXOR'),
+    ('left', 'BAND'),
+    ('left', 'SHL', 'SHR'),
+    ('left', 'PLUS', 'MINUS'),
+    ('left', 'MULT', 'DIVIDE', 'MOD'),
+    ('right', 'NOT', 'UMINUS'),
 )
 
-configs = None
-config_nodes = {}
 
-intab = symtab.Symtab(None)
-outtab = symtab.Symtab(None)
-top = symtab.Symtab(None)
-saved = top
+class Context(object):
+    '''
+    Per-compilation parser state. The context is attached to the lexer passed
+    to the parser and is reached from grammar actions as p.lexer.ctx, so that
+    one parser can be used for several compilations at once.
+
+    Attributes:
+        configs (dict of str:value): synchroniser parameters (macros).
+        config_nodes (dict of str:list): AST nodes where the parameters are
+        substituted.
+        intab (<Symtab>): input channel table.
+        outtab (<Symtab>): output channel table.
+        top (<Symtab>): current scope.
+        saved (<Symtab>): enclosing scope of the current transition.
+        intexp_args (list of str): variables of the integer expression being
+        parsed.
+    '''
+    def __init__(self, configs={}):
+        self.configs = configs
+        self.config_nodes = {name: [] for name in configs}
+
+        self.intab = symtab.Symtab(None)
+        self.outtab = symtab.Symtab(None)
+        self.top = symtab.Symtab(None)
+        self.saved = self.top
+
+        self.intexp_args = []
+
 
 def p_sync(p):
     '''
     sync : SYNCH VID LPAREN input_list BOR output_list RPAREN \
            LBRACE decl_list_opt state_list RBRACE
     '''
-    p[0] = ast.Sync(p[2], ast.PortList(p[4], intab), ast.PortList(p[6], outtab),
-                    p[9], ast.StateList(p[10]), None)
+    ctx = p.lexer.ctx
+    p[0] = ast.Sync(p[2], ast.PortList(p[4], ctx.intab),
+                    ast.PortList(p[6], ctx.outtab), p[9], ast.StateList(p[10]),
+                    ctx.config_nodes)
 
 
 def p_VID(p):
     '''
     VID : ID
     '''
+    ctx = p.lexer.ctx
     c = coord.Coord(p.lineno(1), p.lexpos(1))
-    if p[1] in configs:
-        term = ast.ID(configs[p[1]], coord=c)
-        config_nodes[p[1]].append(term)
+    if p[1] in ctx.configs:
+        term = ast.ID(ctx.configs[p[1]], coord=c)
+        ctx.config_nodes[p[1]].append(term)
     else:
         term = ast.ID(p[1], coord=c)
     p[0] = term
@@ -50,9 +83,10 @@ def p_VNUMBER(p):
     VNUMBER : ID
             | NUMBER
     '''
-    if p[1] in configs:
-        term = ast.NUMBER(configs[p[1]])
-        config_nodes[p[1]].append(term)
+    ctx = p.lexer.ctx
+    if p[1] in ctx.configs:
+        term = ast.NUMBER(ctx.configs[p[1]])
+        ctx.config_nodes[p[1]].append(term)
     else:
         if type(p[1]) is not int:
             raise ValueError("ID instead of NUMBER, or undeclared macros.")
@@ -65,10 +99,11 @@ def p_VTERM(p):
     '''
     VTERM : ID
     '''
+    ctx = p.lexer.ctx
     c = coord.Coord(p.lineno(1), p.lexpos(1))
-    if p[1] in configs:
-        term = ast.TERM(configs[p[1]], coord=c)
-        config_nodes[p[1]].append(term)
+    if p[1] in ctx.configs:
+        term = ast.TERM(ctx.configs[p[1]], coord=c)
+        ctx.config_nodes[p[1]].append(term)
     else:
         term = ast.ID(p[1], coord=c)
     p[0] = term
@@ -79,7 +114,11 @@ def p_id_list(p):
     id_list : VID
             | id_list COMMA VID
     '''
-    p[0] = [p[1]] if len(p) == 2 else p[1] + [p[3]]
+    if len(p) == 2:
+        p[0] = [p[1]]
+    else:
+        p[1].append(p[3])
+        p[0] = p[1]
 
 
 def p_input_list(p):
@@ -87,7 +126,11 @@ def p_input_list(p):
     input_list : input
                | input_list COMMA input
     '''
-    p[0] = [p[1]] if len(p) == 2 else p[1] + [p[3]]
+    if len(p) == 2:
+        p[0] = [p[1]]
+    else:
+        p[1].append(p[3])
+        p[0] = p[1]
 
 
 def p_input(p):
@@ -101,7 +144,7 @@ def p_input(p):
     else:
         depth = ast.DepthNone()
 
-    tmp = intab.put(p[1].value,
+    tmp = p.lexer.ctx.intab.put(p[1].value,
             symtab.Entry(type=types.Choice(variants={}, tails=[types.Variable()]), ast=p[1]))
     if tmp is not None:
         raise exn.DuplicatesError("Channel '%s' was previously declared" %
@@ -115,7 +158,11 @@ def p_output_list(p):
     output_list : output
                 | output_list COMMA output
     '''
-    p[0] = [p[1]] if len(p) == 2 else p[1] + [p[3]]
+    if len(p) == 2:
+        p[0] = [p[1]]
+    else:
+        p[1].append(p[3])
+        p[0] = p[1]
 
 
 def p_output(p):
@@ -123,7 +170,7 @@ def p_output(p):
     output : VID
            | VID COLON depth_exp
     '''
-    tmp = outtab.put(p[1].value,
+    tmp = p.lexer.ctx.outtab.put(p[1].value,
             symtab.Entry(type=types.Choice(variants={}, tails=[types.Variable()]), ast=p[1]))
     if tmp is not None:
         raise exn.DuplicatesError("Channel '%s' was previously declared"
@@ -151,6 +198,7 @@ def p_decl_list_opt(p):
     decl_list_opt : decl_list
                   | empty
     '''
+    top = p.lexer.ctx.top
     p[0] = ast.DeclList(p[1], top) if p[1] != '' else ast.DeclList([], top)
 
 
@@ -159,14 +207,16 @@ def p_decl_list(p):
     decl_list : decl
               | decl_list decl
     '''
-    decl_list = p[1] if len(p) == 2 else p[1] + p[2]
-    p[0] = decl_list
+    if len(p) == 3:
+        p[1].extend(p[2])
+    p[0] = p[1]
 
 
 def p_decl_store(p):
     '''
     decl : STORE store_type id_list SCOLON
     '''
+    top = p.lexer.ctx.top
     for n in p[3]:
         tmp = top.put(n.value, symtab.Entry(type=types.Record(labels={}, tails=[]), ast=n))
         if tmp is not None:
@@ -191,6 +241,7 @@ def p_decl_state(p):
     '''
     decl : STATE state_type statevar_list SCOLON
     '''
+    top = p.lexer.ctx.top
     if isinstance(p[2], ast.IntType):
         for n in p[3]:
             tmp = top.put(n[0].value,
@@ -218,10 +269,10 @@ def p_state_type(p):
     if p[1] == 'int':
         p[0] = ast.IntType(p[3])
     else:
+        top = p.lexer.ctx.top
         for n in p[3]:
             tmp = top.put(n.value, symtab.Entry(type=types.Int(),
-                ast=ast.IntExp('n0', [],
-                    {'n0': ast.NUMBER(p[3].index(n), coord=n.coord)}),
+                ast=ast.IntExp(ast.NUMBER(p[3].index(n), coord=n.coord), []),
                 ro=True))
             if tmp is not None:
                 raise exn.DuplicatesError("'%s' was previously declared"
@@ -235,7 +286,11 @@ def p_statevar_list(p):
     statevar_list : statevar
                   | statevar_list COMMA statevar
     '''
-    p[0] = [p[1]] if len(p) == 2 else p[1] + [p[3]]
+    if len(p) == 2:
+        p[0] = [p[1]]
+    else:
+        p[1].append(p[3])
+        p[0] = p[1]
 
 
 def p_statevar(p):
@@ -252,7 +307,11 @@ def p_state_list(p):
     state_list : state
                | state_list state
     '''
-    p[0] = [p[1]] if len(p) == 2 else p[1] + [p[2]]
+    if len(p) == 2:
+        p[0] = [p[1]]
+    else:
+        p[1].append(p[2])
+        p[0] = p[1]
 
 
 def p_state(p):
@@ -282,7 +341,11 @@ def p_elseon_scope_list(p):
     elseon_scope_list : elseon_scope
                       | elseon_scope_list elseon_scope
     '''
-    p[0] = [p[1]] if len(p) == 2 else p[1] + [p[2]]
+    if len(p) == 2:
+        p[0] = [p[1]]
+    else:
+        p[1].append(p[2])
+        p[0] = p[1]
 
 
 def p_elseon_scope(p):
@@ -297,16 +360,20 @@ def p_trans_list(p):
     trans_list : trans_stmt
                | trans_list trans_stmt
     '''
-    p[0] = [p[1]] if len(p) == 2 else p[1] + [p[2]]
+    if len(p) == 2:
+        p[0] = [p[1]]
+    else:
+        p[1].append(p[2])
+        p[0] = p[1]
 
 
 def p_trans_stmt(p):
     '''
     trans_stmt : trans_port condition_opt guard_opt action_list
     '''
-    global saved, top
-    t = ast.Trans(p[1], p[2], p[3], p[4], top)
-    top = saved
+    ctx = p.lexer.ctx
+    t = ast.Trans(p[1], p[2], p[3], p[4], ctx.top)
+    ctx.top = ctx.saved
     p[0] = t
 
 
@@ -314,9 +381,9 @@ def p_trans_port(p):
     '''
     trans_port : VID
     '''
-    global saved, top
-    saved = top
-    top = symtab.Symtab(top)
+    ctx = p.lexer.ctx
+    ctx.saved = ctx.top
+    ctx.top = symtab.Symtab(ctx.top)
     p[0] = p[1]
 
 
@@ -327,6 +394,7 @@ def p_condition_opt(p):
                   | DOT cond_else
                   | empty
     '''
+    top = p.lexer.ctx.top
     if len(p) == 2:
         p_ast = ast.CondEmpty()
         top.put('this',
@@ -344,6 +412,12 @@ def p_cond_segmark(p):
     '''
     cond_segmark : AT VID
     '''
+    # The depth of the segmark is bound like a pattern-matched label.
+    top = p.lexer.ctx.top
+    tmp = top.put(p[2].value, symtab.Entry(type=types.Int(), ast=p[2], ro=True))
+    if tmp is not None:
+        raise exn.DuplicatesError("'%s' was previously declared"
+                % p[2].value, p[2].coord, tmp.ast.coord)
     p[0] = ast.CondSegmark(p[2])
 
 
@@ -353,6 +427,7 @@ def p_cond_datamsg(p):
                  | LPAREN id_list tail_opt RPAREN
                  | QM VID LPAREN id_list tail_opt RPAREN
     '''
+    top = p.lexer.ctx.top
     if len(p) == 3:
         p[0] = ast.CondDataMsg(p[2], [], ast.TERM(None))
 
@@ -393,7 +468,7 @@ def p_tail_opt(p):
              | empty
     '''
     if len(p) == 3:
-        tmp = top.put(p[2].value,
+        tmp = p.lexer.ctx.top.put(p[2].value,
             symtab.Entry(type=types.Variable(),#types.Record(labels={}, tails=[types.Variable()]), #types.Record(labels={p[2].value:types.Variable()}),
                          ast=p[2], ro=True))
         if tmp is not None:
@@ -416,7 +491,7 @@ def p_guard_opt(p):
               | empty
     '''
     if p[1] == '':
-        p[0] = ast.IntExp('True', [], {})
+        p[0] = ast.IntExp(None, [])
 
     else:
         p[0] = p[2]
@@ -442,14 +517,18 @@ def p_assign_list(p):
     assign_list : assign
                 | assign_list COMMA assign
     '''
-    p[0] = [p[1]] if len(p) == 2 else p[1] + [p[3]]
+    if len(p) == 2:
+        p[0] = [p[1]]
+    else:
+        p[1].append(p[3])
+        p[0] = p[1]
 
 
 def p_assign_int_exp(p):
     '''
     assign : VID ASSIGN int_exp
     '''
-    tmp = top.put(p[1].value, symtab.Entry(type=types.Int(), ast=p[3]))
+    tmp = p.lexer.ctx.top.put(p[1].value, symtab.Entry(type=types.Int(), ast=p[3]))
     p[0] = ast.Assign(p[1], p[3])
 
 
@@ -474,7 +553,11 @@ def p_data(p):
     data : item
          | data LOR item
     '''
-    p[0] = [p[1]] if len(p) == 2 else p[1] + [p[3]]
+    if len(p) == 2:
+        p[0] = [p[1]]
+    else:
+        p[1].append(p[3])
+        p[0] = p[1]
 
 
 def p_item(p):
@@ -520,7 +603,11 @@ def p_dispatch_list(p):
     dispatch_list : dispatch
                   | dispatch_list COMMA dispatch
     '''
-    p[0] = [p[1]] if len(p) == 2 else p[1] + [p[3]]
+    if len(p) == 2:
+        p[0] = [p[1]]
+    else:
+        p[1].append(p[3])
+        p[0] = p[1]
 
 
 def p_dispatch(p):
@@ -571,23 +658,15 @@ def p_empty(p):
 ###############################
 # INTEXP
 
-intexp_args = []
-terms = {}
-terms_cnt = 1
-
-
 def p_int_exp(p):
     '''
     int_exp : LBRACKET intexp_raw RBRACKET
     '''
-    global intexp_args, terms, terms_cnt
-
-    p[0] = ast.IntExp(p[2], intexp_args, terms)
+    ctx = p.lexer.ctx
+    p[0] = ast.IntExp(p[2], ctx.intexp_args)
 
-    # Cleanup globals
-    intexp_args = []
-    terms = {}
-    terms_cnt = 0
+    # Cleanup the expression state
+    ctx.intexp_args = []
 
 
 def p_intexp_raw(p):
@@ -616,29 +695,28 @@ def p_intexp_raw(p):
            | intexp_raw LAND intexp_raw
            | intexp_raw LOR intexp_raw
     '''
-    global terms, terms_cnt
-
     if len(p) == 2:
-        t = ('n%d' if type(p[1]) is int else 't%d') % terms_cnt
-        terms_cnt += 1
-        # Ugly hack. Need to make a separate rule for wrapping a number.
-        terms[t] = ast.NUMBER(p[1]) if type(p[1]) is int else p[1]
-        p[0] = '{%s}' % t
+        if type(p[1]) is int:
+            p[0] = ast.NUMBER(p[1], coord=coord.Coord(p.lineno(1), p.lexpos(1)))
+        else:
+            p[0] = p[1]
 
-    else:
-        if p[2] == '&&': p[2] = ' and '
-        if p[2] == '||': p[2] = ' or '
-        if p[1] == '!': p[1] = ' not '
+    elif len(p) == 3:
+        p[0] = ast.UnaryOp(p[1], p[2])
+
+    elif p[1] == '(':
+        p[0] = p[2]
 
-        p[0] = ''.join(str(t) for t in list(p)[1:])
+    else:
+        p[0] = ast.BinaryOp(p[2], p[1], p[3])
 
 
 def p_exp_term(p):
     '''
     exp_term : VTERM
     '''
-    global intexp_args
-    intexp_args.append(p[1].value)
+    if isinstance(p[1], ast.ID):
+        p.lexer.ctx.intexp_args.append(p[1].value)
     p[0] = p[1]
 
 ###############################
@@ -656,16 +734,7 @@ import ply.yacc as yacc
 from . import lexer
 
 
-def init():
-    global intab, outtab, top, saved
-    intab = symtab.Symtab(None)
-    outtab = symtab.Symtab(None)
-    top = symtab.Symtab(None)
-    saved = top
-
-
 def build():
-    init()
     tokens = lexer.tokens
     tab_path = '/tmp/tmp-sync-tab'
     return yacc.yacc(start='sync', debug=0, tabmodule=tab_path)
@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+'''
+Synchroniser passports: the types of the input and output channels of a
+processed synchroniser as immutable values, detached from the AST, and
+their serialisation.
+
+A passport is built by from_ast (sync.passport(code, macros) compiles the
+source and does that) and written and read back with Passport.to_json,
+Passport.from_json, Passport.to_bytes and Passport.from_bytes. Reading
+does not need the parser: this module depends on the standard library and
+on types.py only.
+
+The labels and the variants are sorted, and the type variables are numbered
+in order of appearance, as in analysis.canonical_passport, so equal
+synchronisers have equal passports. The terms of the labels are tuples:
+
+    ('int', size)
+    ('enum', (member, ...))
+    ('var', n)
+    ('rec', ((label, term), ...), (n, ...))     # labels, tails
+    ('union', (term, ...))
+    ('choice', ((variant, rec), ...), (n, ...)) # variants, tails
+'''
+
+import json
+
+from . import types
+
+
+class Frozen(object):
+    '''
+    Base of the immutable passport values, compared by their %fields%. The
+    hash is computed once, so that the values can key the memos cheaply.
+    '''
+    __slots__ = ('_hash',)
+    fields = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.fields, values):
+            object.__setattr__(self, name, value)
+        object.__setattr__(self, '_hash', hash((type(self).__name__,) + values))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("passports are immutable")
+
+    def values(self):
+        return tuple(getattr(self, name) for name in self.fields)
+
+    def __eq__(self, other):
+        return other is self or (type(other) is type(self)
+                and other._hash == self._hash and other.values() == self.values())
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return self._hash
+
+    def __reduce__(self):
+        return (type(self), self.values())
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__,
+                           ', '.join(repr(v) for v in self.values()))
+
+
+class Variant(Frozen):
+    '''
+    Variant of a channel: the record type of its messages.
+
+    Attributes:
+        name (str): variant name, 'uniq' for the messages without one.
+        labels (tuple of (str, term)): sorted label-term pairs.
+        tails (tuple of int): numbers of the tail variables.
+    '''
+    __slots__ = ('name', 'labels', 'tails')
+    fields = __slots__
+
+    def label(self, name):
+        '''
+        Return the term of label %name%, None if there is no such label.
+        '''
+        for l, term in self.labels:
+            if l == name:
+                return term
+        return None
+
+
+class Channel(Frozen):
+    '''
+    Input or output channel of a synchroniser.
+
+    Attributes:
+        name (str): channel name.
+        variants (tuple of <Variant>): variants sorted by name.
+        tails (tuple of int): numbers of the variables standing for the
+            variants not listed.
+    '''
+    __slots__ = ('name', 'variants', 'tails')
+    fields = __slots__
+
+    def variant(self, name):
+        '''
+        Return <Variant> %name%, None if there is no such variant.
+        '''
+        for v in self.variants:
+            if v.name == name:
+                return v
+        return None
+
+
+class Passport(Frozen):
+    '''
+    Passport of a synchroniser.
+
+    Attributes:
+        name (str): synchroniser name.
+        inputs (tuple of <Channel>), outputs (tuple of <Channel>): channels
+            in order of declaration.
+        variables (int): number of the type variables.
+    '''
+    __slots__ = ('name', 'inputs', 'outputs', 'variables')
+    fields = __slots__
+
+    def channel(self, name):
+        '''
+        Return the input or output <Channel> %name%, None if there is none.
+        '''
+        for ch in self.inputs + self.outputs:
+            if ch.name == name:
+                return ch
+        return None
+
+    def show(self):
+        '''
+        Return the text of the passport, the same as that of
+        analysis.canonical_passport.
+        '''
+        lines = []
+        for direction, channels in (('in', self.inputs), ('out', self.outputs)):
+            for ch in channels:
+                lines.append('%s %s: %s' % (direction, ch.name, show_term(
+                    ('choice', tuple((v.name, ('rec', v.labels, v.tails))
+                                     for v in ch.variants), ch.tails))))
+        return '\n'.join(lines) + '\n'
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), separators=(',', ':'))
+
+    def to_dict(self):
+        '''
+        Return the passport as nested dicts and lists, ready for json.
+        '''
+        def channel(ch):
+            return {'name': ch.name,
+                    'variants': [{'name': v.name,
+                                  'labels': [[l, json_term(t)] for l, t in v.labels],
+                                  'tails': list(v.tails)} for v in ch.variants],
+                    'tails': list(ch.tails)}
+
+        return {'format': 'sync-passport', 'version': version,
+                'name': self.name, 'variables': self.variables,
+                'inputs': [channel(ch) for ch in self.inputs],
+                'outputs': [channel(ch) for ch in self.outputs]}
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(json.loads(text))
+
+    @classmethod
+    def from_dict(cls, d):
+        '''
+        Return the passport of dict %d% made by to_dict.
+        '''
+        if d.get('format') != 'sync-passport' or d.get('version') != version:
+            raise ValueError("not a passport of version %d" % version)
+
+        def channel(c):
+            return Channel(c['name'],
+                           tuple(Variant(v['name'],
+                                         tuple((l, tuple_term(t)) for l, t in v['labels']),
+                                         tuple(v['tails'])) for v in c['variants']),
+                           tuple(c['tails']))
+
+        return cls(d['name'], tuple(channel(c) for c in d['inputs']),
+                   tuple(channel(c) for c in d['outputs']), d['variables'])
+
+    def to_bytes(self):
+        return Writer().passport(self)
+
+    @classmethod
+    def from_bytes(cls, data):
+        return Reader(data).passport()
+
+
+version = 1
+
+
+def show_term(term):
+    '''
+    Return the text of passport term %term% (see types.canonical).
+    '''
+    tag = term[0]
+    if tag == 'int':
+        return 'Int(%d)' % term[1]
+    if tag == 'enum':
+        return 'Enum(%s)' % list(term[1])
+    if tag == 'var':
+        return '$%d' % term[1]
+    if tag == 'union':
+        return 'union(%s)' % ', '.join(show_term(t) for t in term[1])
+    items = ', '.join("'%s':%s" % (l, show_term(t)) for l, t in term[1])
+    tails = ' | '.join('$%d' % n for n in term[2])
+    text = ' | '.join(part for part in (items, tails) if part)
+    return '{%s}' % text if tag == 'rec' else '(:%s:)' % text
+
+
+def json_term(term):
+    tag = term[0]
+    if tag in ('int', 'var'):
+        return list(term)
+    if tag == 'enum':
+        return [tag, list(term[1])]
+    if tag == 'union':
+        return [tag, [json_term(t) for t in term[1]]]
+    return [tag, [[l, json_term(t)] for l, t in term[1]], list(term[2])]
+
+
+def tuple_term(term):
+    tag = term[0]
+    if tag in ('int', 'var'):
+        return (tag, term[1])
+    if tag == 'enum':
+        return (tag, tuple(term[1]))
+    if tag == 'union':
+        return (tag, tuple(tuple_term(t) for t in term[1]))
+    if tag in ('rec', 'choice'):
+        return (tag, tuple((l, tuple_term(t)) for l, t in term[1]),
+                tuple(term[2]))
+    raise ValueError("unknown passport term '%s'" % tag)
+
+
+class Builder(object):
+    '''
+    Translate the type terms of a synchroniser to the passport terms,
+    numbering the variables in order of appearance.
+    '''
+    def __init__(self):
+        self.renamed = {}
+
+    def var(self, var):
+        n = self.renamed.get(var)
+        if n is None:
+            n = self.renamed[var] = len(self.renamed)
+        return n
+
+    def tails(self, tails):
+        return tuple(self.var(types.find(t)) for t in tails)
+
+    def labels(self, labels):
+        return tuple((l, self.term(labels[l])) for l in sorted(labels))
+
+    def term(self, term):
+        term = types.find(term)
+        if isinstance(term, types.Variable):
+            return ('var', self.var(term))
+        if isinstance(term, types.Int):
+            return ('int', term.size)
+        if isinstance(term, types.Enum):
+            return ('enum', term.enum)
+        if isinstance(term, types.Record):
+            return ('rec', self.labels(term.labels), self.tails(term.tails))
+        if isinstance(term, types.Choice):
+            variants = tuple((v, self.term(term.variants[v]))
+                             for v in sorted(term.variants))
+            return ('choice', variants, self.tails(term.tails))
+        if isinstance(term, types.Union):
+            vals = [self.term(v) for v in term.vals]
+            return ('union', tuple(sorted(vals, key=show_term)))
+        raise TypeError("unexpected type term %s" % term.show())
+
+    def channel(self, name, term):
+        _, variants, tails = self.term(term)
+        return Channel(name, tuple(Variant(v, rec[1], rec[2]) for v, rec in variants),
+                       tails)
+
+
+def from_ast(sync_ast):
+    '''
+    Return <Passport> of processed %sync_ast%.
+    '''
+    builder = Builder()
+    channels = []
+    for port_list in (sync_ast.inputs, sync_ast.outputs):
+        channels.append(tuple(builder.channel(port.name.value,
+                                              port_list.symtab.get(port.name.value).type)
+                              for port in port_list.ports))
+    return Passport(sync_ast.name.value, channels[0], channels[1],
+                    len(builder.renamed))
+
+
+# Binary form:
+#
+#   magic, version byte
+#   string table: count, then length and UTF-8 bytes of every string
+#   passport: name, variables, inputs, outputs
+#   channel: name, variants (count, then name, labels, tails of each), tails
+#   labels: count, then label and term of each
+#   tails, enum members, union values: count, then the items
+#   term: tag byte, then size | members | number | labels, tails | values
+#
+# Counts, numbers and sizes are unsigned LEB128 varints, strings are indices
+# in the string table.
+
+magic = b'SYNP'
+tags = ('int', 'enum', 'var', 'rec', 'union', 'choice')
+
+
+class Writer(object):
+    def __init__(self):
+        self.strings = {}
+        self.body = bytearray()
+
+    def uint(self, n, out=None):
+        out = self.body if out is None else out
+        while n >= 0x80:
+            out.append(n & 0x7f | 0x80)
+            n >>= 7
+        out.append(n)
+
+    def string(self, s):
+        n = self.strings.get(s)
+        if n is None:
+            n = self.strings[s] = len(self.strings)
+        self.uint(n)
+
+    def seq(self, items, write):
+        self.uint(len(items))
+        for item in items:
+            write(item)
+
+    def labels(self, labels):
+        self.uint(len(labels))
+        for l, term in labels:
+            self.string(l)
+            self.term(term)
+
+    def term(self, term):
+        tag = term[0]
+        self.body.append(tags.index(tag))
+        if tag in ('int', 'var'):
+            self.uint(term[1])
+        elif tag == 'enum':
+            self.seq(term[1], self.string)
+        elif tag == 'union':
+            self.seq(term[1], self.term)
+        else:
+            self.labels(term[1])
+            self.seq(term[2], self.uint)
+
+    def channel(self, ch):
+        self.string(ch.name)
+        self.uint(len(ch.variants))
+        for v in ch.variants:
+            self.string(v.name)
+            self.labels(v.labels)
+            self.seq(v.tails, self.uint)
+        self.seq(ch.tails, self.uint)
+
+    def passport(self, p):
+        self.string(p.name)
+        self.uint(p.variables)
+        self.seq(p.inputs, self.channel)
+        self.seq(p.outputs, self.channel)
+
+        head = bytearray(magic)
+        head.append(version)
+        self.uint(len(self.strings), head)
+        for s in self.strings:
+            data = s.encode()
+            self.uint(len(data), head)
+            head += data
+        return bytes(head + self.body)
+
+
+class Reader(object):
+    def __init__(self, data):
+        if data[:len(magic)] != magic or len(data) <= len(magic) \
+                or data[len(magic)] != version:
+            raise ValueError("not a passport of version %d" % version)
+        self.data = data
+        self.pos = len(magic) + 1
+        self.strings = []
+        for _ in range(self.uint()):
+            n = self.uint()
+            if self.pos + n > len(data):
+                raise ValueError("truncated passport")
+            self.strings.append(bytes(data[self.pos:self.pos + n]).decode())
+            self.pos += n
+
+    def byte(self):
+        if self.pos >= len(self.data):
+            raise ValueError("truncated passport")
+        self.pos += 1
+        return self.data[self.pos - 1]
+
+    def uint(self):
+        n = shift = 0
+        while True:
+            b = self.byte()
+            n |= (b & 0x7f) << shift
+            if b < 0x80:
+                return n
+            shift += 7
+
+    def string(self):
+        n = self.uint()
+        if n >= len(self.strings):
+            raise ValueError("unknown passport string %d" % n)
+        return self.strings[n]
+
+    def seq(self, read):
+        return tuple(read() for _ in range(self.uint()))
+
+    def labels(self):
+        return tuple((self.string(), self.term()) for _ in range(self.uint()))
+
+    def term(self):
+        n = self.byte()
+        if n >= len(tags):
+            raise ValueError("unknown passport term tag %d" % n)
+        tag = tags[n]
+        if tag in ('int', 'var'):
+            return (tag, self.uint())
+        if tag == 'enum':
+            return (tag, self.seq(self.string))
+        if tag == 'union':
+            return (tag, self.seq(self.term))
+        return (tag, self.labels(), self.seq(self.uint))
+
+    def channel(self):
+        name = self.string()
+        variants = tuple(Variant(self.string(), self.labels(), self.seq(self.uint))
+                         for _ in range(self.uint()))
+        return Channel(name, variants, self.seq(self.uint))
+
+    def passport(self):
+        name = self.string()
+        variables = self.uint()
+        inputs = self.seq(self.channel)
+        outputs = self.seq(self.channel)
+        if self.pos != len(self.data):
+            raise ValueError("trailing data after the passport")
+        return Passport(name, inputs, outputs, variables)
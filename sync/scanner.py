@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+'''
+Hand-written tokenizer: a fast alternative to the PLY lexer in lexer.py.
+
+The scanner recognises the same token set, skips the same comments and
+tracks line numbers the same way, but matches a single master regular
+expression compiled once at import and produces lightweight tokens.
+'''
+
+import re
+import functools
+
+from .lexer import tokens, keywords_map
+
+
+class Token(object):
+    '''
+    Lexical token carrying the attributes the PLY parser reads. The parser
+    sets %lexer% on the offending token on a syntax error.
+    '''
+    __slots__ = ('type', 'value', 'lineno', 'lexpos', 'lexer')
+
+    def __init__(self, type, value, lineno, lexpos):
+        self.type = type
+        self.value = value
+        self.lineno = lineno
+        self.lexpos = lexpos
+
+    def __repr__(self):
+        return "Token(%s,%r,%d,%d)" % (self.type, self.value, self.lineno,
+                                       self.lexpos)
+
+
+# Operators and punctuation, longer ones first (as PLY orders string rules).
+operators = [
+    ('LAND', '&&'), ('LOR', '||'), ('SHL', '<<'), ('SHR', '>>'),
+    ('GEQ', '>='), ('LEQ', '<='), ('EQ', '=='), ('NEQ', '!='), ('TO', '=>'),
+    ('LBRACE', '{'), ('RBRACE', '}'), ('LPAREN', '('), ('RPAREN', ')'),
+    ('LBRACKET', '['), ('RBRACKET', ']'), ('COLON', ':'), ('PLUS', '+'),
+    ('MINUS', '-'), ('MULT', '*'), ('DIVIDE', '/'), ('MOD', '%'),
+    ('LE', '<'), ('GE', '>'), ('NOT', '!'), ('BAND', '&'), ('BOR', '|'),
+    ('BXOR', '^'), ('COMMA', ','), ('DOT', '.'), ('AT', '@'), ('QM', '?'),
+    ('ASSIGN', '='), ('SCOLON', ';'), ('APOSTR', "'"),
+]
+
+operators_map = {v: t for t, v in operators}
+
+assert set(operators_map.values()) | {'ID', 'NUMBER'} \
+        | set(keywords_map.values()) == set(tokens)
+
+# Blanks, newlines and comments.
+skip = r'(?:[ \t\n]|\#[^\n]*|/\*[\s\S]*?\*/)*'
+
+blank = re.compile(skip)
+
+# Blanks and comments are consumed as the prefix of a token match, so every
+# match yields a token. The prefix is matched in a lookahead and consumed by
+# the backreference: a failing token match does not backtrack into it.
+# Groups: 1 - prefix, 2 - identifier, 3 - number, 4 - operator.
+master = re.compile(
+    r'(?=(' + skip + r'))\1(?:([A-Za-z_]\w*)'
+    r'|(\d+)'
+    r'|(' + '|'.join(re.escape(v) for _, v in operators) + '))')
+
+
+def tokenize(data, lineno=1):
+    '''
+    Generate tokens of %data%. Illegal characters are reported and skipped.
+    '''
+    count = data.count
+    types = operators_map
+    kw = keywords_map.get
+    token = master.match
+    end = len(data)
+    line_pos = 0
+    pos = 0
+
+    while True:
+        m = token(data, pos)
+        if m is None:
+            # The end of input or an illegal character after the blanks.
+            pos = blank.match(data, pos).end()
+            if pos == end:
+                return
+            print("Illegal character '%s'" % data[pos])
+            pos += 1
+            continue
+        pos = m.end()
+
+        group = m.lastindex
+        start = m.start(group)
+        lineno += count('\n', line_pos, start)
+        line_pos = start
+
+        value = m.group(group)
+        if group == 2:
+            yield Token(kw(value, 'ID'), value, lineno, start)
+        elif group == 4:
+            yield Token(types[value], value, lineno, start)
+        else:
+            yield Token('NUMBER', int(value), lineno, start)
+
+
+class Lexer(object):
+    '''
+    Adapter giving the scanner the PLY lexer interface used by the parser.
+
+    Attributes:
+        lineno (int): line number the next input starts with.
+    '''
+    def __init__(self):
+        self.lineno = 1
+
+    def input(self, data):
+        # token() returns None at the end of input, as in PLY.
+        self.token = functools.partial(next, tokenize(data, self.lineno), None)
+
+    def token(self):
+        return None
+
+    def clone(self):
+        lexer = Lexer()
+        lexer.lineno = self.lineno
+        return lexer
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        t = self.token()
+        if t is None:
+            raise StopIteration
+        return t
+
+
+def build():
+    return Lexer()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import unittest
+
+sys.path.insert(0, os.path.dirname(__file__) + '/../../..')
+
+import compiler.sync as sync
+import compiler.sync.intab as intab
+import compiler.sync.outtab as outtab
+import compiler.sync.analysis as analysis
+import compiler.sync.types as types
+from compiler.sync.bench import gen
+
+
+def passports(sync_ast):
+    '''
+    Return the types of the channels and of all variables of %sync_ast%.
+    '''
+    tables = [sync_ast.inputs.symtab, sync_ast.outputs.symtab,
+              sync_ast.decls.symtab]
+    tables += [t.symtab for t in analysis.transitions(sync_ast)]
+    return [sorted((k, e.type.show()) for k, e in s.table.items())
+            for s in tables]
+
+
+def run(code, passes):
+    # Variables are numbered per compilation: the names are the same as long
+    # as the variables are created in the same order.
+    try:
+        with types.variable_names():
+            sync_ast = sync.parse(code)
+            passes(sync_ast)
+        return passports(sync_ast)
+    except Exception as err:
+        return type(err), str(getattr(err, 'msg', err))
+
+
+def separate(sync_ast):
+    intab.build(sync_ast)
+    outtab.build(sync_ast)
+
+
+sources = [
+    gen.source(6, 4),
+    'synch id (a, c | b, d) {\
+store ?v.a m;\
+store ?q.c n;\
+state int(4) k;\
+start {\
+    on:\
+        a.?v(x, y || t) & [x > k] {\
+            set m = (t || x: [x + 1]), k = [y];\
+            send ?o(this || k: [y]) => b, ?p(m) => d;\
+            goto s1;\
+        }\
+    elseon:\
+        c.?q(z) { set n = this; send ?s(n || z: [z]) => b; }\
+        c.?w { send ?o(w: [k]) => d; }\
+}\
+s1 {\
+    on:\
+        a.?v(x || h) { send ?r(h || x: [x]) => b; goto start; }\
+}}',
+    # Errors
+    'synch id (a | b) {\
+start {\
+    on:\
+        a.?v(x) & [y > 1] { send ?v(x) => c; }\
+}}',
+    'synch id (a | b) {\
+start {\
+    on:\
+        a.?v(x) { set x = [1]; }\
+}}',
+    'synch id (a | b) {\
+store ?v.a m;\
+start {\
+    on:\
+        a.?v(x) & [m] {}\
+}}',
+    'synch id (a | b) {\
+store ?v.c m;\
+start {\
+    on:\
+        z.?v(x) {}\
+}}',
+]
+
+
+class TestAnalysis(unittest.TestCase):
+    def test_identical(self):
+        directory = os.path.dirname(__file__) + '/syntax'
+        corpus = list(sources)
+        for name in sorted(os.listdir(directory)):
+            with open(os.path.join(directory, name)) as f:
+                corpus.append(f.read())
+
+        for code in corpus:
+            self.assertEqual(run(code, separate), run(code, analysis.build))
+
+    def test_choice_without_name(self):
+        # A data message without a variant name used to crash the output
+        # pass.
+        ast = sync.process('synch id (a | b) {\
+start {\
+    on:\
+        a.(x || t) { send ?v(t) => b; }\
+}}')
+        this = analysis.transitions(ast)[0].symtab.get('this')
+        self.assertTrue(this.type is ast.inputs.symtab.get('a').type.variants['uniq'])
+
+
+class TestPassport(unittest.TestCase):
+    src = 'synch id (a | b) {\
+start {\
+    on:\
+        a.?v(%s || t) & [x > 0] { send ?o(t || x: [x]) => b; }\
+        a.?w { send ?p(this) => b; }\
+}}'
+
+    def test_deterministic(self):
+        c = sync.Compiler()
+        ast_1 = c.process(self.src % 'x, y')
+        ast_2 = c.process(self.src % 'x, y')
+        self.assertEqual(ast_1.inputs.symtab.get('a').type.show(),
+                         ast_2.inputs.symtab.get('a').type.show())
+        self.assertEqual(analysis.canonical_passport(ast_1),
+                         analysis.canonical_passport(ast_2))
+
+    def test_canonical(self):
+        text = analysis.canonical_passport(sync.process(self.src % 'x, y'))
+        # The order of the labels does not matter.
+        self.assertEqual(text,
+                analysis.canonical_passport(sync.process(self.src % 'y, x')))
+        self.assertEqual(text,
+            "in a: (:'v':{'x':Int(0), 'y':$0 | $1}, 'w':{$2} | $3:)\n"
+            "out b: (:'o':{'x':Int(0) | $1}, 'p':{$2} | $4:)\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
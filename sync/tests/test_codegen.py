@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import unittest
+
+sys.path.insert(0, os.path.dirname(__file__) + '/../../..')
+
+import compiler.sync as sync
+import compiler.sync.codegen as codegen
+
+
+def trans_code(src, macros={}):
+    ast = sync.process(src, macros)
+    code = codegen.build(ast)
+    return [code[t] for o in ast.states.states[0].trans_orders
+            for t in o.trans_stmt]
+
+
+class TestCodegen(unittest.TestCase):
+    def test_guard(self):
+        code = trans_code('synch id (a | b) {\
+state int(3) q;\
+state enum(ON, OFF) e;\
+start {\
+    on:\
+        a.?v(x) & [x + 2 * 3 - 1 - q == 6 && e != OFF] {}\
+        a.?w {}\
+}}')
+        guard = code[0].guard
+        self.assertTrue(guard({'q': 0, 'e': 0}, {'x': 1}))
+        self.assertFalse(guard({'q': 1, 'e': 0}, {'x': 1}))
+        self.assertFalse(guard({'q': 0, 'e': 1}, {'x': 1}))
+
+        # Empty guard
+        self.assertTrue(code[1].guard is None)
+        self.assertTrue(code[1].assign is None)
+
+    def test_precedence(self):
+        code = trans_code('synch id (a | b) {\
+start {\
+    on:\
+        a.(x, y) & [x == 1 || x == 2 && y == 3] {\
+            set k = [x & 1 == 1], m = [x << 1 + 1 == 4];\
+        }\
+}}')
+        c = code[0]
+        self.assertTrue(c.guard({}, {'x': 1, 'y': 0}))
+        self.assertFalse(c.guard({}, {'x': 2, 'y': 0}))
+        self.assertTrue(c.guard({}, {'x': 2, 'y': 3}))
+        self.assertTrue(c.assign({}, {'x': 3, 'y': 0}) == (1, 0))
+        self.assertTrue(c.assign({}, {'x': 1, 'y': 0}) == (1, 1))
+        self.assertTrue(c.assign({}, {'x': 2, 'y': 0}) == (0, 0))
+
+    def test_assign(self):
+        code = trans_code('synch id (a | b) {\
+state int(8) q, r;\
+start {\
+    on:\
+        a.?v(x) {\
+            set q = [q + x], r = [q * 2 + (x < 3)], k = [-7 / 2 + !x];\
+            send ?v(y:[k + r]) => b;\
+        }\
+}}')
+        c = code[0]
+        self.assertTrue(c.assign_names == ('q', 'r', 'k'))
+        self.assertTrue(c.assign({'q': 1, 'r': 0}, {'x': 2}) == (3, 7, -4))
+
+        state = dict(zip(c.assign_names, c.assign({'q': 1, 'r': 0}, {'x': 2})))
+        self.assertTrue(len(c.exps) == 1)
+        for exp, f in c.exps.items():
+            self.assertTrue(f(state, {'x': 2}) == 3)
+
+    def test_macro(self):
+        code = trans_code('@N\nsynch id (a | b) {\
+start {\
+    on:\
+        a.?v(x) & [x < N] {}\
+}}', {'N': 10})
+        self.assertTrue(code[0].guard({}, {'x': 9}))
+        self.assertFalse(code[0].guard({}, {'x': 10}))
+
+    def test_shared(self):
+        code = trans_code('synch id (a | b) {\
+start {\
+    on:\
+        a.?v(x) & [x > 1] {}\
+        a.?w(x) & [x > 1] {}\
+}}')
+        self.assertTrue(code[0].guard is code[1].guard)
+
+
+if __name__ == '__main__':
+    unittest.main()
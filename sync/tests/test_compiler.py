@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import unittest
+import glob
+import threading
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(__file__) + '/../../..')
+
+import compiler.sync as sync
+import compiler.sync.exception as exn
+import compiler.sync.batch as batch
+import compiler.sync.cache as cache
+
+
+class TestCompiler(unittest.TestCase):
+    def test_reuse(self):
+        c = sync.Compiler()
+        parser = c.parser
+        for i in range(3):
+            ast = c.process('synch id (a | b) {\
+store ?v.a m;\
+start {\
+    on:\
+        a.?v(x || t) {\
+            set m = this;\
+            send m => b;\
+        }\
+}}')
+            self.assertTrue(ast.name.value == 'id')
+            self.assertTrue('v' in ast.inputs.symtab.get('a').type.variants)
+        self.assertTrue(c.parser is parser)
+        self.assertTrue(c.calls == 3)
+        self.assertTrue(c.last_time > 0)
+        self.assertTrue(c.total_time >= c.last_time)
+
+    def test_reuse_after_error(self):
+        c = sync.Compiler()
+        try:
+            c.parse('synch id (a | b) {')
+            assert(1 != 1)
+        except exn.ParseError as err:
+            self.assertTrue(err.msg == "Syntax error")
+        ast = c.parse('synch id (a | b) {start {on: a{}}}')
+        self.assertTrue(ast.name.value == 'id')
+        self.assertTrue(c.calls == 2)
+
+    def test_lineno(self):
+        c = sync.Compiler()
+        c.parse('synch id (a | b)\n{\nstart {on: a{}}}')
+        try:
+            c.parse('synch id (a | b)\n{\nstart {on: a{,}}}')
+            assert(1 != 1)
+        except exn.ParseError as err:
+            self.assertTrue(err.coord.lineno == 3)
+
+
+class TestConcurrency(unittest.TestCase):
+    src = '''@N
+@{macro}
+synch s{i} (in{i}, x{i} | out{i})
+{{
+  store ?v{i}.in{i} m{i};
+  state int(N) cnt{i};
+
+  start {{
+    on:
+      in{i}.?v{i}(f{i}, g{i} || t{i}) & [cnt{i} < N] {{
+        set m{i} = this, cnt{i} = [cnt{i} + 1];
+        send m{i} => out{i};
+        goto s{i};
+      }}
+  }}
+
+  s{i} {{
+    on:
+      x{i}.?w{i}(h{i}) {{
+        send (\'h{i}) => out{i};
+        goto start;
+      }}
+  }}
+}}'''
+
+    def check(self, i, ast):
+        name = 's%d' % i
+        self.assertTrue(ast.name.value == name)
+        self.assertTrue(sorted(ast.inputs.symtab.table) == ['in%d' % i, 'x%d' % i])
+        self.assertTrue(list(ast.outputs.symtab.table) == ['out%d' % i])
+        self.assertTrue(sorted(ast.configs) == ['M%d' % i, 'N'])
+        self.assertTrue(ast.configs['N'][0].value == i)
+        decls = ast.decls.symtab.table
+        self.assertTrue(sorted(decls) == ['cnt%d' % i, 'm%d' % i])
+        self.assertTrue(decls['cnt%d' % i].type.size == i)
+        variants = ast.inputs.symtab.get('in%d' % i).type.variants
+        self.assertTrue(list(variants) == ['v%d' % i])
+        self.assertTrue(sorted(variants['v%d' % i].labels) == ['f%d' % i, 'g%d' % i])
+        out = ast.outputs.symtab.get('out%d' % i).type.variants['uniq']
+        self.assertTrue(sorted(out.labels) == ['f%d' % i, 'g%d' % i, 'h%d' % i])
+
+    def test_threads(self):
+        errors = []
+        n = 32
+
+        def work(k):
+            try:
+                for r in range(10):
+                    i = (k + r) % n + 1
+                    code = self.src.format(i=i, macro='M%d' % i)
+                    self.check(i, sync.process(code, {'N': i}))
+            except Exception as err:
+                errors.append(err)
+
+        threads = [threading.Thread(target=work, args=(k,)) for k in range(n)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertFalse(errors, errors[:1])
+
+
+def entries(d):
+    return glob.glob(os.path.join(d, '*' + cache.DiskCache.suffix))
+
+
+def write_entries(d, max_size, macros):
+    c = sync.Compiler(cache.DiskCache(d, max_size))
+    for n in macros:
+        c.process(TestDiskCache.src, {'N': n})
+
+
+class TestDiskCache(unittest.TestCase):
+    src = '''@N = 3
+synch id (a | b)
+{
+  store ?v.a m;
+  state int(N) x;
+  start {
+    on:
+      a.?v(y || t) & [x < N] {
+        set m = this, x = [x + 1];
+        send m => b;
+      }
+  }
+}'''
+
+    def test_hit(self):
+        with tempfile.TemporaryDirectory() as d:
+            c = sync.Compiler(cache.DiskCache(d))
+            ast_1 = c.process(self.src)
+            ast_2 = c.process(self.src)
+            self.assertTrue(c.cache.misses == 1 and c.cache.hits == 1)
+            self.assertFalse(ast_1 is ast_2)
+
+            b_1 = ast_1.outputs.symtab.get('b').type
+            b_2 = ast_2.outputs.symtab.get('b').type
+            self.assertTrue(b_1.show() == b_2.show())
+            self.assertTrue(ast_2.configs['N'][0].value == 3)
+
+            # A cold compiler shares the entries.
+            c = sync.Compiler(cache.DiskCache(d))
+            c.process(self.src)
+            self.assertTrue(c.cache.hits == 1)
+
+            # Macros are part of the key.
+            ast_3 = c.process(self.src, {'N': 5})
+            self.assertTrue(c.cache.misses == 1)
+            self.assertTrue(ast_3.decls.symtab.get('x').type.size == 5)
+
+            k = cache.key(self.src)
+            _, inputs, outputs = c.cache.get(k)
+            self.assertTrue('v' in inputs['a'].variants)
+            self.assertTrue('uniq' in outputs['b'].variants)
+
+    def test_evict(self):
+        with tempfile.TemporaryDirectory() as d:
+            c = sync.Compiler(cache.DiskCache(d))
+            c.process(self.src)
+            size = os.path.getsize(c.cache._file(cache.key(self.src)))
+
+            c.cache.max_size = size * 2
+            for n in range(1, 5):
+                c.process(self.src, {'N': n})
+            self.assertTrue(len(entries(d)) == 2)
+            self.assertTrue(c.cache.evictions == 3)
+
+    def test_scan(self):
+        with tempfile.TemporaryDirectory() as d:
+            c = sync.Compiler(cache.DiskCache(d))
+            stale = os.path.join(d, '.tmp-stale')
+            fresh = os.path.join(d, '.tmp-fresh')
+            for path in (stale, fresh):
+                with open(path, 'w') as f:
+                    f.write('x')
+            os.utime(stale, (0, 0))
+
+            # The first write scans the directory, the next ones do not.
+            c.process(self.src)
+            self.assertFalse(os.path.exists(stale))
+            self.assertTrue(os.path.exists(fresh))
+            size = c.cache.size
+            self.assertTrue(size == os.path.getsize(c.cache._file(cache.key(self.src))))
+
+            os.utime(fresh, (0, 0))
+            c.process(self.src, {'N': 4})
+            self.assertTrue(os.path.exists(fresh))
+            self.assertTrue(c.cache.size > size)
+
+            # Exceeding the bound scans again.
+            c.cache.max_size = c.cache.size
+            c.process(self.src, {'N': 5})
+            self.assertFalse(os.path.exists(fresh))
+
+    @unittest.skipIf(cache.fcntl is None, 'no file locks')
+    def test_writers(self):
+        with tempfile.TemporaryDirectory() as d:
+            c = sync.Compiler(cache.DiskCache(d))
+            c.process(self.src)
+            max_size = os.path.getsize(c.cache._file(cache.key(self.src))) * 4
+
+            # Two writers sharing the directory, each write keeps the bound.
+            writers = [sync.Compiler(cache.DiskCache(d, max_size))
+                       for k in range(2)]
+            for n in range(1, 20):
+                writers[n % 2].process(self.src, {'N': n})
+                self.assertTrue(sum(os.path.getsize(p) for p in entries(d))
+                                <= max_size)
+
+            # Two processes write 10 entries each.
+            ctx = multiprocessing.get_context('fork')
+            writers = [ctx.Process(target=write_entries,
+                                   args=(d, max_size, range(k, 20, 2)))
+                       for k in (1, 2)]
+            for w in writers:
+                w.start()
+            for w in writers:
+                w.join()
+                self.assertTrue(w.exitcode == 0)
+
+            sizes = [os.path.getsize(p) for p in entries(d)]
+            self.assertTrue(sum(sizes) <= max_size)
+            self.assertTrue(len(sizes) >= 3)
+            with open(os.path.join(d, cache.DiskCache.size_file)) as f:
+                self.assertTrue(int(f.read()) == sum(sizes))
+            self.assertTrue(c.cache.size <= c.cache.max_size)
+
+
+class TestMemo(unittest.TestCase):
+    def test_memo(self):
+        c = sync.Compiler(memo=sync.compiler.Memo(2))
+        src = TestDiskCache.src
+
+        ast_1 = c.process(src)
+        ast_2 = c.process(src)
+        self.assertFalse(ast_1 is ast_2)
+        self.assertTrue(c.memo.hits == 1 and c.memo.misses == 1)
+
+        # Copies are independent.
+        m_ent = ast_2.decls.symtab.get('m')
+        m_ent.type = m_ent.type.update(sync.types.Record(labels={'z': sync.types.Int()}))
+        ast_3 = c.process(src)
+        self.assertFalse('z' in ast_3.decls.symtab.get('m').type.labels)
+        self.assertTrue(ast_1.outputs.symtab.get('b').type.show()
+                == ast_3.outputs.symtab.get('b').type.show())
+
+        c.process(src, {'N': 4})
+        c.process(src, {'N': 5})
+        self.assertTrue(c.memo.misses == 3)
+        self.assertTrue(c.memo.evictions == 1)
+        c.process(src)
+        self.assertTrue(c.memo.misses == 4)
+
+
+class TestBatch(unittest.TestCase):
+    def test_run(self):
+        with tempfile.TemporaryDirectory() as d:
+            os.mkdir(os.path.join(d, 'sub'))
+            good = 'synch id (a | b) {store a m; start {on: a {set m = this;}}}'
+            bad = '# Bad one\nsynch id (a | b)\n{start {on: a {send this => c;}}}'
+            for i in range(4):
+                with open(os.path.join(d, 'sub', 'good%d.sync' % i), 'w') as f:
+                    f.write(good)
+            with open(os.path.join(d, 'bad.sync'), 'w') as f:
+                f.write(bad)
+            with open(os.path.join(d, 'notes.txt'), 'w') as f:
+                f.write(bad)
+
+            files = batch.collect([d])
+            self.assertTrue(len(files) == 5)
+            results = batch.run(files, jobs=2)
+
+        self.assertTrue([r.path for r in results] == files)
+        self.assertTrue([r.ok for r in results] == [False] + [True] * 4)
+        self.assertTrue(results[0].error == "3:29: output channel 'c' not declared")
+
+        report = batch.summary(results, 1.)
+        self.assertTrue("5 files, 4 succeeded, 1 failed" in report)
+
+
+if __name__ == 'main':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import unittest
+
+sys.path.insert(0, os.path.dirname(__file__) + '/../../..')
+
+import compiler.sync as sync
+import compiler.sync.ast as ast
+import compiler.sync.dispatch as dispatch
+
+
+src = 'synch s (a, b | c) {\
+start {\
+    on:\
+        a.else { goto s1; }\
+        a.?v(x) { goto s1; }\
+        a.(y) { goto s1; }\
+        b.@d { goto s1; }\
+    elseon:\
+        a.?w { goto s1; }\
+        a { goto s1; }\
+}\
+s1 { on: b.?v { goto start; } }\
+}'
+
+
+def conds(index, state, port, tag):
+    '''
+    Return the conditions of the candidates as strings, the class name and
+    the variant.
+    '''
+    out = []
+    for t in index.lookup(state, port, tag):
+        c = t.condition
+        choice = c.choice.value if isinstance(c, ast.CondDataMsg) else None
+        out.append(type(c).__name__ + ('?' + choice if choice else ''))
+    return out
+
+
+class TestIndex(unittest.TestCase):
+    def test_order(self):
+        index = dispatch.build(sync.process(src))
+        self.assertEqual(index.states, ('start', 's1'))
+        self.assertEqual(index.number['s1'], 1)
+
+        # on: before elseon:, else after the others of its scope.
+        self.assertEqual(conds(index, 0, 'a', 'v'),
+                         ['CondDataMsg?v', 'CondDataMsg', 'CondElse', 'CondEmpty'])
+        self.assertEqual(conds(index, 0, 'a', 'w'),
+                         ['CondDataMsg', 'CondElse', 'CondDataMsg?w', 'CondEmpty'])
+        self.assertEqual(conds(index, 0, 'a', 'u'),
+                         ['CondDataMsg', 'CondElse', 'CondEmpty'])
+        self.assertEqual(conds(index, 0, 'a', None), conds(index, 0, 'a', 'u'))
+        self.assertEqual(conds(index, 0, 'a', dispatch.SEGMARK),
+                         ['CondElse', 'CondEmpty'])
+        self.assertEqual(conds(index, 0, 'b', dispatch.SEGMARK), ['CondSegmark'])
+        self.assertEqual(conds(index, 0, 'b', 'v'), [])
+        self.assertEqual(conds(index, 1, 'b', 'v'), ['CondDataMsg?v'])
+        self.assertEqual(conds(index, 1, 'a', 'v'), [])
+
+    def test_item(self):
+        index = dispatch.build(sync.process(src), lambda t: t.port.value)
+        self.assertEqual(index.lookup(0, 'a', 'v'), ('a',) * 4)
+
+
+class TestWait(unittest.TestCase):
+    def test_zip2(self):
+        with open(os.path.join(os.path.dirname(__file__), 'zip2.sync')) as f:
+            index = dispatch.build(sync.process(f.read()))
+        self.assertEqual(index.states, ('start', 's1', 's2'))
+        self.assertEqual(index.wait, [0b11, 0b10, 0b01])
+        self.assertEqual(index.waits(1), ('b',))
+        self.assertEqual(index.tags[1], {'b': frozenset([None, dispatch.SEGMARK])})
+
+    def test_tags(self):
+        index = dispatch.build(sync.process(src))
+        self.assertEqual(index.tags[0]['b'], frozenset([dispatch.SEGMARK]))
+        self.assertEqual(index.tags[1], {'b': frozenset(['v'])})
+        self.assertTrue(index.accepts(0, 'a', 'u'))
+        self.assertFalse(index.accepts(1, 'b', 'u'))
+        self.assertFalse(index.accepts(1, 'b', dispatch.SEGMARK))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import unittest
+
+sys.path.insert(0, os.path.dirname(__file__) + '/../../..')
+
+import compiler.sync as sync
+import compiler.sync.engine as engine
+from compiler.sync.engine import Data, Segmark
+
+
+def machine(src):
+    return engine.build(sync.process(src))
+
+
+class TestEngine(unittest.TestCase):
+    def test_zip2(self):
+        with open(os.path.join(os.path.dirname(__file__), 'zip2.sync')) as f:
+            m = machine(f.read())
+
+        self.assertEqual(m.wait, 0b11)
+        self.assertEqual(m.step('a', Data(None, {'x': 1})), [])
+        self.assertEqual(m.state, 's1')
+        self.assertEqual(m.wait, 0b10)
+        # s1 waits for b.
+        self.assertEqual(m.step('a', Data(None, {'x': 2})), None)
+        self.assertEqual(m.step('b', Data(None, {'y': 3})),
+                         [('c', Data(None, {'x': 1, 'y': 3}))])
+        self.assertEqual(m.state, 'start')
+
+        self.assertEqual(m.step('b', Data(None, {'y': 4})), [])
+        self.assertEqual(m.step('a', Data(None, {'x': 5})),
+                         [('c', Data(None, {'x': 5, 'y': 4}))])
+
+    def test_unknown_port(self):
+        with open(os.path.join(os.path.dirname(__file__), 'zip2.sync')) as f:
+            m = machine(f.read())
+        with self.assertRaises(ValueError) as cm:
+            m.step('zz', Data(None, {'x': 1}))
+        self.assertEqual(str(cm.exception),
+                         "unknown input channel 'zz', the inputs are a, b")
+        # The output channel is not an input either.
+        with self.assertRaises(ValueError):
+            m.step('c', Segmark(1))
+        self.assertEqual(m.state, 'start')
+
+    def test_match(self):
+        m = machine('synch s (a | b) {\
+state int(8) n;\
+start {\
+    on:\
+        a.@d & [d > 0] { set n = [n + 1]; send @[d - 1] => b, nil => b; goto s1; }\
+        a.?v(x || t) & [x > n] { send ?w(t || y: [x - n]) => b; }\
+        a.else { send (this || n: n) => b; }\
+    elseon:\
+        a.(x) { send ?u(x: x) => b; }\
+}\
+s1 { on: a { goto start; } }\
+}')
+        self.assertEqual(m.step('a', Segmark(2)),
+                         [('b', Segmark(1)), ('b', Data(None, {}))])
+        self.assertEqual((m.state, m.variables), ('s1', {'n': 1}))
+        self.assertEqual(m.step('a', Segmark(3)), [])
+
+        self.assertEqual(m.step('a', Data('v', {'x': 4, 'z': 1})),
+                         [('b', Data('w', {'z': 1, 'y': 3}))])
+        # The guard fails, else comes before elseon.
+        self.assertEqual(m.step('a', Data('v', {'x': 1})),
+                         [('b', Data(None, {'x': 1, 'n': 1}))])
+        self.assertEqual(m.step('a', Segmark(0)),
+                         [('b', Data(None, {'n': 1}))])
+        self.assertEqual(m.state, 'start')
+
+    def test_set(self):
+        m = machine('synch s (a | b) {\
+store ?v.a m;\
+state int(8) n;\
+state enum(ON, OFF) e = 1;\
+start {\
+    on:\
+        a.?v(x) {\
+            set k = [x * 2], n = [n + k], m = (this || \'k), e = [ON];\
+            send ?v(m || \'e) => b;\
+        }\
+        a.?q & [e == ON] { send m => b; }\
+}}')
+        self.assertEqual(m.variables, {'m': {}, 'n': 0, 'e': 1})
+        self.assertEqual(m.step('a', Data('q', {})), None)
+        self.assertEqual(m.step('a', Data('v', {'x': 3})),
+                         [('b', Data('v', {'x': 3, 'k': 6, 'e': 0}))])
+        self.assertEqual(m.variables, {'m': {'x': 3, 'k': 6}, 'n': 6, 'e': 0})
+        self.assertEqual(m.step('a', Data('q', {})),
+                         [('b', Data(None, {'x': 3, 'k': 6}))])
+
+        # The machines of the same program are independent.
+        other = engine.Machine(m.program)
+        self.assertEqual(other.variables, {'m': {}, 'n': 0, 'e': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import unittest
+
+sys.path.insert(0, os.path.dirname(__file__) + '/../../..')
+
+import compiler.sync as sync
+import compiler.sync.fold as fold
+import compiler.sync.intexp as intexp
+import compiler.sync.codegen as codegen
+
+
+class TestFold(unittest.TestCase):
+    def setUp(self):
+        self.ast = sync.process('@N\nsynch id (a | b) {\
+state int(3) q;\
+state enum(ON, OFF) e;\
+start {\
+    on:\
+        a.?v(x) & [N - 1 == 3 && x * 1 + 0 > 2 + 1] {\
+            set q = [(x + 1) + 2 - 3], e = [OFF + 0 * x];\
+            send ?v(y:[0 - -x]) => b;\
+        }\
+        a.?w(x) & [N > 1] {}\
+        a.?u(x) & [N < 1 || 0] {}\
+        a.?z(x) & [x / 0 + (1 << -1) + 7 % 1] {}\
+}}', {'N': 4})
+        self.trans = self.ast.states.states[0].trans_orders[0].trans_stmt
+        self.report = fold.build(self.ast)
+
+    def exps(self, trans):
+        return [intexp.show(e.exp) for e in intexp.find(trans)]
+
+    def test_fold(self):
+        self.assertTrue(self.exps(self.trans[0]) == ['(x > 3)', 'x', '1', 'x'])
+        self.assertTrue(self.trans[0].guard.args == ['x'])
+        self.assertTrue(self.trans[0].actions[1].rhs.args == [])
+
+    def test_runtime_errors_kept(self):
+        self.assertTrue(self.exps(self.trans[3]) == ['((x / 0) + (1 << -1))'])
+
+    def test_faults_kept(self):
+        ast = sync.process('synch id (a | b) {\
+start {\
+    on:\
+        a.?v(x) & [(x / x) && 0 || (x >> x) || 1] {\
+            set i = [(x / 0) * 0], j = [0 * (x % x)], k = [(x << x) % 1],\
+                l = [(x / 2) * 0], m = [0 && (x / 0)], n = [(x % 3) & 0];\
+        }\
+}}')
+        trans = ast.states.states[0].trans_orders[0].trans_stmt[0]
+        fold.build(ast)
+        self.assertTrue(self.exps(trans) == [
+            '((((x / x) && 0) || (x >> x)) || 1)',
+            '((x / 0) * 0)', '(0 * (x % x))', '((x << x) % 1)', '0', '0', '0'])
+
+    def test_guards(self):
+        self.assertTrue(self.trans[1].guard.exp is None)
+        self.assertTrue(self.report.removed == [self.trans[1]])
+        self.assertTrue(self.report.dead == [self.trans[2]])
+        self.assertTrue(self.report.expressions == 7)
+
+    def test_codegen(self):
+        code = codegen.build(self.ast)
+        c = code[self.trans[0]]
+        self.assertTrue(c.guard({}, {'x': 4}))
+        self.assertTrue(c.assign({}, {'x': 4}) == (4, 1))
+        self.assertTrue(code[self.trans[1]].guard is None)
+        self.assertFalse(code[self.trans[2]].guard({}, {'x': 4}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,6 +8,9 @@ sys.path.insert(0, os.path.dirname(__file__) + '/../../..')
 
 import compiler.sync as sync
 import compiler.sync.exception as exn
+import compiler.sync.intab as intab
+import compiler.sync.symtab as symtab
+import compiler.sync.types as types
 
 
 class TestIntabError(unittest.TestCase):
@@ -194,5 +197,30 @@ start {\
                 " integer expression declared data")
 
 
+
+class TestCheckExp(unittest.TestCase):
+    def check(self, term):
+        s = symtab.Symtab(None)
+        s.put('x', symtab.Entry(term, sync.ast.ID('x'), ro=True))
+        intab.CheckExp(s).traverse(sync.ast.IntExp(sync.ast.ID('x'), ['x']))
+        return s.get('x').type
+
+    def test_bound_variable(self):
+        # A label unified with Int already is an integer, its entry keeps
+        # the variable.
+        var = types.Variable()
+        types.unify(var, types.Int())
+        self.assertTrue(self.check(var) is var)
+
+        var = types.Variable()
+        self.assertTrue(self.check(var) is var)
+        self.assertTrue(types.find(var) is types.Int())
+
+        var = types.Variable()
+        types.unify(var, types.Record(labels={}, tails=[types.Variable()]))
+        with self.assertRaises(exn.TypeError):
+            self.check(var)
+
+
 if __name__ == 'main':
     unittest.main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import unittest
+
+sys.path.insert(0, os.path.dirname(__file__) + '/../../..')
+
+import compiler.sync as sync
+import compiler.sync.layout as layout
+import compiler.sync.engine as engine
+from compiler.sync.engine import Data
+
+
+src = 'synch s (a | b) {\
+store ?v.a m;\
+state int(3) n = 5;\
+state enum(A, B, C) e = 2;\
+state int(1) f;\
+s0 { on: a.?v(x) { set n = [n + x], m = this; send (n: n || \'e) => b; goto start; } }\
+start { on: a.?v(x) & [x > 0] { set e = [A], f = [1]; goto s2; } }\
+s2 { on: a { goto s0; } }\
+}'
+
+
+class TestLayout(unittest.TestCase):
+    def test_fields(self):
+        lay = layout.build(sync.process(src))
+        self.assertEqual(lay.states, ('s0', 'start', 's2'))
+        self.assertEqual([(f.name, f.shift, f.width) for f in lay.fields.values()],
+                         [('n', 2, 3), ('e', 5, 2), ('f', 7, 1)])
+        self.assertEqual(lay.control.width, 2)
+        self.assertEqual(lay.width, 8)
+
+        word = lay.initial
+        self.assertEqual(lay.state(word), 1)
+        self.assertEqual(lay.unpack(word), {'n': 5, 'e': 2, 'f': 0})
+        self.assertEqual(lay.pack({'n': 5, 'e': 2}, 1), word)
+        self.assertEqual(lay.fields['n'].set(word, 9), lay.pack({'n': 1, 'e': 2}, 1))
+
+    def test_words(self):
+        lay = layout.Layout(['s'], [('x', 40), ('y', 40)])
+        word = lay.pack({'x': 2**40 - 1, 'y': 3})
+        words = lay.words(word, 32)
+        self.assertEqual(len(words), 3)
+        self.assertEqual(lay.join(words, 32), word)
+        self.assertEqual(lay.words(0), (0, 0))
+
+    def test_engine(self):
+        m = engine.build(sync.process(src))
+        self.assertEqual(m.state, 'start')
+        self.assertEqual(m.step('a', Data('v', {'x': 1})), [])
+        self.assertEqual(m.variables, {'m': {}, 'n': 5, 'e': 0, 'f': 1})
+
+        m.step('a', Data('v', {'x': 1}))
+        saved = m.snapshot()
+        # int(3) wraps: 5 + 4 = 1 (mod 8).
+        self.assertEqual(m.step('a', Data('v', {'x': 4})),
+                         [('b', Data(None, {'n': 1, 'e': 0}))])
+        self.assertEqual(m.variables['m'], {'x': 4})
+        self.assertEqual(m.state, 'start')
+
+        m.restore(saved)
+        self.assertEqual((m.state, m.variables), ('s0', {'m': {}, 'n': 5, 'e': 0, 'f': 1}))
+        self.assertEqual(m.word, m.program.layout.pack({'n': 5, 'f': 1}, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import json
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(__file__) + '/../../..')
+
+import compiler.sync as sync
+import compiler.sync.network as network
+
+
+producer = 'synch prod (a | b, c) {\
+start {\
+    on:\
+        a.?v(x || t) & [x > 0] { send ?p(t || x: [x]) => b, ?q(y: [x]) => c; }\
+        a.?w(k) { send ?r(\'k) => b; }\
+}}'
+
+consumer = 'synch cons (i, j | o) {\
+start {\
+    on:\
+        i.?p(x) & [x > 1] { send (this) => o; }\
+        i.?r(k) { send ?s(k) => o; }\
+        j.(y, z) & [y > 0] { send (this) => o; }\
+}}'
+
+
+class TestCheck(unittest.TestCase):
+    def setUp(self):
+        self.components = {'p': sync.passport(producer),
+                           'c': sync.passport(consumer)}
+
+    def errors(self, connections, jobs=1):
+        report = network.check(self.components, connections, jobs)
+        return dict((conn, problems) for conn, problems in report.errors)
+
+    def test_compatible(self):
+        self.assertEqual(self.errors([('p', 'b', 'c', 'i')]), {})
+
+    def test_incompatible(self):
+        # Variant ?q carries y only and is matched by j.(y, z).
+        conn = ('p', 'c', 'c', 'j')
+        self.assertEqual(self.errors([conn])[conn],
+                         ("variant 'q': label 'z' is not sent",))
+
+        # i has no transition on ?q.
+        conn = ('p', 'c', 'c', 'i')
+        self.assertEqual(self.errors([conn])[conn],
+                         ("variant 'q': no transition accepts it",))
+
+        # j.(y, z) matches any variant: the closed record of ?r lacks y and
+        # z, the open one of ?p may carry them.
+        conn = ('p', 'b', 'c', 'j')
+        self.assertEqual(self.errors([conn])[conn],
+                         ("variant 'r': label 'y' is not sent",
+                          "variant 'r': label 'z' is not sent"))
+
+    def test_terms(self):
+        problems = []
+        network.satisfies(('rec', (), ()), ('int', 0), 'x', problems)
+        self.assertEqual(problems, ["x: {} sent, Int(0) expected"])
+        problems = []
+        network.satisfies(('union', (('int', 0), ('enum', ('A',)))),
+                          ('int', 0), 'x', problems)
+        network.satisfies(('int', 0), ('var', 1), 'x', problems)
+        self.assertEqual(problems, [])
+
+    def test_missing(self):
+        conn = ('p', 'z', 'c', 'i')
+        self.assertEqual(self.errors([conn])[conn], ("no output channel 'p.z'",))
+
+    def test_memo(self):
+        connections = [('p', 'b', 'c', 'i'), ('p', 'c', 'c', 'j')] * 10
+        memo = {}
+        report = network.check(self.components, connections, 1, memo)
+        self.assertEqual((report.checked, report.memo_hits), (2, 18))
+        self.assertEqual(len(report.errors), 10)
+
+        report = network.check(self.components, connections, 1, memo)
+        self.assertEqual((report.checked, report.memo_hits), (0, 20))
+        self.assertEqual(len(report.errors), 10)
+
+    def test_parallel(self):
+        connections = [(p, o, c, i) for p in 'pc' for o in 'bco'
+                                    for c in 'pc' for i in 'aij']
+        threshold = network.parallel_threshold
+        network.parallel_threshold = 0
+        try:
+            parallel = network.check(self.components, connections, 2)
+        finally:
+            network.parallel_threshold = threshold
+        serial = network.check(self.components, connections, 1)
+        self.assertEqual(parallel.errors, serial.errors)
+        self.assertEqual(parallel.checked, serial.checked)
+
+
+class TestWiring(unittest.TestCase):
+    def test_load(self):
+        with tempfile.TemporaryDirectory() as d:
+            with open(os.path.join(d, 'prod.sync'), 'w') as f:
+                f.write(producer)
+            with open(os.path.join(d, 'cons.json'), 'w') as f:
+                f.write(sync.passport(consumer).to_json())
+            with open(os.path.join(d, 'net.json'), 'w') as f:
+                json.dump({'components': {'p': 'prod.sync', 'c': 'cons.json'},
+                           'connections': [['p.b', 'c.i'], ['p.c', 'c.j']]}, f)
+
+            wiring = network.load_wiring(os.path.join(d, 'net.json'))
+            self.assertEqual(wiring.connections,
+                             [('p', 'b', 'c', 'i'), ('p', 'c', 'c', 'j')])
+            report = network.check_wiring(wiring, jobs=1)
+            self.assertEqual(report.connections, 2)
+            self.assertEqual([conn for conn, _ in report.errors],
+                             [('p', 'c', 'c', 'j')])
+
+    def test_incremental(self):
+        with tempfile.TemporaryDirectory() as d:
+            def write(name, code):
+                with open(os.path.join(d, name), 'w') as f:
+                    f.write(code)
+
+            write('prod.sync', producer)
+            write('cons.sync', consumer)
+            write('net.json', json.dumps(
+                {'components': {'p': 'prod.sync', 'c': 'cons.sync'},
+                 'connections': [['p.b', 'c.i'], ['p.c', 'c.j'], ['c.o', 'c.i']]}))
+            wiring = network.load_wiring(os.path.join(d, 'net.json'))
+            state_file = os.path.join(d, 'net.state')
+
+            def run():
+                state = network.load_state(state_file)
+                report = network.check_incremental(wiring, state, jobs=1)
+                state.save(state_file)
+                return ((report.loaded, report.skipped_components,
+                         report.skipped_connections),
+                        [conn for conn, _ in report.errors])
+
+            errors = [('p', 'c', 'c', 'j'), ('c', 'o', 'c', 'i')]
+            self.assertEqual(run(), ((2, 0, 0), errors))
+            self.assertEqual(run(), ((0, 2, 3), errors))
+
+            # The passport is the same, the connections are not checked.
+            write('cons.sync', consumer.replace('[x > 1]', '[x > 2]'))
+            self.assertEqual(run(), ((1, 1, 3), errors))
+
+            # Only the connections of the producer are checked.
+            write('prod.sync', producer.replace('?q(y: [x])', '?q(y: [x] || z: [x])'))
+            self.assertEqual(run(), ((1, 1, 1), errors[1:]))
+
+    def test_endpoint(self):
+        self.assertEqual(network.endpoint('a.b.c'), ('a.b', 'c'))
+        with self.assertRaises(ValueError):
+            network.endpoint('abc')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,12 +2,20 @@
 
 import sys
 import os
+import io
+import tempfile
+import contextlib
+import importlib.util
 import unittest
 
 sys.path.insert(0, os.path.dirname(__file__) + '/../../..')
 
 import compiler.sync as sync
 import compiler.sync.exception as exn
+import compiler.sync.lexer as lexer
+import compiler.sync.scanner as scanner
+import compiler.sync.intexp as intexp
+from compiler.sync.bench import gen
 
 
 class TestParseError(unittest.TestCase):
@@ -134,5 +142,226 @@ class TestDuplicatesError(unittest.TestCase):
             self.assertTrue(err.msg == "'x' was previously declared")
 
 
+class TestScanner(unittest.TestCase):
+    def tokens(self, lex, code):
+        lex.input(code)
+        return [(t.type, t.value, t.lineno, t.lexpos) for t in iter(lex.token, None)]
+
+    def test_same_tokens(self):
+        tests = os.path.dirname(__file__)
+        sources = [os.path.join(tests, 'zip2.sync')]
+        sources += [os.path.join(tests, 'syntax', f)
+                for f in sorted(os.listdir(os.path.join(tests, 'syntax')))]
+        codes = []
+        for path in sources:
+            with open(path, 'r') as f:
+                codes.append(f.read())
+        codes.append('/* multi\nline */ a&&b&c||d|e<<=<= >>>=> ==!=! x1 23\n'
+                '# comment /* \n \'y ?q.@r;%^*-+ /*unterminated')
+
+        for code in codes:
+            self.assertTrue(self.tokens(lexer.build(), code)
+                    == self.tokens(scanner.build(), code))
+
+    def test_trailing_blanks(self):
+        # A failing token match must not backtrack over the blanks before.
+        codes = ['x' + ' ' * 40, ' \t\n' * 40,
+                 'x\n' + '  # c # d /* e */\n /* f */' * 40,
+                 'a /* unterminated' + ' ' * 40]
+        for code in codes:
+            self.assertEqual(self.tokens(lexer.build(), code),
+                             self.tokens(scanner.build(), code))
+
+        with open(os.path.join(os.path.dirname(__file__), 'zip2.sync')) as f:
+            code = f.read()
+        c = sync.Compiler(tokenizer='scanner')
+        self.assertEqual(c.process(code + '\n' * 40 + '# end\n  ').name.value,
+                         c.process(code).name.value)
+
+    def test_illegal(self):
+        code = 'x' + ' ' * 40 + '$ y' + '\n' * 40 + '$'
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            self.assertEqual(self.tokens(scanner.build(), code),
+                             [('ID', 'x', 1, 0), ('ID', 'y', 1, 43)])
+        self.assertEqual(out.getvalue(), "Illegal character '$'\n" * 2)
+
+    def test_parse(self):
+        c = sync.Compiler(tokenizer='scanner')
+        code = 'synch id (a | b)\n{\nstart {on: a.?v(x || t) & [x + 1 > 2] {send this => b;}}}'
+        self.assertTrue(c.process(code).name.value == 'id')
+        try:
+            c.parse('synch id (a | b)\n{\nstart {on: a{,}}}')
+            assert(1 != 1)
+        except exn.ParseError as err:
+            self.assertTrue(err.coord.lineno == 3)
+            self.assertTrue(err.coord.lexpos == 32)
+
+
+class TestIntExp(unittest.TestCase):
+    def test_tree(self):
+        ast = sync.parse('synch id (a | b) {\
+state int(3) q;\
+state enum(ON, OFF) e;\
+start {\
+    on:\
+        a.?v(x) & [x + 2 * 3 - 1 - q == 6 && !x] {\
+            set q = [-(x % 4) / 2];\
+        }\
+        a.?w {}\
+}}')
+        trans = ast.states.states[0].trans_orders[0].trans_stmt
+        guard = trans[0].guard
+        self.assertTrue(isinstance(guard.exp, sync.ast.BinaryOp))
+        self.assertTrue(intexp.show(guard.exp)
+                == "(((((x + (2 * 3)) - 1) - q) == 6) && (!x))")
+        self.assertTrue(guard.args == ['x', 'q', 'x'])
+        self.assertTrue([l.value for l in intexp.ids(guard.exp)] == ['x', 'q', 'x'])
+
+        rhs = trans[0].actions[0].rhs
+        self.assertTrue(intexp.show(rhs.exp) == "((-(x % 4)) / 2)")
+
+        # Empty guard
+        self.assertTrue(trans[1].guard.exp is None)
+
+        # Enum members are constant expressions
+        off = ast.decls.symtab.get('OFF').ast
+        self.assertTrue(isinstance(off.exp, sync.ast.NUMBER))
+        self.assertTrue(off.exp.value == 1)
+
+
+    def test_precedence(self):
+        def show(exp):
+            ast = sync.parse('synch id (a | b) {\
+start { on: a.(x, y) & [%s] {} }}' % exp)
+            trans = ast.states.states[0].trans_orders[0].trans_stmt[0]
+            return intexp.show(trans.guard.exp)
+
+        self.assertEqual(show('x == 1 || x == 2 && y == 3'),
+                         '((x == 1) || ((x == 2) && (y == 3)))')
+        self.assertEqual(show('x & 1 == 1'), '((x & 1) == 1)')
+        self.assertEqual(show('x << 1 + 1 == 4'), '((x << (1 + 1)) == 4)')
+        self.assertEqual(show('x | y ^ x & y'), '(x | (y ^ (x & y)))')
+        self.assertEqual(show('x < y == y > x'), '((x < y) == (y > x))')
+        self.assertEqual(show('!x + -y * 2 % 3'), '((!x) + (((-y) * 2) % 3))')
+        self.assertEqual(show('x - y - 1'), '((x - y) - 1)')
+
+
+class TestAST(unittest.TestCase):
+    def test_children(self):
+        ast = sync.parse('synch id (a | b) {\
+state int(3) q;\
+start {\
+    on:\
+        a.?v(x) & [x > q] { set q = [x]; send ?v(this) => b; }\
+}}')
+        stack = [ast]
+        while stack:
+            node = stack.pop()
+            self.assertFalse(hasattr(node, '__dict__'))
+            children = [c for _, c in node.children(expand=True)]
+            self.assertTrue(list(node.iter_children()) == children)
+            stack.extend(children)
+
+        self.assertTrue(sync.ast.Trans.child_names
+                == ('port', 'condition', 'guard', 'actions'))
+
+    def test_descendant_names(self):
+        # The classes declared in sync_ast.cfg must cover the actual trees.
+        directory = os.path.dirname(__file__) + '/syntax'
+        sources = [gen.source(4, 4)]
+        for name in sorted(os.listdir(directory)):
+            with open(os.path.join(directory, name)) as f:
+                sources.append(f.read())
+
+        parsed = 0
+        for code in sources:
+            try:
+                ast = sync.parse(code)
+            except Exception:
+                continue
+            parsed += 1
+
+            def check(node):
+                names = set()
+                for c in node.iter_children():
+                    names.add(type(c).__name__)
+                    names |= check(c)
+                self.assertTrue(names <= node.descendant_names)
+                return names
+            check(ast)
+
+        self.assertTrue(parsed > 1)
+
+
+    def test_ast_gen(self):
+        path = os.path.dirname(__file__) + '/../ast/ast_gen.py'
+        spec = importlib.util.spec_from_file_location('ast_gen', path)
+        ast_gen = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(ast_gen)
+
+        def generate(cfg):
+            with tempfile.NamedTemporaryFile('w', suffix='.cfg') as f:
+                f.write(cfg)
+                f.flush()
+                return ast_gen.ASTCodeGenerator(f.name)
+
+        g = generate('# a -> B\nA: [a*, x]\nB: []\n')
+        self.assertTrue(g.node_cfg[0].descendants == {'B'})
+        for cfg in ('A: [a*]\nB: []\n',              # no types
+                    '# a -> C\nA: [a*]\nB: []\n',     # unknown class
+                    '# a -> B\n# b -> B\nA: [a*]\nB: []\n'):  # stale
+            with self.assertRaises(RuntimeError):
+                generate(cfg)
+
+
+class CountVisitor(sync.ast.NodeVisitor):
+    def visit_ID(self, node, _):
+        return 1
+
+    def generic_visit(self, node, children):
+        n = 0
+        for c in children.values():
+            n += sum(c) if type(c) == list else c
+        return n
+
+
+class IdVisitor(sync.ast.NodeVisitor):
+    collect = False
+
+    def __init__(self):
+        self.ids = []
+        self.children = set()
+
+    def visit_ID(self, node, children):
+        self.ids.append(node.value)
+        self.children.add(children)
+
+    def visit_Trans(self, node, children):
+        self.ids.append('Trans')
+
+
+class TestNodeVisitor(unittest.TestCase):
+    def setUp(self):
+        depth = 5000
+        self.ast = sync.parse('synch id (a | b) {\
+start {\
+    on:\
+        a.?v(x) & [%s] { goto start; }\
+}}' % ' + '.join(['x'] * depth))
+        self.depth = depth
+
+    def test_collect(self):
+        # ID nodes: id, a, b, start, a, v, x, start and the guard.
+        self.assertTrue(CountVisitor().traverse(self.ast) == 8 + self.depth)
+
+    def test_no_collect(self):
+        v = IdVisitor()
+        v.traverse(self.ast)
+        self.assertTrue(v.children == {None})
+        self.assertTrue(v.ids[-1] == 'Trans')
+        self.assertTrue(v.ids[:4] == ['id', 'a', 'b', 'start'])
+        self.assertTrue(v.ids.count('x') == self.depth + 1)
+
+
 if __name__ == 'main':
     unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import pickle
+import subprocess
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(__file__) + '/../../..')
+
+import compiler.sync as sync
+import compiler.sync.analysis as analysis
+import compiler.sync.passports as passports
+from compiler.sync.bench import gen
+
+
+src = 'synch id (a, c | b) {\
+store ?v.a m;\
+state enum(ON, OFF) e;\
+start {\
+    on:\
+        a.?v(x, y || t) & [x > 0] { set m = this; send ?o(t || x: [x] || \'e) => b; }\
+        c.?q(z) { send ?p(z: z || m) => b; }\
+        c.(w) { send (this) => b; }\
+}}'
+
+
+class TestPassport(unittest.TestCase):
+    def test_structure(self):
+        p = sync.passport(src)
+        self.assertTrue(p.name == 'id')
+        self.assertTrue([ch.name for ch in p.inputs] == ['a', 'c'])
+        self.assertTrue([ch.name for ch in p.outputs] == ['b'])
+
+        v = p.channel('a').variant('v')
+        self.assertTrue([l for l, _ in v.labels] == ['x', 'y'])
+        self.assertTrue(v.label('x') == ('int', 0))
+        self.assertTrue(v.label('y')[0] == 'var')
+        self.assertTrue(len(v.tails) == 1)
+        self.assertTrue(p.channel('b').variant('o').label('e')
+                == ('enum', ('ON', 'OFF')))
+        self.assertTrue(p.channel('d') is None)
+
+        with self.assertRaises(AttributeError):
+            p.name = 'other'
+
+    def test_show(self):
+        codes = [src, gen.source(5, 4)]
+        directory = os.path.dirname(__file__)
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.sync'):
+                with open(os.path.join(directory, name)) as f:
+                    codes.append(f.read())
+
+        for code in codes:
+            try:
+                sync_ast = sync.process(code)
+            except Exception:
+                continue
+            self.assertEqual(passports.from_ast(sync_ast).show(),
+                             analysis.canonical_passport(sync_ast))
+
+    def test_serialise(self):
+        p = sync.passport(src)
+        self.assertTrue(passports.Passport.from_json(p.to_json()) == p)
+        data = p.to_bytes()
+        self.assertTrue(passports.Passport.from_bytes(data) == p)
+        self.assertTrue(len(data) < len(p.to_json()) / 2)
+        self.assertTrue(pickle.loads(pickle.dumps(p)) == p)
+        self.assertTrue(hash(passports.Passport.from_bytes(data)) == hash(p))
+
+        with self.assertRaises(ValueError):
+            passports.Passport.from_bytes(data[:3])
+        with self.assertRaises(ValueError):
+            passports.Passport.from_bytes(data + b'\0')
+
+    def test_truncated(self):
+        data = sync.passport(src).to_bytes()
+        for cut in range(len(data)):
+            with self.assertRaises(ValueError):
+                passports.Passport.from_bytes(data[:cut])
+        # A corrupt byte gives another passport or ValueError.
+        for k in range(len(data)):
+            for b in (0, 0x7f, 0x80, 0xff):
+                try:
+                    passports.Passport.from_bytes(data[:k] + bytes([b]) + data[k + 1:])
+                except ValueError:
+                    pass
+
+    def test_without_parser(self):
+        data = sync.passport(src).to_bytes()
+        with tempfile.NamedTemporaryFile(suffix='.bin') as f:
+            f.write(data)
+            f.flush()
+            script = ('import sys\n'
+                      'import sync.passports as passports\n'
+                      'with open(sys.argv[1], "rb") as f:\n'
+                      '    p = passports.Passport.from_bytes(f.read())\n'
+                      'assert p.channel("a").variant("v").label("x") == ("int", 0)\n'
+                      'assert "sync.parser" not in sys.modules\n'
+                      'assert "ply" not in sys.modules\n')
+            env = dict(os.environ, PYTHONPATH=os.path.dirname(__file__) + '/../..')
+            subprocess.check_call([sys.executable, '-c', script, f.name], env=env)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import pickle
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(__file__) + '/../../..')
+
+import compiler.sync as sync
+import compiler.sync.types as types
+
+
+class TestInterning(unittest.TestCase):
+    def test_identity(self):
+        self.assertTrue(types.Int(3) is types.Int(3))
+        self.assertFalse(types.Int(3) is types.Int(4))
+        self.assertTrue(types.Enum(['A', 'B']) is types.Enum(('A', 'B')))
+
+        t = types.Variable()
+        r1 = types.Record(labels={'a': types.Int(), 'b': t}, tails=[t])
+        r2 = types.Record(labels={'a': types.Int(), 'b': t}, tails=(t, t))
+        self.assertTrue(r1 is r2)
+        self.assertTrue(types.Choice({'x': r1}) is types.Choice({'x': r2}))
+
+    def test_label_order(self):
+        ab = types.Record({'a': types.Int(), 'b': types.Int(2)})
+        ba = types.Record({'b': types.Int(2), 'a': types.Int()})
+        self.assertTrue(ab is ba)
+        self.assertTrue(list(ba.labels) == ['a', 'b'])
+        self.assertTrue(types.Choice({'x': ab, 'y': ba})
+                        is types.Choice({'y': ab, 'x': ba}))
+
+        # Merging does not unite the same terms built in two orders.
+        r = types.Record({'r': ab}).merge(types.Record({'r': ba}))
+        self.assertTrue(r.labels['r'] is ab)
+
+    def test_variables(self):
+        self.assertFalse(types.Variable() is types.Variable())
+        self.assertFalse(types.Record(tails=[types.Variable()])
+                is types.Record(tails=[types.Variable()]))
+
+    def test_immutable(self):
+        rec = types.Record(labels={'a': types.Int()})
+        with self.assertRaises(AttributeError):
+            rec.tails = ()
+        with self.assertRaises(TypeError):
+            rec.labels['b'] = types.Int()
+        with self.assertRaises(AttributeError):
+            types.Int().size = 2
+
+    def test_pickle(self):
+        t = types.Variable()
+        ch = types.Choice({'x': types.Record({'a': types.Int(2)}, [t])})
+        self.assertTrue(pickle.loads(pickle.dumps(types.Int(2))) is types.Int(2))
+        copy = pickle.loads(pickle.dumps(ch))
+        self.assertTrue(copy.show() == ch.show())
+        self.assertTrue(copy.variants['x'].labels['a'] is types.Int(2))
+
+    def test_threads(self):
+        found = []
+
+        def make():
+            found.append(types.Record(labels={'t': types.Int(9)}))
+
+        threads = [threading.Thread(target=make) for _ in range(16)]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+        self.assertTrue(all(r is found[0] for r in found))
+
+
+class TestMerge(unittest.TestCase):
+    def test_record(self):
+        t, z = types.Variable(), types.Variable()
+        r1 = types.Record(labels={'a': types.Int(), 'b': t}, tails=[t])
+        r2 = types.Record(labels={'a': types.Variable()}, tails=[z])
+        merged = r1.merge(r2)
+        self.assertTrue(dict(merged.labels) == {'a': types.Int(), 'b': t})
+        self.assertTrue(merged.tails == (t, z))
+        # The operands are left intact.
+        self.assertTrue(r1.tails == (t,) and r2.tails == (z,))
+        # Merging a tail already there returns the record itself.
+        self.assertTrue(merged.merge(types.Record(tails=[z])) is merged)
+
+    def test_union(self):
+        t1, t2, t3 = types.Variable(), types.Variable(), types.Variable()
+        rec = types.merge_records([types.Record({'a': t}) for t in (t1, t2, t3)])
+        self.assertTrue(rec.labels['a'] is types.Union(t1, t2, t3))
+        rec = types.merge_records([types.Record({'a': types.Int()})] * 2)
+        self.assertTrue(rec.labels['a'] is types.Int())
+        with self.assertRaises(TypeError):
+            types.rep_union(types.Int(), types.Record())
+
+    def test_choice(self):
+        t = types.Variable()
+        ch = types.Choice({'x': types.Record({'a': types.Int()})})
+        merged = ch.merge_variants({'x': [types.Record(tails=[t])],
+                                    'y': [types.Record()]})
+        self.assertTrue(merged.variants['x'] is
+                types.Record({'a': types.Int()}, [t]))
+        self.assertTrue(merged.variants['y'] is types.Record())
+        self.assertTrue(list(ch.variants) == ['x'])
+
+
+class TestLabels(unittest.TestCase):
+    def test_mask(self):
+        rec = types.Record({'a': types.Int(), 'b': types.Int()})
+        self.assertTrue(rec.mask == types.label_mask(['b', 'a']))
+        self.assertTrue(rec.mask & types.label_bit('a'))
+        self.assertFalse(rec.mask & types.label_bit('c'))
+        self.assertTrue(types.Record().mask == 0)
+
+    def test_without(self):
+        t = types.Variable()
+        rec = types.Record({'a': types.Int(), 'b': types.Int(2)}, [t])
+        self.assertTrue(rec.without(types.label_mask(['c'])) is rec)
+        self.assertTrue(rec.without(types.label_mask(['a']))
+                is types.Record({'b': types.Int(2)}, [t]))
+        self.assertTrue(rec.without(rec.mask) is types.Record(tails=[t]))
+
+    def test_tables(self):
+        before = dict(types.process_labels.bits)
+        with types.label_table():
+            inner = types.Record({'q1': types.Int(), 'q2': types.Int()})
+            self.assertTrue(inner.mask == 0b11)
+        self.assertTrue(types.process_labels.bits == before)
+
+        # The records of different tables work together.
+        outer = types.Record({'q2': types.Int()})
+        self.assertTrue(inner.subsumes(outer))
+        self.assertFalse(outer.subsumes(inner))
+        self.assertTrue(outer.merge(inner) is
+                        types.Record({'q1': types.Int(), 'q2': types.Int()}))
+        self.assertTrue(inner.without(types.label_mask(['q1'])) is outer)
+
+        # Compilations leave the process table alone.
+        before = dict(types.process_labels.bits)
+        sync.process('synch id (a | b) { start { on: a.(q3, q4) {} }}')
+        self.assertTrue(types.process_labels.bits == before)
+
+    def test_subsumes(self):
+        t = types.Variable()
+        rec = types.Record({'a': types.Int(), 'b': types.Int(2)}, [t])
+        self.assertTrue(rec.subsumes(types.Record({'b': types.Int(2)})))
+        self.assertFalse(rec.subsumes(types.Record({'b': types.Int()})))
+        self.assertFalse(rec.subsumes(types.Record({'c': types.Int()})))
+        self.assertFalse(rec.subsumes(types.Record(tails=[types.Variable()])))
+        self.assertTrue(rec.update(types.Record({'a': types.Int()})) is rec)
+        self.assertTrue(types.merge_records([rec, types.Record(tails=[t])]) is rec)
+
+
+class TestUnify(unittest.TestCase):
+    def test_variables(self):
+        vs = [types.Variable() for _ in range(8)]
+        for v in vs[1:]:
+            types.unify(vs[0], v)
+        top = types.root(vs[-1])
+        self.assertTrue(all(types.root(v) is top for v in vs))
+        # Paths are compressed.
+        self.assertTrue(all(v.parent in (None, top) for v in vs))
+
+        self.assertTrue(types.unify(vs[3], types.Int()) is types.Int())
+        self.assertTrue(all(types.find(v) is types.Int() for v in vs))
+        with self.assertRaises(TypeError):
+            types.unify(vs[5], types.Record())
+
+    def test_records(self):
+        a, b, t1, t2 = (types.Variable() for _ in range(4))
+        r1 = types.Record({'x': a}, [t1])
+        r2 = types.Record({'x': b, 'y': types.Int()}, [t2])
+        rec = types.unify(r1, r2)
+        self.assertTrue(types.find(a) is types.find(b))
+        self.assertTrue(types.root(t1) is types.root(t2))
+        self.assertTrue(set(rec.labels) == {'x', 'y'} and len(rec.tails) == 1)
+
+    def test_resolve(self):
+        a, t, z = types.Variable(), types.Variable(), types.Variable()
+        rec = types.Record({'x': a}, [t])
+        types.unify(a, types.Int(3))
+        types.unify(t, types.Record({'y': types.Int()}, [z]))
+        resolved = types.resolve(rec)
+        self.assertTrue(resolved is types.Record({'x': types.Int(3),
+                                                  'y': types.Int()}, [z]))
+
+        v = types.Variable()
+        types.unify(v, types.Record({'v': v}))
+        with self.assertRaises(TypeError):
+            types.resolve(v)
+
+    def test_labels(self):
+        # The same label matched by two transitions has one type.
+        ast = sync.process('synch id (a | b) {\
+start {\
+    on:\
+        a.?v(x || t) { send ?o(this) => b; }\
+        a.?v(x, y) & [y > 0] { send ?o(x: [y]) => b; }\
+}}')
+        v_rec = ast.inputs.symtab.get('a').type.variants['v']
+        self.assertTrue(isinstance(v_rec.labels['x'], types.Variable))
+        self.assertTrue(v_rec.labels['y'] is types.Int())
+        self.assertTrue(len(v_rec.tails) == 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+import random
+import unittest
+
+sys.path.insert(0, os.path.dirname(__file__) + '/../../..')
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import compiler.sync as sync
+import compiler.sync.engine as engine
+from compiler.sync.engine import Data, Segmark
+
+if np is not None:
+    import compiler.sync.vector as vector
+
+
+counter = 'synch count (a, r | b) {\
+state int(4) n;\
+state enum(LOW, HIGH) level;\
+start {\
+    on:\
+        a.(x) & [x > 0 && level == LOW] {\
+            set n = [n + x], level = [n > 9];\
+            send ?c(\'x || n: [n * 2 / x]) => b;\
+        }\
+        a.(x) & [x % 3 == 0] { send @[x / 3] => b; goto idle; }\
+        r.@d { set n = [d]; send nil => b; }\
+    elseon:\
+        a.else { set level = [LOW]; }\
+}\
+idle { on: a.(x) & [x != 1] { goto start; } r { send (this) => b; } }\
+}'
+
+matcher = 'synch s (a | b) {\
+store ?v.a m;\
+state int(8) n;\
+state enum(ON, OFF) e = 1;\
+start {\
+    on:\
+        a.@d & [d > 0] { set n = [n + 1]; send @[d - 1] => b; goto s1; }\
+        a.?v(x || t) & [x > n] {\
+            set k = [x * 2], n = [n + k], m = (this || \'k), e = [ON];\
+            send ?w(t || y: [x - n]) => b, ?v(m || \'e) => b;\
+        }\
+        a.?q & [e == ON] { send m => b; }\
+        a.else { send (this || n: n) => b; }\
+    elseon:\
+        a.(x) { send ?u(x: x) => b; }\
+}\
+s1 { on: a { goto start; } }\
+}'
+
+# Division by zero and shifts out of int64 behind && and ||.
+arith = 'synch z (a | b) {\
+state int(8) n;\
+start {\
+    on:\
+        a.(x, y) & [x != 0 && y / x > 2] {\
+            set n = [(y << (x * 5)) + n % x];\
+            send (r: [y >> (x * 9)] || s: [n]) => b;\
+        }\
+        a.(x, y) & [x < 8 || (y << (x - 8)) > 2] { set n = [n + y % (x + 1)]; }\
+        a.(x) { send (q: [(x << (x * 5)) % 1000]) => b; }\
+}\
+}'
+
+# Intermediate values out of int64.
+overflow = 'synch z (a | b) {\
+state int(8) n;\
+start {\
+    on:\
+        a.(x, y) & [x * x > y] {\
+            set n = [x * x + y - (x << 31)];\
+            send (p: [-x * y % 1000]) => b;\
+        }\
+}\
+}'
+
+faults = 'synch z (a | b) {\
+start { on: a.(x, y) & [x == 0 || y / (x - 1) > 1] { send (d: [y << (x - 2)]) => b; } }\
+}'
+
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class TestBatch(unittest.TestCase):
+    def compare(self, src, ticks, n=40, seed=1):
+        '''
+        Step a batch of %n% instances and as many machines with the same
+        random messages, the list of (port, variants, labels, segmark) of
+        %ticks%, and check the outputs and the states are the same.
+        '''
+        sync_ast = sync.process(src)
+        batch = vector.build(sync_ast, n)
+        machines = [engine.Machine(engine.Program(sync_ast)) for i in range(n)]
+        rnd = random.Random(seed)
+        for k in range(200):
+            port, variants, labels, segmark = rnd.choice(ticks)
+            variant = [rnd.choice(variants) for i in range(n)]
+            values = dict((l, [rnd.randrange(16) for i in range(n)])
+                          for l in labels)
+            depth = [rnd.randrange(4) for i in range(n)] if segmark else None
+            out = batch.step(port, values, variant, depth=depth)
+
+            sent = dict((i, []) for i in range(n))
+            for o in out:
+                for i, msg in o.messages():
+                    sent[i].append((o.port, msg))
+            for i, m in enumerate(machines):
+                if segmark:
+                    msg = Segmark(depth[i])
+                else:
+                    msg = Data(variant[i], dict((l, v[i]) for l, v in values.items()))
+                expected = m.step(port, msg)
+                self.assertEqual(bool(batch.accepted[i]), expected is not None)
+                self.assertEqual(sent[i], expected or [])
+                self.assertEqual(batch.instance(i), (m.state, m.variables))
+
+    def test_counter(self):
+        self.compare(counter, [('a', [None], ['x'], False),
+                               ('a', [None], [], False),
+                               ('r', [None, 'p'], ['x'], False),
+                               ('r', [None], [], True)])
+
+    def test_matcher(self):
+        self.compare(matcher, [('a', ['v', 'q', None], ['x', 'z'], False),
+                               ('a', ['v', 'q'], ['z'], False),
+                               ('a', [None], [], True)])
+
+    def test_arith(self):
+        self.compare(arith, [('a', [None], ['x', 'y'], False),
+                             ('a', [None], ['x'], False)])
+
+    def test_overflow(self):
+        sync_ast = sync.process(overflow)
+        x = [2 ** 32, 3, 2 ** 62, -2 ** 63, 2 ** 31 - 1, -5]
+        y = [1, 2 ** 63 - 1, -2 ** 62, 0, 7, -2 ** 60]
+        batch = vector.build(sync_ast, len(x))
+        sent = dict((i, []) for i in range(len(x)))
+        for o in batch.step('a', {'x': x, 'y': y}):
+            for i, msg in o.messages():
+                sent[i].append((o.port, msg))
+        for i in range(len(x)):
+            m = engine.build(sync_ast)
+            expected = m.step('a', Data(None, {'x': x[i], 'y': y[i]}))
+            self.assertEqual(bool(batch.accepted[i]), expected is not None)
+            self.assertEqual(sent[i], expected or [])
+            self.assertEqual(batch.instance(i), (m.state, m.variables))
+
+    def test_faults(self):
+        sync_ast = sync.process(faults)
+        for x, error in (([2, 3], None), ([2, 1], ZeroDivisionError),
+                         ([0, 2], ValueError)):
+            batch = vector.build(sync_ast, 2)
+            machines = [engine.build(sync_ast) for i in range(2)]
+            msg = {'x': x, 'y': [3, 3]}
+            if error is None:
+                out = batch.step('a', msg)
+                sent = [m.step('a', Data(None, {'x': x[i], 'y': 3}))
+                        for i, m in enumerate(machines)]
+                self.assertEqual([list(o.messages()) for o in out],
+                                 [[(0, sent[0][0][1])]])
+                self.assertIsNone(sent[1])
+                continue
+            with self.assertRaises(error):
+                batch.step('a', msg)
+            with self.assertRaises(error):
+                for i, m in enumerate(machines):
+                    m.step('a', Data(None, {'x': x[i], 'y': 3}))
+
+    def test_dtype(self):
+        batch = vector.build(sync.process(counter), 3)
+        self.assertEqual(batch.state.dtype, np.uint8)
+        self.assertEqual(batch.variables['n'].dtype, np.uint8)
+        self.assertEqual(vector.dtype(16), np.uint16)
+        self.assertEqual(vector.dtype(33), np.uint64)
+        with self.assertRaises(ValueError):
+            vector.dtype(65)
+
+    def test_active(self):
+        batch = vector.build(sync.process(counter), 4)
+        out = batch.step('a', {'x': [1, 2, 3, 4]}, active=[True, False, True, False])
+        self.assertEqual(list(batch.accepted), [True, False, True, False])
+        self.assertEqual(list(batch.variables['n']), [1, 0, 3, 0])
+        self.assertEqual([list(o.index) for o in out], [[0, 2]])
+
+
+if __name__ == '__main__':
+    unittest.main()
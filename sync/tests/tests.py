@@ -11,6 +11,17 @@ suite = unittest.TestLoader().loadTestsFromNames(
             'test_parser',
             'test_intab',
             'test_outtab',
+            'test_compiler',
+            'test_codegen',
+            'test_fold',
+            'test_analysis',
+            'test_types',
+            'test_passports',
+            'test_network',
+            'test_engine',
+            'test_dispatch',
+            'test_layout',
+            'test_vector',
         ]
     )
 
@@ -1,8 +1,162 @@
-from string import digits, ascii_lowercase
-from random import choice
+from types import MappingProxyType
+import contextlib
+import itertools
+import threading
+import weakref
+
+
+# Table of the interned terms: a structural key maps to the only term with
+# that structure. Terms die with their last reference.
+interned = weakref.WeakValueDictionary()
+intern_lock = threading.Lock()
+
+class Labels(object):
+    '''
+    Table of the record labels: every label is given a bit, and the sets of
+    labels are integer masks of the bits, so that set operations on them are
+    word operations.
+
+    A table is made per compilation (see label_table), and dropped with the
+    terms of the compilation, so that the masks do not grow with all the
+    labels a long-running process has seen. Outside of compilations the
+    process table is used.
+
+    Attributes:
+        bits (dict of str:int): the bits of the labels.
+    '''
+    __slots__ = ('bits', 'lock', '__weakref__')
+
+    def __init__(self):
+        self.bits = {}
+        self.lock = threading.Lock()
+
+    def bit(self, label):
+        '''
+        Return the bit of label %label%, giving it the next bit if it has
+        none.
+        '''
+        bit = self.bits.get(label)
+        if bit is None:
+            with self.lock:
+                bit = self.bits.get(label)
+                if bit is None:
+                    bit = self.bits[label] = 1 << len(self.bits)
+        return bit
+
+    def mask(self, labels):
+        '''
+        Return the mask of the set of %labels%.
+        '''
+        bits = self.bits
+        mask = 0
+        for l in labels:
+            mask |= bits.get(l) or self.bit(l)
+        return mask
+
+
+process_labels = Labels()
+tables = threading.local()
+
+
+def current_labels():
+    '''
+    Return the current <Labels> table of this thread.
+    '''
+    return getattr(tables, 'labels', None) or process_labels
+
+
+@contextlib.contextmanager
+def label_table():
+    '''
+    Give the records created by this thread within the block a new label
+    table. Nested blocks share the table of the outer one.
+    '''
+    if getattr(tables, 'labels', None) is not None:
+        yield
+        return
+    tables.labels = Labels()
+    try:
+        yield
+    finally:
+        tables.labels = None
+
+
+def label_bit(label):
+    '''
+    Return the bit of label %label% in the current table.
+    '''
+    return current_labels().bit(label)
+
+
+def label_mask(labels):
+    '''
+    Return the mask of the set of %labels% in the current table.
+    '''
+    return current_labels().mask(labels)
+
+
+def record_mask(rec, table):
+    '''
+    Return the mask of the labels of record %rec% in <Labels> %table%.
+    '''
+    if rec.table is table or rec.table is None:
+        return rec.mask
+    return table.mask(rec.labels)
+
+
+# Numbers of the variable names: per compilation (see variable_names) or,
+# outside of compilations, per process.
+names = threading.local()
+process_names = itertools.count(1)
+
+
+@contextlib.contextmanager
+def variable_names():
+    '''
+    Number the variables created by this thread within the block from 1, so
+    that compiling the same source gives the same names. Nested blocks
+    continue the numbering of the outer one.
+    '''
+    if getattr(names, 'count', None) is not None:
+        yield
+        return
+    names.count = itertools.count(1)
+    try:
+        yield
+    finally:
+        names.count = None
 
 
 class Term(object):
+    '''
+    Base of the type terms.
+
+    Terms are immutable and hash-consed: there is the only instance of every
+    term structure, so terms are compared (and hashed) by identity in O(1),
+    and can be shared freely between symbol table entries. Operations such
+    as merge return new terms.
+    '''
+    __slots__ = ('__weakref__',)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("type terms are immutable")
+
+    @classmethod
+    def intern(cls, key, **fields):
+        '''
+        Return the term of class %cls% with structural key %key%, creating it
+        with attributes %fields% if it does not exist yet.
+        '''
+        key = (cls,) + key
+        with intern_lock:
+            term = interned.get(key)
+            if term is None:
+                term = object.__new__(cls)
+                for name, value in fields.items():
+                    object.__setattr__(term, name, value)
+                interned[key] = term
+        return term
+
     def show(self): pass
 
 
@@ -10,7 +164,7 @@ class Number(Term):
     '''
     Represents term NUMBER.
     '''
-    pass
+    __slots__ = ()
 
 
 class Int(Number):
@@ -25,8 +179,13 @@ class Int(Number):
     variable is of integer type but it's not a state variable (expression alias,
     enum members).
     '''
-    def __init__(self, s=0):
-        self.size = s
+    __slots__ = ('size',)
+
+    def __new__(cls, s=0):
+        return cls.intern((s,), size=s)
+
+    def __reduce__(self):
+        return (Int, (self.size,))
 
     def show(self):
         return ("Int(%s)" % self.size)
@@ -37,68 +196,165 @@ class Enum(Number):
     Represents enum type of a state variable.
 
     Attributes:
-        enum (dict): enum members' identifiers.
-        size (int): number of elements in the %enum% dict.
+        enum (tuple): enum members' identifiers.
+        size (int): number of elements in the %enum% tuple.
     '''
-    def __init__(self, e):
-        self.enum = e
-        self.size = len(e)
+    __slots__ = ('enum', 'size')
+
+    def __new__(cls, e):
+        e = tuple(e)
+        return cls.intern((e,), enum=e, size=len(e))
+
+    def __reduce__(self):
+        return (Enum, (self.enum,))
 
     def show(self):
-        return "Enum(%s)" % self.enum
+        return "Enum(%s)" % list(self.enum)
 
 
 class Variable(Term):
     '''
-    Represents term VARIABLE. Variable name is generated on instantiation.
+    Represents term VARIABLE. Variable name is generated on instantiation:
+    the variables are numbered in order of creation (see variable_names).
+
+    Every variable is a distinct term. Variables are the nodes of the
+    union-find structure of unify (see below): unlike other terms they are
+    updated in place, by unify only.
+
+    Attributes:
+        label (str): the name of the variable.
+        parent (<Variable>): the next variable on the path to the
+            representative of the class, None for the representative.
+        rank (int): the upper bound of the height of the class tree.
+        value (<Term>): the term the class is bound to, set in the
+            representative only, None if the class is unbound.
     '''
-    def __init__(self):
-        self.label = '__var_' + ''.join(choice(digits + ascii_lowercase)
-                for i in range(6))
+    __slots__ = ('label', 'parent', 'rank', 'value')
+
+    def __new__(cls, label=None):
+        var = object.__new__(cls)
+        if label is None:
+            label = '__var_%d' % next(getattr(names, 'count', None)
+                                      or process_names)
+        object.__setattr__(var, 'label', label)
+        object.__setattr__(var, 'parent', None)
+        object.__setattr__(var, 'rank', 0)
+        object.__setattr__(var, 'value', None)
+        return var
+
+    def __reduce__(self):
+        return (Variable, (self.label,))
 
     def show(self):
         return "$%s" % self.label
 
 
+def unique(tails):
+    '''
+    Return the tuple of %tails% without repetitions.
+    '''
+    return tuple(dict.fromkeys(tails))
+
+
 class Record(Term):
     '''
     Represents term RECORD.
 
     Attributes:
-        labels (dict of str:<Term>): label-term pairs of the record.
-        tails (list of <Variable>): records' tails (might be more than 1).
+        labels (mapping of str:<Term>): label-term pairs of the record
+            (read-only).
+        mask (int): the set of the labels in %table% (see label_mask).
+        table (<Labels>): the label table current when the record was made,
+            None for the records without labels.
+        tails (tuple of <Variable>): records' tails (might be more than 1).
+
+    %mask% may be passed to the constructor if it is known already, in the
+    current table. The records of different tables are different terms.
     '''
-    def __init__(self, labels={}, tails=[]):
-        self.labels = labels
-        self.tails = tails
+    __slots__ = ('labels', 'mask', 'table', 'tails', 'tail_set')
+
+    def __new__(cls, labels={}, tails=(), mask=None):
+        # The labels are sorted, so that the order they are given in does
+        # not make different terms.
+        labels = dict(sorted(labels.items()))
+        tails = unique(tails)
+        table = current_labels() if labels else None
+        if mask is None:
+            mask = table.mask(labels) if table else 0
+        return cls.intern((tuple(labels.items()), tails, table),
+                          labels=MappingProxyType(labels), mask=mask,
+                          table=table, tails=tails, tail_set=frozenset(tails))
+
+    def __reduce__(self):
+        return (Record, (dict(self.labels), self.tails))
 
     def merge(self, other):
         '''
-        Merge two records into one.
+        Return the merge of two records.
 
         { {a:Int, b:$v}, [$t] }.merge({ {a:$w}, [$z] })
-            = { {a:Union(Int, $w), b:$v}, [$t, $z] } 
+            = { {a:Int, b:$v}, [$t, $z] }
         '''
         assert(isinstance(other, Record))
-        for l in other.labels:
-            if l in self.labels:
-                if self.labels[l] != other.labels[l]:
-                    self.labels[l] = rep_union(self.labels[l], other.labels[l])
-            else:
-                self.labels[l] = other.labels[l]
-        #FIXME add uniq check
-        for t in other.tails:
-            if t not in self.tails:
-                self.tails.append(t)
+        if self.subsumes(other):
+            return self
+        return merge_records((self, other))
+
+    def subsumes(self, other):
+        '''
+        Return True if record %other% adds nothing to the record: its labels
+        are among those of the record, with the same terms, and so are its
+        tails.
+        '''
+        if other is self:
+            return True
+        if other.table is self.table or other.table is None:
+            if other.mask & ~self.mask:
+                return False
+        elif not other.labels.keys() <= self.labels.keys():
+            return False
+        if not other.tail_set <= self.tail_set:
+            return False
+        labels = self.labels
+        for l, term in other.labels.items():
+            if labels[l] is not term:
+                return False
+        return True
 
     def update(self, other):
+        '''
+        Return the record with the labels of %other% replacing those of the
+        record, and the tails of both.
+        '''
         assert(isinstance(other, Record))
-        for l in other.labels:
-            self.labels[l] = other.labels[l]
+        if self.subsumes(other):
+            return self
+        labels = dict(self.labels)
+        labels.update(other.labels)
+        return Record(labels, self.tails + other.tails)
 
-        for t in other.tails:
-            if t not in self.tails:
-                self.tails.append(t)
+    def without(self, mask):
+        '''
+        Return the record without the labels of %mask% (see label_mask), with
+        the same tails.
+        '''
+        table = current_labels()
+        own = record_mask(self, table)
+        common = own & mask
+        if not common:
+            return self
+        if common == own:
+            return Record({}, self.tails, 0)
+        bits = table.bits
+        return Record(dict((l, t) for l, t in self.labels.items()
+                           if not bits[l] & common), self.tails,
+                      own & ~common)
+
+    def with_tails(self, tails):
+        '''
+        Return the record with the same labels and tails %tails%.
+        '''
+        return Record(self.labels, tails)
 
     def show(self):
         '''
@@ -134,37 +390,92 @@ class Record(Term):
         return "{ }"
 
 
+def merge_records(records, union=None):
+    '''
+    Return the merge of %records% in order, built at once. The labels found
+    in several records with different terms get their union (see
+    rep_union), tails are collected without repetitions.
+    '''
+    if records and all(records[0].subsumes(rec) for rec in records[1:]):
+        return records[0]
+
+    union = union or rep_union
+    table = current_labels()
+    labels = {}
+    seen = 0
+    tails = {}
+    for rec in records:
+        mask = record_mask(rec, table)
+        if not mask & seen:
+            # No label seen before: no unions.
+            labels.update(rec.labels)
+        else:
+            for l, term in rec.labels.items():
+                prev = labels.get(l)
+                if prev is None:
+                    labels[l] = term
+                elif prev is not term:
+                    labels[l] = union(prev, term)
+        seen |= mask
+        for t in rec.tails:
+            tails[t] = None
+    return Record(labels, tails, seen)
+
+
 class Choice(Term):
     '''
     Represents term CHOICE.
 
     Attributes:
-        variants (dict of str:<Record>): label-record pairs of the choice.
-        tails (list of <Variable>): choices' tails (might be more than 1,
+        variants (mapping of str:<Record>): label-record pairs of the choice
+            (read-only).
+        tails (tuple of <Variable>): choices' tails (might be more than 1,
         in theory).
     '''
-    def __init__(self, variants={}, tails=[]):
+    __slots__ = ('variants', 'tails', 'tail_set')
+
+    def __new__(cls, variants={}, tails=()):
+        variants = dict(sorted(variants.items()))
         for v in variants:
             assert(isinstance(variants[v], Record))
-        self.variants = variants
-        self.tails = tails
+        tails = unique(tails)
+        return cls.intern((tuple(variants.items()), tails),
+                          variants=MappingProxyType(variants), tails=tails,
+                          tail_set=frozenset(tails))
+
+    def __reduce__(self):
+        return (Choice, (dict(self.variants), self.tails))
 
     def merge(self, other):
         '''
-        Merge two choices in one, similar to Record.merge.
+        Return the merge of two choices, similar to Record.merge.
         '''
         assert(isinstance(other, Choice))
+        return self.merge_variants(dict((v, [r]) for v, r in other.variants.items()),
+                                   other.tails)
 
-        for v in other.variants:
-            if v in self.variants:
-                self.variants[v].merge(other.variants[v])
-            else:
-                self.variants[v] = other.variants[v]
-
-        for t in other.tails:
-            if t not in self.tails:
-                self.tails.append(t)
-
+    def merge_variants(self, variants, tails=(), merge=merge_records):
+        '''
+        Return the choice with the lists of records %variants% (a dict of
+        str:[<Record>, ...]) merged into its variants by %merge%, and tails
+        %tails% added. Many merges into a choice are thus done at once.
+        '''
+        merged = dict(self.variants)
+        for v, records in variants.items():
+            if v in merged:
+                records = [merged[v]] + list(records)
+            merged[v] = records[0] if len(records) == 1 \
+                    else merge(records)
+        return Choice(merged, self.tails + tuple(tails))
+
+    def with_variants(self, variants):
+        '''
+        Return the choice with the variants set to the records of
+        %variants% (a dict of str:<Record>).
+        '''
+        merged = dict(self.variants)
+        merged.update(variants)
+        return Choice(merged, self.tails)
 
     def show(self):
         '''
@@ -200,27 +511,237 @@ class Choice(Term):
         return "(: :)"
 
 
-class Union(object):
+class Union(Term):
     '''
-    Represents an OR of two label-value pairs with the same label.
+    Represents an OR of the values of the same label.
 
     Attributes:
-        val_[1|2] (<Term>): values to be put in the union.
+        vals (tuple of <Term>): values put in the union, all variables or
+            all of the same class.
     '''
-    def __init__(self, val_1, val_2):
-        self.val_1 = val_1
-        self.val_2 = val_2
+    __slots__ = ('vals',)
+
+    def __new__(cls, *vals):
+        vals = unique(vals)
+        return cls.intern((vals,), vals=vals)
+
+    def __reduce__(self):
+        return (Union, self.vals)
 
     def show(self):
-        return "union(%s, %s)" % (self.val_1.show(), self.val_2.show())
+        return "union(%s)" % ', '.join(v.show() for v in self.vals)
+
 
 def rep_union(r1, r2):
-    if isinstance(r1, Variable) and not isinstance(r2, Variable):
-        return r2
-    if not isinstance(r1, Variable) and isinstance(r2, Variable):
+    '''
+    Return the union of the values %r1% and %r2% of a label. A variable is
+    subsumed by a term of any other class; terms of different classes
+    (other than variables) cannot be united.
+    '''
+    r1, r2 = find(r1), find(r2)
+    if r1 is r2:
         return r1
-    if isinstance(r1, Variable) and isinstance(r2, Variable):
-        return Union(r1, r2)
-    if r1.__class__.__name__ != r2.__class__.__name__:
-        raise TypeError
-    return Union(r1, r2)
+
+    vals = []
+    for r in (r1, r2):
+        vals.extend(r.vals if isinstance(r, Union) else (r,))
+
+    terms = [v for v in vals if not isinstance(v, Variable)]
+    if terms:
+        if any(type(t) is not type(terms[0]) for t in terms):
+            raise TypeError
+        vals = terms
+
+    vals = unique(vals)
+    return vals[0] if len(vals) == 1 else Union(*vals)
+
+
+def canonical(term, renamed):
+    '''
+    Return the canonical text of term %term%: the labels and the variants
+    are sorted, and the variables are named $0, $1, ... in order of
+    appearance. %renamed% (a dict of <Variable>:str) holds the names given
+    already, so that the variables shared by several terms keep their names.
+    Equal texts denote the same term up to the names of the variables.
+    '''
+    term = find(term)
+    if isinstance(term, Variable):
+        name = renamed.get(term)
+        if name is None:
+            name = renamed[term] = '$%d' % len(renamed)
+        return name
+    if isinstance(term, Record):
+        labels = ', '.join("'%s':%s" % (l, canonical(term.labels[l], renamed))
+                           for l in sorted(term.labels))
+        tails = ' | '.join(canonical(t, renamed) for t in term.tails)
+        return '{%s}' % ' | '.join(part for part in (labels, tails) if part)
+    if isinstance(term, Choice):
+        variants = ', '.join("'%s':%s" % (v, canonical(term.variants[v], renamed))
+                             for v in sorted(term.variants))
+        tails = ' | '.join(canonical(t, renamed) for t in term.tails)
+        return '(:%s:)' % ' | '.join(part for part in (variants, tails) if part)
+    if isinstance(term, Union):
+        return 'union(%s)' % ', '.join(sorted(canonical(v, renamed)
+                                              for v in term.vals))
+    return term.show()
+
+
+# Unification.
+#
+# The classes of the variables known to be equal are kept in a union-find
+# structure: every variable points to its parent, the root of the tree is
+# the representative of the class and holds the term the class is bound to.
+# Paths are compressed on lookup and the lower tree is linked under the
+# higher one, so a sequence of unifications runs in nearly linear time.
+#
+# Terms other than variables are joined when unified: numbers that differ
+# give the plain integer, records (choices) get the labels (variants) of
+# both with the values unified and their tails unified into one variable.
+
+def root(var):
+    '''
+    Return the representative of the class of variable %var%.
+    '''
+    top = var
+    while top.parent is not None:
+        top = top.parent
+    while var is not top:
+        parent = var.parent
+        object.__setattr__(var, 'parent', top)
+        var = parent
+    return top
+
+
+def find(term):
+    '''
+    Return the term %term% stands for: the value or the representative of
+    the class of a variable, %term% itself otherwise.
+    '''
+    if isinstance(term, Variable):
+        top = root(term)
+        return top if top.value is None else top.value
+    return term
+
+
+def unify(t1, t2):
+    '''
+    Make terms %t1% and %t2% equal, binding their variables, and return the
+    common term. TypeError is raised if the terms cannot be unified.
+    '''
+    if isinstance(t1, Variable):
+        t1 = root(t1)
+    if isinstance(t2, Variable):
+        t2 = root(t2)
+    if t1 is t2:
+        return find(t1)
+
+    if isinstance(t1, Variable) and isinstance(t2, Variable):
+        if t1.rank < t2.rank:
+            t1, t2 = t2, t1
+        object.__setattr__(t2, 'parent', t1)
+        if t1.rank == t2.rank:
+            object.__setattr__(t1, 'rank', t1.rank + 1)
+        if t2.value is None:
+            return find(t1)
+        value = t2.value if t1.value is None else join(t1.value, t2.value)
+        object.__setattr__(t1, 'value', value)
+        return value
+
+    if isinstance(t2, Variable):
+        t1, t2 = t2, t1
+    if isinstance(t1, Variable):
+        value = t2 if t1.value is None else join(t1.value, t2)
+        object.__setattr__(t1, 'value', value)
+        return value
+
+    return join(t1, t2)
+
+
+def unify_tails(tails):
+    '''
+    Unify the variables %tails% and return the tuple of the first of them,
+    empty if there are no tails.
+    '''
+    for t in tails[1:]:
+        unify(tails[0], t)
+    return tuple(tails[:1])
+
+
+def unify_records(records):
+    '''
+    Return the record with the labels of %records%, the values of the same
+    label unified, and the tails unified into one.
+    '''
+    rec = merge_records(records, unify)
+    return rec if len(rec.tails) < 2 else rec.with_tails(unify_tails(rec.tails))
+
+
+def join(t1, t2):
+    '''
+    Return the term unifying terms %t1% and %t2%, which are not variables.
+    '''
+    if t1 is t2:
+        return t1
+    if isinstance(t1, Number) and isinstance(t2, Number):
+        return Int()
+    if isinstance(t1, Record) and isinstance(t2, Record):
+        return unify_records((t1, t2))
+    if isinstance(t1, Choice) and isinstance(t2, Choice):
+        variants = dict(t1.variants)
+        for v, rec in t2.variants.items():
+            variants[v] = unify_records((variants[v], rec)) \
+                    if v in variants else rec
+        return Choice(variants, unify_tails(unique(t1.tails + t2.tails)))
+    raise TypeError
+
+
+def resolve(term, memo=None):
+    '''
+    Return term %term% with the bound variables replaced by their values,
+    and the others by the representatives of their classes. The tails bound
+    to records are spliced into the records they end. %memo% caches the
+    terms resolved already.
+    '''
+    if memo is None:
+        memo = {}
+    done = memo.get(term, False)
+    if done is None:
+        raise TypeError("recursive type")
+    if done:
+        return done
+    memo[term] = None
+
+    if isinstance(term, Variable):
+        top = root(term)
+        res = top if top.value is None else resolve(top.value, memo)
+    elif isinstance(term, Record):
+        labels = dict((l, memo.get(t) or resolve(t, memo))
+                      for l, t in term.labels.items())
+        tails = [memo.get(t) or resolve(t, memo) for t in term.tails]
+        bound = [t for t in tails if not isinstance(t, Variable)]
+        if bound:
+            tails = [t for t in tails if isinstance(t, Variable)]
+            res = merge_records([Record(labels, tails)] + bound)
+        elif all(labels[l] is t for l, t in term.labels.items()) \
+                and all(t is v for t, v in zip(tails, term.tails)):
+            res = term
+        else:
+            res = Record(labels, tails)
+    elif isinstance(term, Choice):
+        variants = dict((v, resolve(r, memo)) for v, r in term.variants.items())
+        tails = [resolve(t, memo) for t in term.tails]
+        if all(variants[v] is r for v, r in term.variants.items()) \
+                and all(t is v for t, v in zip(tails, term.tails)):
+            res = term
+        else:
+            res = Choice(variants, tails)
+    elif isinstance(term, Union):
+        vals = [resolve(v, memo) for v in term.vals]
+        res = vals[0]
+        for v in vals[1:]:
+            res = rep_union(res, v)
+    else:
+        res = term
+
+    memo[term] = res
+    return res
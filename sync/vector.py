@@ -0,0 +1,692 @@
+#!/usr/bin/env python3
+'''
+Step many instances of a synchroniser at once with NumPy.
+
+<Batch> keeps the state of n instances of the same synchroniser in arrays:
+the control states, and every state variable in an array of the smallest
+unsigned dtype holding its field of the layout (see layout.py). A step
+applies one message to every instance. The instances are grouped by state
+and message tag, and the candidate transitions of each group (see
+dispatch.py) are tried in order of priority, as in engine.py. The guards,
+the assignments and the integer items of the messages are evaluated as
+array expressions over the instances of the group; the state of the
+instances which fire is updated by masked assignment.
+
+The messages are columnar: a batch of messages gives the values of every
+label for all the instances as an array. The records (the messages sent,
+THIS, the tails and the store variables) are dicts of the labels to the
+pairs of arrays (values, present), %present% being the mask of the
+instances having the label, None if all have it. The labels hold integers
+only.
+
+The integer semantics are that of engine.py computed in int64. The
+operators which Python evaluates differently flag the instances concerned:
+the arithmetic leaving int64, division and modulo by zero and negative
+shift counts. The expression is evaluated again for those instances by its
+scalar function, as in engine.py: && and || decide whether the operator is
+reached at all, and the errors are raised as by the engine. A value out of
+int64 left by the scalar function in a label or a local variable raises
+OverflowError. NumPy is imported by this module only.
+'''
+
+import numpy as np
+
+from . import ast
+from . import codegen
+from . import dispatch
+from . import engine
+from . import types
+from . import layout as sync_layout
+
+
+def dtype(width):
+    '''
+    Return the smallest unsigned dtype of %width% bits.
+    '''
+    for t in (np.uint8, np.uint16, np.uint32, np.uint64):
+        if width <= np.iinfo(t).bits:
+            return t
+    raise ValueError("state field of %d bits does not fit 64" % width)
+
+
+def I(x):
+    '''
+    Return %x% as an int64 array, used by the generated code.
+    '''
+    return np.asarray(x, dtype=np.int64)
+
+
+def column(x, n):
+    '''
+    Return the int64 array of %n% values of %x%, an array or a scalar.
+    '''
+    a = I(x)
+    return np.full(n, a) if a.ndim == 0 else a
+
+
+# Bound of the products checked in floating point, with a margin for the
+# rounding of the operands.
+product_bound = 2.0 ** 62
+
+min_int = np.iinfo(np.int64).min
+
+
+def A(a, b, F):
+    '''
+    Return %a% + %b%, used by the generated code. The mask of the instances
+    overflowing int64 is appended to the list of faults %F%.
+    '''
+    a, b = I(a), I(b)
+    r = a + b
+    bad = ((a ^ r) & (b ^ r)) < 0
+    if bad.any():
+        F.append(bad)
+    return r
+
+
+def S(a, b, F):
+    '''
+    Return %a% - %b%, see A().
+    '''
+    a, b = I(a), I(b)
+    r = a - b
+    bad = ((a ^ b) & (a ^ r)) < 0
+    if bad.any():
+        F.append(bad)
+    return r
+
+
+def P(a, b, F):
+    '''
+    Return %a% * %b%, see A(). The products close to the bound are flagged
+    as well.
+    '''
+    a, b = I(a), I(b)
+    bad = np.abs(np.multiply(a, b, dtype=np.float64)) >= product_bound
+    if bad.any():
+        F.append(bad)
+    return a * b
+
+
+def N(a, F):
+    '''
+    Return -%a%, see A().
+    '''
+    a = I(a)
+    bad = a == min_int
+    if bad.any():
+        F.append(bad)
+    return -a
+
+
+def D(a, b, F):
+    '''
+    Return %a% / %b%, see A(). The instances dividing by zero are flagged
+    as well.
+    '''
+    a, b = I(a), I(b)
+    bad = (b == 0) | ((b == -1) & (a == min_int))
+    if bad.any():
+        F.append(bad)
+        b = np.where(bad, 1, b)
+    return np.floor_divide(a, b)
+
+
+def M(a, b, F):
+    '''
+    Return %a% % %b%, see D().
+    '''
+    a, b = I(a), I(b)
+    zero = b == 0
+    if zero.any():
+        F.append(zero)
+        b = np.where(zero, 1, b)
+    return np.mod(a, b)
+
+
+def SL(a, b, F):
+    '''
+    Return %a% << %b%, see A(). The instances shifting by a negative count
+    are flagged as well.
+    '''
+    a, b = I(a), I(b)
+    bad = (b < 0) | (b > 62)
+    b = np.where(bad, 0, b)
+    r = np.left_shift(a, b)
+    bad = bad | (np.right_shift(r, b) != a)
+    if bad.any():
+        F.append(bad)
+    return r
+
+
+def SR(a, b, F):
+    '''
+    Return %a% >> %b%, see A(). The instances shifting by a negative count
+    are flagged.
+    '''
+    a, b = I(a), I(b)
+    bad = (b < 0) | (b > 63)
+    if bad.any():
+        F.append(bad)
+        b = np.where(bad, 0, b)
+    return np.right_shift(a, b)
+
+
+# Operators computed by the ufuncs.
+ufuncs = {
+    '<': 'np.less', '>': 'np.greater', '==': 'np.equal',
+    '!=': 'np.not_equal', '<=': 'np.less_equal', '>=': 'np.greater_equal',
+    '&&': 'np.logical_and', '||': 'np.logical_or',
+}
+
+# Operators checking their operands, see D().
+checked = {'+': 'A', '-': 'S', '*': 'P', '/': 'D', '%': 'M',
+           '<<': 'SL', '>>': 'SR'}
+
+
+class Translator(codegen.Translator):
+    '''
+    Translate the integer expressions of a transition with the symbol table
+    %symtab% to array expressions. %fields% are the state variables packed
+    by the layout. The array functions also take the list of faults F (see
+    D()). With %scalar% set the functions are over integers, as in codegen.
+    '''
+    def __init__(self, symtab, fields, scalar=False):
+        super().__init__(symtab)
+        self.fields = fields
+        self.scalar = scalar
+
+    def function(self, names, body, result):
+        if self.scalar:
+            return super().function(names, body, result)
+        lines = ['def f(state, msg, F):']
+        lines += ['    ' + self.bind(n) for n in names]
+        lines += ['    ' + l for l in body]
+        lines.append('    return %s' % result)
+        return '\n'.join(lines) + '\n'
+
+    def exp(self, node, truth=False):
+        if self.scalar:
+            return super().exp(node, truth)
+        if not isinstance(node, (ast.BinaryOp, ast.UnaryOp)):
+            code = super().exp(node)
+            return 'np.not_equal(%s, 0)' % code if truth else code
+
+        op = node.op
+        if isinstance(node, ast.UnaryOp):
+            logical = op == '!'
+            if logical:
+                code = 'np.logical_not(%s)' % self.exp(node.operand, True)
+            else:
+                code = 'N(%s, F)' % self.exp(node.operand)
+        else:
+            logical = op in codegen.logic_ops or op in codegen.cmp_ops
+            left = self.exp(node.left, op in codegen.logic_ops)
+            right = self.exp(node.right, op in codegen.logic_ops)
+            if op in ufuncs:
+                code = '%s(%s, %s)' % (ufuncs[op], left, right)
+            elif op in checked:
+                code = '%s(%s, %s, F)' % (checked[op], left, right)
+            else:
+                code = '(%s %s %s)' % (left, op, right)
+
+        if logical and not truth:
+            return 'I(%s)' % code
+        if truth and not logical:
+            return 'np.not_equal(%s, 0)' % code
+        return code
+
+    def assign(self, assigns):
+        if not assigns:
+            return None
+
+        # As codegen, the state variables keep the bits of their fields.
+        names = []
+        assigned = []
+        body = []
+        for a in assigns:
+            name = a.lhs.value
+            for n in self.names(a.rhs.exp, []):
+                if n not in assigned and n not in names:
+                    names.append(n)
+            code = self.exp(a.rhs.exp)
+            f = self.fields.get(name)
+            if f is not None and f.width < 64:
+                mask = '(%s & %d)' if self.scalar else 'np.bitwise_and(%s, %d)'
+                code = mask % (code, f.mask)
+            body.append("v_%s = %s" % (name, code))
+            if name not in assigned:
+                assigned.append(name)
+
+        result = '(%s,)' % ', '.join('v_%s' % n for n in assigned)
+        return self.function(names, body, result), tuple(assigned)
+
+
+def compile_source(source):
+    '''
+    Compile %source% defining the function 'f' over arrays and return the
+    function.
+    '''
+    namespace = {'np': np, 'I': I, 'A': A, 'S': S, 'P': P, 'N': N, 'D': D,
+                 'M': M, 'SL': SL, 'SR': SR}
+    exec(compile(source, '<sync>', 'exec'), namespace)
+    return namespace['f']
+
+
+def lane(values, k):
+    '''
+    Return the dict of the integers of instance %k% in %values%, a dict of
+    the names to arrays or scalars.
+    '''
+    return dict((name, int(a[k]) if np.ndim(a) else int(a))
+                for name, a in values.items())
+
+
+class Exp(object):
+    '''
+    Integer expression compiled from the sources of its array function
+    %array% and of its scalar function %scalar% (see <Translator>). Called
+    with the values %state% and %msg% of %n% instances, return its value
+    over the instances (the tuple of the values for assignments). The
+    instances flagged by the array function are evaluated by the scalar one.
+    '''
+    __slots__ = ('array', 'scalar')
+
+    def __init__(self, array, scalar):
+        self.array = compile_source(array)
+        self.scalar = codegen.compile_source(scalar)
+
+    def __call__(self, state, msg, n):
+        faults = []
+        value = self.array(state, msg, faults)
+        if not faults:
+            return value
+        bad = np.zeros(n, dtype=bool)
+        for f in faults:
+            bad |= f
+        many = isinstance(value, tuple)
+        columns = [np.array(np.broadcast_to(v, (n,)))
+                   for v in (value if many else (value,))]
+        for k in np.flatnonzero(bad):
+            v = self.scalar(lane(state, k), lane(msg, k))
+            for c, x in zip(columns, v if many else (v,)):
+                c[k] = x
+        return tuple(columns) if many else columns[0]
+
+
+def merge(record, part):
+    '''
+    Update %record% with the labels of %part%. The label of %part% present
+    in some instances only keeps the values of %record% in the others.
+    '''
+    for l, (values, present) in part.items():
+        old = record.get(l)
+        if present is None or old is None:
+            record[l] = (values, present)
+        else:
+            values = np.where(present, values, old[0])
+            present = None if old[1] is None else present | old[1]
+            record[l] = (values, present)
+
+
+class Transition(object):
+    '''
+    Transition compiled to array functions. The functions take the values
+    of the variables %state% and of the labels of the message %msg%, dicts
+    of the names to arrays over the instances firing, and <Exp> the number
+    of the instances.
+
+    Attributes:
+        labels (frozenset of str): labels matched by p.(...).
+        depth (str): variable bound to the depth of the segmark by p.@d.
+        guard (<Exp> or None), assign (<Exp> or None), assign_names
+            (tuple of str): see <codegen.TransCode>.
+        written (tuple of str): the state variables of %assign_names%.
+        stores (tuple of (str, list of function)): data assignments, the
+            store variable and the parts of its record.
+        sends (tuple of (str, str, list of function or function)): the
+            messages sent: the port, the variant and the parts of the record
+            (the <Exp> of the depth for segmarks, the variant is SEGMARK).
+        target (int): state to go to, None to stay.
+    '''
+    __slots__ = ('labels', 'depth', 'guard', 'assign', 'assign_names',
+                 'written', 'stores', 'sends', 'target')
+
+
+def load(tr, name, matched, tail):
+    '''
+    Return the function of the value of variable %name% in a data
+    expression: the record of the tail or of a store variable, the column of
+    a label, an enum member or an integer variable. The functions take the
+    batch, the values %state% and %msg% and the instances %index% firing.
+    '''
+    if name == tail:
+        return lambda b, state, msg, index: dict(
+            (l, (a, None)) for l, a in msg.items() if l not in matched)
+    entry = tr.symtab.get(name)
+    if entry.readonly:
+        if isinstance(entry.ast, ast.IntExp):
+            value = entry.ast.exp.value
+            return lambda b, state, msg, index: column(value, len(index))
+        return lambda b, state, msg, index: msg[name]
+    if name in tr.fields or isinstance(entry.type, types.Number):
+        return lambda b, state, msg, index: column(state[name], len(index))
+    return lambda b, state, msg, index: b.read_store(name, index)
+
+
+def record_parts(tr, st, data_exp, segmark, matched, tail):
+    '''
+    Return the list of the functions building the parts of the record of
+    %data_exp%, see load(). %st% is the scalar <Translator> of %tr%.
+    '''
+    def label(name, f):
+        return lambda b, state, msg, index: {name: (f(b, state, msg, index), None)}
+
+    parts = []
+    for item in data_exp.items:
+        if isinstance(item, ast.ItemThis):
+            if not segmark:
+                parts.append(lambda b, state, msg, index: dict(
+                    (l, (a, None)) for l, a in msg.items()))
+        elif isinstance(item, ast.ItemVar):
+            parts.append(load(tr, item.name.value, matched, tail))
+        elif isinstance(item, ast.ItemExpand):
+            parts.append(label(item.name.value,
+                               load(tr, item.name.value, matched, tail)))
+        elif isinstance(item.value, ast.IntExp):
+            f = Exp(tr.value(item.value), st.value(item.value))
+            parts.append(label(item.label.value,
+                               lambda b, state, msg, index, f=f:
+                               column(f(state, msg, len(index)), len(index))))
+        else:
+            parts.append(label(item.label.value,
+                               load(tr, item.value.value, matched, tail)))
+    return parts
+
+
+def compile_trans(trans, layout, states):
+    '''
+    Compile transition %trans% to array functions. %layout% is the
+    <layout.Layout> of the synchroniser, %states% maps the state names to
+    their numbers. Return <Transition>.
+    '''
+    t = Transition()
+    cond = trans.condition
+    t.labels = frozenset()
+    t.depth = None
+    tail = None
+    segmark = isinstance(cond, ast.CondSegmark)
+    if isinstance(cond, ast.CondDataMsg):
+        t.labels = frozenset(l.value for l in cond.labels)
+        tail = cond.tail.value
+    elif segmark:
+        t.depth = cond.depth.value
+
+    tr = Translator(trans.symtab, layout.fields)
+    st = Translator(trans.symtab, layout.fields, scalar=True)
+    source = tr.guard(trans.guard)
+    t.guard = Exp(source, st.guard(trans.guard)) if source is not None else None
+
+    assigns = [a for a in trans.actions
+               if isinstance(a, ast.Assign) and isinstance(a.rhs, ast.IntExp)]
+    t.assign, t.assign_names = None, ()
+    if assigns:
+        source, t.assign_names = tr.assign(assigns)
+        t.assign = Exp(source, st.assign(assigns)[0])
+    t.written = tuple(n for n in t.assign_names if n in layout.fields)
+
+    stores = []
+    sends = []
+    t.target = None
+    for action in trans.actions:
+        if isinstance(action, ast.Assign) and isinstance(action.rhs, ast.DataExp):
+            stores.append((action.lhs.value, record_parts(
+                tr, st, action.rhs, segmark, t.labels, tail)))
+        elif isinstance(action, ast.Send):
+            msg = action.msg
+            port = action.port.value
+            if isinstance(msg, ast.MsgData):
+                variant = msg.choice.value if msg.choice else None
+                sends.append((port, variant, record_parts(
+                    tr, st, msg.data_exp, segmark, t.labels, tail)))
+            elif isinstance(msg, ast.MsgSegmark):
+                depth = msg.depth
+                if isinstance(depth, ast.IntExp):
+                    f = Exp(tr.value(depth), st.value(depth))
+                else:
+                    result = 'v_%s' % depth.value
+                    f = Exp(tr.function([depth.value], [], result),
+                            st.function([depth.value], [], result))
+                sends.append((port, dispatch.SEGMARK, f))
+            else:
+                sends.append((port, None, []))
+        elif isinstance(action, ast.Goto) and action.states:
+            t.target = states[action.states[0].value]
+    t.stores = tuple(stores)
+    t.sends = tuple(sends)
+    return t
+
+
+class Program(object):
+    '''
+    Synchroniser compiled to array functions, shared by the batches running
+    it.
+
+    Attributes:
+        name (str): synchroniser name.
+        states (tuple of str): state names, by number.
+        layout (<layout.Layout>): the fields of the state, the widths of
+            which give the dtypes of the arrays.
+        stores (tuple of str): store variable names.
+        index (<dispatch.Index>): the <Transition>s by state, input channel
+            and message tag.
+    '''
+    def __init__(self, sync_ast):
+        self.name = sync_ast.name.value
+        self.layout = sync_layout.build(sync_ast)
+        self.states = self.layout.states
+        self.stores = tuple(d.name.value for d in sync_ast.decls.decls
+                            if isinstance(d, ast.StoreVar))
+        number = dict((s, i) for i, s in enumerate(self.states))
+        self.index = dispatch.build(sync_ast, lambda trans: compile_trans(
+            trans, self.layout, number))
+
+
+class Output(object):
+    '''
+    Messages sent by the instances %index% (an array of the instance
+    numbers) to output channel %port%: the data messages of variant
+    %variant% with the labels %labels% (a record), or the segmarks of the
+    depths %depth% (an array).
+    '''
+    def __init__(self, port, variant, index, labels=None, depth=None):
+        self.port = port
+        self.variant = variant
+        self.index = index
+        self.labels = labels
+        self.depth = depth
+
+    def messages(self):
+        '''
+        Generate the pairs (instance, <engine.Data> or <engine.Segmark>).
+        '''
+        for k, i in enumerate(self.index):
+            if self.depth is not None:
+                yield int(i), engine.Segmark(int(self.depth[k]))
+                continue
+            labels = {}
+            for l, (values, present) in self.labels.items():
+                if present is None or present[k]:
+                    labels[l] = int(values[k])
+            yield int(i), engine.Data(self.variant, labels)
+
+
+class Batch(object):
+    '''
+    %n% instances of a synchroniser.
+
+    Attributes:
+        program (<Program>): the synchroniser.
+        n (int): number of the instances.
+        state (array): the control state of every instance.
+        variables (dict of str:array): the values of the state variables.
+        stores (dict of str:dict): the values of the store variables, the
+            records over all the instances.
+        accepted (array of bool): the instances which accepted the message
+            of the latest step.
+    '''
+    def __init__(self, program, n):
+        self.program = program
+        self.n = n
+        lay = program.layout
+        values = lay.unpack(lay.initial)
+        self.state = np.full(n, lay.state(lay.initial),
+                             dtype=dtype(max(lay.control.width, 1)))
+        self.variables = dict((name, np.full(n, values[name], dtype=dtype(f.width)))
+                              for name, f in lay.fields.items())
+        self.stores = dict((name, {}) for name in program.stores)
+        self.accepted = np.zeros(n, dtype=bool)
+
+    def read_store(self, name, index):
+        return dict((l, (values[index], present[index]))
+                    for l, (values, present) in self.stores[name].items())
+
+    def write_store(self, name, index, record):
+        '''
+        Set store variable %name% of the instances %index% to %record%.
+        '''
+        store = self.stores[name]
+        for l, (values, present) in store.items():
+            if l not in record:
+                present[index] = False
+        for l, (values, present) in record.items():
+            if l not in store:
+                store[l] = (np.zeros(self.n, dtype=np.int64),
+                            np.zeros(self.n, dtype=bool))
+            store[l][0][index] = values
+            store[l][1][index] = True if present is None else present
+
+    def instance(self, i):
+        '''
+        Return the name of the state and the dict of the values of the
+        variables of instance %i%, as <engine.Machine> has them.
+        '''
+        values = dict((name, int(a[i])) for name, a in self.variables.items())
+        for name, store in self.stores.items():
+            values[name] = dict((l, int(v[i])) for l, (v, p) in store.items()
+                                if p[i])
+        return self.program.states[self.state[i]], values
+
+    def step(self, port, labels=None, variant=None, active=None, depth=None):
+        '''
+        Apply a message from input channel %port% to every instance, or to
+        the instances of the bool mask %active%. The messages are data
+        messages with the values of the labels %labels% (a dict of the label
+        names to arrays) and the variant %variant% (a name or None for all,
+        or an array of them), or the segmarks of the depths %depth% (an
+        array). Return the list of <Output>s.
+        '''
+        n = self.n
+        msg = dict((l, column(a, n)) for l, a in (labels or {}).items())
+        if depth is not None:
+            depth = column(depth, n)
+        pending = np.ones(n, dtype=bool) if active is None \
+            else np.array(active, dtype=bool)
+        received = pending.copy()
+        outputs = []
+        table = self.program.index.table
+
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            for s in range(len(table)):
+                in_state = pending & (self.state == s)
+                if not in_state.any():
+                    continue
+                row = table[s][port]
+                for tag, group in self.groups(in_state, variant, depth):
+                    index = np.flatnonzero(group)
+                    for t in row[tag]:
+                        if not index.size:
+                            break
+                        if not t.labels <= msg.keys():
+                            continue
+                        fired = self.try_fire(t, index, msg, depth, outputs)
+                        if fired is not None:
+                            pending[index[fired]] = False
+                            index = index[~fired]
+
+        self.accepted = received & ~pending
+        return outputs
+
+    def groups(self, mask, variant, depth):
+        '''
+        Generate the pairs (tag, mask) of the instances of %mask% by the
+        tags of their messages.
+        '''
+        if depth is not None:
+            yield dispatch.SEGMARK, mask
+        elif variant is None or isinstance(variant, str):
+            yield variant, mask
+        else:
+            variant = np.asarray(variant, dtype=object)
+            for tag in set(variant[mask]):
+                yield tag, mask & (variant == tag)
+
+    def try_fire(self, t, index, msg, depth, outputs):
+        '''
+        Fire transition %t% in the instances %index% the guard of which
+        holds. Return the mask of %index% fired, None if none.
+        '''
+        if depth is not None:
+            env = {t.depth: depth[index]} if t.depth is not None else {}
+        else:
+            env = dict((l, a[index]) for l, a in msg.items())
+        state = dict((name, a[index].astype(np.int64))
+                     for name, a in self.variables.items())
+
+        if t.guard is not None:
+            fired = np.broadcast_to(
+                np.asarray(t.guard(state, env, len(index)), dtype=bool),
+                index.shape)
+            if not fired.any():
+                return None
+            if not fired.all():
+                index = index[fired]
+                env = dict((l, a[fired]) for l, a in env.items())
+                state = dict((name, a[fired]) for name, a in state.items())
+        else:
+            fired = np.ones(index.shape, dtype=bool)
+
+        if t.assign is not None:
+            values = t.assign(state, env, len(index))
+            state.update(zip(t.assign_names, values))
+            for name in t.written:
+                self.variables[name][index] = state[name]
+
+        for name, parts in t.stores:
+            record = {}
+            for part in parts:
+                merge(record, part(self, state, env, index))
+            self.write_store(name, index, record)
+
+        for port, variant, parts in t.sends:
+            if variant == dispatch.SEGMARK:
+                outputs.append(Output(port, None, index,
+                                      depth=column(parts(state, env, len(index)),
+                                                   len(index))))
+                continue
+            record = {}
+            for part in parts:
+                merge(record, part(self, state, env, index))
+            outputs.append(Output(port, variant, index, labels=record))
+
+        if t.target is not None:
+            self.state[index] = t.target
+        return fired
+
+
+def build(sync_ast, n):
+    '''
+    Compile processed %sync_ast% and return the <Batch> of its %n%
+    instances in the initial state.
+    '''
+    return Batch(Program(sync_ast), n)
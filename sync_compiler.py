@@ -2,17 +2,14 @@
 
 import os
 import sys
+import time
+import argparse
 import sync
+import sync.batch
+import sync.network
 
 
-if __name__ == '__main__':
-
-    if len(sys.argv) < 2:
-        print('USAGE: {} source'.format(sys.argv[0]))
-        quit()
-
-    src_file = sys.argv[1]
-
+def compile_single(src_file):
     if not (os.path.isfile(src_file) and os.access(src_file, os.R_OK)):
         print('Source file either does not exist or cannot be read.')
         quit()
@@ -24,3 +21,70 @@ if __name__ == '__main__':
     if ast:
         print("Successful.")
         ast.show(attrnames=True, nodenames=True)
+
+
+def compile_batch(paths, jobs, summary_file, cache_dir):
+    files = sync.batch.collect(paths)
+
+    start = time.perf_counter()
+    results = sync.batch.run(files, jobs, cache_dir)
+    report = sync.batch.summary(results, time.perf_counter() - start)
+
+    if summary_file:
+        with open(summary_file, 'w') as f:
+            f.write(report)
+    else:
+        sys.stdout.write(report)
+
+    return all(r.ok for r in results)
+
+
+def check_network(wiring_file, jobs, state_file):
+    wiring = sync.network.load_wiring(wiring_file)
+    if state_file:
+        state = sync.network.load_state(state_file)
+        report = sync.network.check_incremental(wiring, state, jobs)
+        state.save(state_file)
+    else:
+        report = sync.network.check_wiring(wiring, jobs)
+    sys.stdout.write(report.show())
+    return report.ok
+
+
+if __name__ == '__main__':
+
+    argparser = argparse.ArgumentParser(
+        description='Synchroniser compiler. Compile a single source and print '
+        'its AST, or compile many sources (files or directories) in batch.')
+    argparser.add_argument('sources', nargs='*', help='source files or directories')
+    argparser.add_argument('-j', '--jobs', type=int, default=None,
+                           help='number of worker processes in batch mode '
+                           '(default: number of CPUs)')
+    argparser.add_argument('-o', '--summary', default=None,
+                           help='write the batch summary to the file')
+    argparser.add_argument('-c', '--cache', default=None,
+                           help='directory of the persistent compile cache')
+    argparser.add_argument('-n', '--network', default=None,
+                           help='check the connections of the network in the '
+                           'wiring description file instead')
+    argparser.add_argument('-s', '--state', default=None,
+                           help='check the network incrementally, keeping the '
+                           'passports and the results in the file')
+    args = argparser.parse_args()
+
+    if args.state and not args.network:
+        argparser.error('-s/--state needs -n/--network')
+    if args.network:
+        sys.exit(0 if check_network(args.network, args.jobs, args.state) else 1)
+    if not args.sources:
+        argparser.error('no sources given')
+
+    batch = (len(args.sources) > 1 or os.path.isdir(args.sources[0])
+             or args.jobs is not None or args.summary is not None
+             or args.cache is not None)
+
+    if not batch:
+        compile_single(args.sources[0])
+    else:
+        sys.exit(0 if compile_batch(args.sources, args.jobs, args.summary,
+                                   args.cache) else 1)